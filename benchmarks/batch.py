@@ -0,0 +1,86 @@
+"""Compare decoding status updates one by one with columnar batch decoding.
+
+Usage: python benchmarks/batch.py [--records N] [--rounds N]
+
+Records differ in time and temperature, so the client parses every one. NumPy is
+only measured when it is installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from pybalboa import SpaClient
+from pybalboa.batch import STATUS_PAYLOAD_LENGTH, decode_status_batch
+
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _buffer(count: int) -> bytes:
+    """Return `count` status payloads with a different time and temperature."""
+    records = bytearray()
+    for i in range(count):
+        data = bytearray(STATUS[4:-1])
+        data[2], data[3], data[4] = 80 + i % 20, i // 60 % 24, i % 60
+        records += data
+    return bytes(records)
+
+
+def _client(buffer: bytes) -> None:
+    """Parse every payload with a client."""
+    spa = SpaClient("benchmark")
+    for start in range(0, len(buffer), STATUS_PAYLOAD_LENGTH):
+        # pylint: disable=protected-access
+        spa._parse_status_update(buffer[start : start + STATUS_PAYLOAD_LENGTH])
+
+
+def _best(rounds: int, function: Callable[[], object]) -> float:
+    """Return the fastest of `rounds` runs in seconds."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    buffer = _buffer(args.records)
+
+    results = {
+        "client": _best(args.rounds, lambda: _client(buffer)),
+        "python": _best(
+            args.rounds, lambda: decode_status_batch(buffer, use_numpy=False)
+        ),
+    }
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel # noqa: F401
+    except ImportError:
+        pass
+    else:
+        results["numpy"] = _best(
+            args.rounds, lambda: decode_status_batch(buffer, use_numpy=True)
+        )
+
+    print(f"Python {sys.version.split()[0]}, {args.records} records")
+    for name, seconds in results.items():
+        print(
+            f"{name:<8}{args.records / seconds:>14,.0f} records/s"
+            f"{seconds / args.records * 1e9:>10.0f} ns/record"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Report the memory used per configured spa.
+
+Usage: python benchmarks/memory.py [--spas N] [--fixture NAME]
+
+Spas are configured by replaying the captured messages of a test fixture, so no
+network connection is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from pybalboa import SpaClient
+from pybalboa.control import FaultLog, SpaControl
+from pybalboa.discovery import DiscoveredSpa
+from pybalboa.enums import ControlType
+
+FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures"
+
+
+def _measure(count: int, factory: Callable[[int], Any]) -> tuple[float, list[Any]]:
+    """Return the bytes allocated per object created by `factory`."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count, objects
+
+
+async def _main(spas: int, messages: list[bytes]) -> None:
+    """Run the benchmark."""
+
+    def _spa(i: int) -> SpaClient:
+        spa = SpaClient(f"10.0.{i // 256}.{i % 256}")
+        for message in messages:
+            spa._process_message(message)  # pylint: disable=protected-access
+        return spa
+
+    per_spa, clients = _measure(spas, _spa)
+    controls = sum(len(spa.controls) for spa in clients) // spas
+    per_control, _ = _measure(
+        spas * controls,
+        lambda i: SpaControl(clients[0], ControlType.PUMP, 3, i % 6),
+    )
+    per_fault, _ = _measure(
+        spas, lambda i: FaultLog(24, 1, 16, 2, 10, 30, 0, 100, 98, 99, datetime.now())
+    )
+    per_discovered, _ = _measure(
+        spas,
+        lambda i: DiscoveredSpa(
+            f"10.0.{i // 256}.{i % 256}", 4257, f"00:15:27:00:{i // 256:02x}:00", "BWG"
+        ),
+    )
+
+    print(f"Python {sys.version.split()[0]}, {spas} spas")
+    print(f"{'configured spa':<16}{per_spa:>10.0f} bytes ({controls} controls)")
+    print(f"{'spa control':<16}{per_control:>10.0f} bytes")
+    print(f"{'fault log':<16}{per_fault:>10.0f} bytes")
+    print(f"{'discovered spa':<16}{per_discovered:>10.0f} bytes")
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spas", type=int, default=1000)
+    parser.add_argument("--fixture", default="bp6013g1")
+    args = parser.parse_args()
+    with open(FIXTURES / f"{args.fixture}.json", encoding="utf-8") as file:
+        messages = [bytes.fromhex(message) for message in json.load(file).values()]
+    print(f"Fixture {args.fixture}")
+    asyncio.run(_main(args.spas, messages))
+
+
+if __name__ == "__main__":
+    main()
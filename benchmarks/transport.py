@@ -0,0 +1,139 @@
+"""Compare frame throughput over TCP, an in-memory pipe and direct parsing.
+
+Usage: python benchmarks/transport.py [--frames N] [--batch N] [--rounds N] [--uvloop]
+
+A fake spa streams status updates with a changing time, so every frame is
+fully parsed. Parsing alone is the cost of the client; the difference to the
+memory pipe is the cost of the stream layer and the difference to TCP is the
+cost of the kernel socket.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from pybalboa import SpaClient
+from pybalboa.client import MESSAGE_DELIMETER_BYTE
+from pybalboa.framing import FrameDecoder
+from pybalboa.transport import MemoryTransport, use_uvloop
+from pybalboa.utils import calculate_checksum
+
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _frames(count: int) -> list[bytes]:
+    """Return status frames with a different time each."""
+    frames = []
+    for i in range(count):
+        frame = bytearray(STATUS)
+        frame[7], frame[8] = i // 60 % 24, i % 60
+        frame[-1] = calculate_checksum(bytes(frame[:-1]))
+        frames.append(bytes(frame))
+    return frames
+
+
+def _chunks(frames: list[bytes], batch: int) -> list[bytes]:
+    """Return the delimited frames joined into writes of `batch` frames."""
+    return [
+        b"".join(
+            MESSAGE_DELIMETER_BYTE + frame + MESSAGE_DELIMETER_BYTE
+            for frame in frames[i : i + batch]
+        )
+        for i in range(0, len(frames), batch)
+    ]
+
+
+async def _stream(
+    chunks: list[bytes], reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """Play the fake spa: send every chunk, then wait for the client to leave."""
+    for chunk in chunks:
+        writer.write(chunk)
+        await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+async def _receive(client: SpaClient, count: int) -> float:
+    """Return the seconds until the client received `count` frames."""
+    done: asyncio.Future[float] = asyncio.get_running_loop().create_future()
+    received = 0
+
+    def _frame(_: bytes) -> None:
+        nonlocal received
+        received += 1
+        if received == count and not done.done():
+            done.set_result(perf_counter())
+
+    client.add_frame_hook(_frame)
+    start = perf_counter()
+    await client.connect()
+    end = await done
+    await client.disconnect()
+    return end - start
+
+
+async def _round(count: int, chunks: list[bytes]) -> dict[str, float]:
+    """Return the seconds taken by each way of receiving the frames."""
+    spa = SpaClient("parse")
+    decoder = FrameDecoder()
+    start = perf_counter()
+    for chunk in chunks:
+        for data in decoder.feed(chunk):
+            assert isinstance(data, bytes)
+            spa._process_message(data)  # pylint: disable=protected-access
+    results = {"parse only": perf_counter() - start}
+
+    transport = MemoryTransport(lambda r, w: _stream(chunks, r, w))
+    results["memory pipe"] = await _receive(
+        SpaClient("memory", transport=transport), count
+    )
+
+    server = await asyncio.start_server(
+        lambda r, w: _stream(chunks, r, w), "127.0.0.1", 0
+    )
+    async with server:
+        port = server.sockets[0].getsockname()[1]
+        results["tcp"] = await _receive(SpaClient("127.0.0.1", port), count)
+    return results
+
+
+async def _main(count: int, batch: int, rounds: int) -> None:
+    """Run the benchmark and keep the best time of each way."""
+    chunks = _chunks(_frames(count), batch)
+    results: dict[str, float] = {}
+    for _ in range(rounds):
+        for name, seconds in (await _round(count, chunks)).items():
+            results[name] = min(results.get(name, seconds), seconds)
+
+    loop = type(asyncio.get_running_loop()).__module__
+    print(f"Python {sys.version.split()[0]}, {loop}, {count} frames of {batch}")
+    for name, seconds in results.items():
+        print(
+            f"{name:<12}{count / seconds:>12,.0f} frames/s"
+            f"{seconds / count * 1e6:>10.2f} us/frame"
+        )
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--uvloop", action="store_true")
+    args = parser.parse_args()
+    if args.uvloop and not use_uvloop():
+        parser.error("uvloop is not installed")
+    asyncio.run(_main(args.frames, args.batch, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
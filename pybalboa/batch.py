@@ -0,0 +1,180 @@
+"""Balboa spa columnar batch decoding of status updates."""
+
+from __future__ import annotations
+
+import logging
+from array import array
+from dataclasses import dataclass, fields
+from math import nan
+from typing import Any
+
+from .utils import add_slots
+
+_LOGGER = logging.getLogger(__name__)
+
+# the payload of a status update, without length, header, type and checksum
+STATUS_PAYLOAD_LENGTH = 24
+UNKNOWN_TEMPERATURE = 255
+
+
+@add_slots
+@dataclass
+class StatusColumns:
+    """Status update fields, one column per field and one row per record.
+
+    Columns are NumPy arrays when decoded with NumPy, else `array.array`; byte
+    fields are unsigned integers, flags are 0 or 1 and temperatures are floats
+    in the unit of `celsius`, NaN when the spa reported no reading.
+    """
+
+    state: Any
+    hour: Any
+    minute: Any
+    temperature: Any
+    target_temperature: Any
+    celsius: Any
+    is_24_hour: Any
+    heat_mode: Any
+    heat_state: Any
+    temperature_range: Any
+    filter_cycle_1_running: Any
+    filter_cycle_2_running: Any
+    # pumps 1-8, two bits each starting at the lowest bits
+    pumps: Any
+    # lights 1-4, two bits each with the on bit high
+    lights: Any
+    circulation_pump: Any
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return len(self.state)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the columns keyed by field name."""
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    def pump(self, index: int) -> Any:
+        """Return the states of pump `index`, from 0, as a column."""
+        return _bits(self.pumps, 2 * index, 0x03)
+
+    def light(self, index: int) -> Any:
+        """Return the states of light `index`, from 0, as a column."""
+        return _bits(self.lights, 2 * index + 1, 0x01)
+
+
+def _bits(column: Any, shift: int, mask: int) -> Any:
+    """Return bits of every value in an integer column."""
+    if isinstance(column, array):
+        return array("B", [value >> shift & mask for value in column])
+    return column >> shift & mask
+
+
+def decode_status_batch(
+    buffer: bytes | bytearray | memoryview,
+    *,
+    record_size: int = STATUS_PAYLOAD_LENGTH,
+    offset: int = 0,
+    use_numpy: bool | None = None,
+) -> StatusColumns:
+    """Decode a contiguous buffer of fixed size status update records.
+
+    Records are not validated, so archives should only hold frames that passed
+    the checksum. Unlike `SpaClient`, no state is kept and no events are emitted.
+
+    record_size: The bytes per record, e.g. 29 for frames without delimiters
+    offset: Where the payload starts in a record, e.g. 4 for frames
+    use_numpy: Decode with NumPy, or in pure Python if `False`; by default NumPy
+        is used when it is installed
+    """
+    if offset + STATUS_PAYLOAD_LENGTH > record_size:
+        raise ValueError("Record too small for a status update")
+    if len(buffer) % record_size:
+        raise ValueError(f"Buffer is not a multiple of {record_size} bytes")
+    if use_numpy is None:
+        try:
+            import numpy  # pylint: disable=import-outside-toplevel # noqa: F401
+        except ImportError:
+            _LOGGER.debug("NumPy is not installed, decoding in pure Python")
+            use_numpy = False
+        else:
+            use_numpy = True
+    if use_numpy:
+        return _decode_numpy(buffer, record_size, offset)
+    return _decode_python(memoryview(buffer).cast("B"), record_size, offset)
+
+
+def _decode_numpy(
+    buffer: bytes | bytearray | memoryview, record_size: int, offset: int
+) -> StatusColumns:
+    """Decode records with vectorized NumPy operations."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    records = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, record_size)
+    data = records[:, offset : offset + STATUS_PAYLOAD_LENGTH]
+    flags, range_heat = data[:, 9], data[:, 10]
+    celsius = flags & 0x01
+    divisor = np.where(celsius, 2.0, 1.0)
+    temperature = data[:, 2] / divisor
+    temperature[data[:, 2] == UNKNOWN_TEMPERATURE] = np.nan
+    return StatusColumns(
+        state=data[:, 0].copy(),
+        hour=data[:, 3].copy(),
+        minute=data[:, 4].copy(),
+        temperature=temperature,
+        target_temperature=data[:, 20] / divisor,
+        celsius=celsius,
+        is_24_hour=flags >> 1 & 0x01,
+        heat_mode=data[:, 5] & 0x03,
+        heat_state=range_heat >> 4 & 0x03,
+        temperature_range=range_heat >> 2 & 0x01,
+        filter_cycle_1_running=flags >> 2 & 0x01,
+        filter_cycle_2_running=flags >> 3 & 0x01,
+        pumps=data[:, 11].astype(np.uint16) | data[:, 12].astype(np.uint16) << 8,
+        lights=data[:, 14].copy(),
+        circulation_pump=data[:, 13] >> 1 & 0x01,
+    )
+
+
+def _decode_python(buffer: memoryview, record_size: int, offset: int) -> StatusColumns:
+    """Decode records in pure Python.
+
+    Each field is sliced out of the buffer with a stride, which copies a whole
+    column in C, so only derived fields are computed per record.
+    """
+
+    def column(index: int) -> bytes:
+        return buffer[offset + index :: record_size].tobytes()
+
+    flags, range_heat = column(9), column(10)
+
+    def temperatures(index: int, unknown: int | None = None) -> array:
+        return array(
+            "d",
+            [
+                nan if value == unknown else value / 2 if flag & 0x01 else value
+                for value, flag in zip(column(index), flags)
+            ],
+        )
+
+    def bits(values: bytes, shift: int, mask: int) -> array:
+        return array("B", [value >> shift & mask for value in values])
+
+    return StatusColumns(
+        state=array("B", column(0)),
+        hour=array("B", column(3)),
+        minute=array("B", column(4)),
+        temperature=temperatures(2, UNKNOWN_TEMPERATURE),
+        target_temperature=temperatures(20),
+        celsius=bits(flags, 0, 0x01),
+        is_24_hour=bits(flags, 1, 0x01),
+        heat_mode=bits(column(5), 0, 0x03),
+        heat_state=bits(range_heat, 4, 0x03),
+        temperature_range=bits(range_heat, 2, 0x01),
+        filter_cycle_1_running=bits(flags, 2, 0x01),
+        filter_cycle_2_running=bits(flags, 3, 0x01),
+        pumps=array(
+            "H", [low | high << 8 for low, high in zip(column(11), column(12))]
+        ),
+        lights=array("B", column(14)),
+        circulation_pump=bits(column(13), 1, 0x01),
+    )
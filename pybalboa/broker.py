@@ -0,0 +1,234 @@
+"""Balboa spa connection broker.
+
+Usage: python -m pybalboa.broker HOST [--port N] [--bind ADDRESS] [--spa-port N]
+
+Runs until interrupted with SIGINT or SIGTERM, then disconnects cleanly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import signal
+from typing import Any
+
+from .client import DEFAULT_PORT, MESSAGE_DELIMETER_BYTE, READ_SIZE, SpaClient
+from .enums import MessageType, SettingsCode
+from .framing import FrameDecoder
+from .utils import cancel_task
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BROKER_HOST = "127.0.0.1"
+DEFAULT_WRITE_BUFFER_LIMIT = 64 * 1024
+
+# configuration requests answered from the cache, by settings code
+CACHED_REQUESTS = {
+    SettingsCode.DEVICE_CONFIGURATION: MessageType.DEVICE_CONFIGURATION,
+    SettingsCode.FILTER_CYCLE: MessageType.FILTER_CYCLE,
+    SettingsCode.SETUP_PARAMETERS: MessageType.SETUP_PARAMETERS,
+    SettingsCode.SYSTEM_INFORMATION: MessageType.SYSTEM_INFORMATION,
+}
+CACHED_MESSAGES = (
+    MessageType.MODULE_IDENTIFICATION,
+    MessageType.STATUS_UPDATE,
+    *CACHED_REQUESTS.values(),
+)
+
+
+class SpaBroker:
+    """Share one upstream spa connection with any number of local clients.
+
+    The broker speaks the spa protocol on a local port. Every frame received from
+    the spa is delimited once and written as the same bytes object to each
+    downstream connection; commands from downstream are forwarded upstream one at
+    a time, and configuration requests are answered from the last frames seen.
+    Downstream connections that stop reading are dropped once their write buffer
+    exceeds `write_buffer_limit` bytes.
+    """
+
+    def __init__(
+        self,
+        client: SpaClient,
+        host: str = DEFAULT_BROKER_HOST,
+        port: int = DEFAULT_PORT,
+        *,
+        write_buffer_limit: int = DEFAULT_WRITE_BUFFER_LIMIT,
+    ) -> None:
+        """Initialize a broker for a client, which it connects on start.
+
+        host: The local address to listen on
+        port: The local port to listen on, 0 to pick a free port
+        write_buffer_limit: The most bytes queued for a downstream connection
+        """
+        self._client = client
+        self._host = host
+        self._port = port
+        self._write_buffer_limit = write_buffer_limit
+        self._server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._cache: dict[int, bytes] = {}
+        self._upstream_lock = asyncio.Lock()
+        self._remove_hook = client.add_frame_hook(self._frame_received)
+        self.frames_forwarded = 0
+        self.requests_cached = 0
+
+    @property
+    def port(self) -> int:
+        """Return the local port, which is only known after start if it was 0."""
+        if self._server is not None and self._server.sockets:
+            return int(self._server.sockets[0].getsockname()[1])
+        return self._port
+
+    @property
+    def connections(self) -> int:
+        """Return the number of downstream connections."""
+        return len(self._writers)
+
+    async def start(self) -> None:
+        """Connect upstream and start accepting downstream connections."""
+        await self._client.connect()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self._host, self._port
+        )
+        _LOGGER.debug(
+            "%s -- broker listening on %s:%s", self._client.host, self._host, self.port
+        )
+
+    async def close(self) -> None:
+        """Close all downstream connections and disconnect upstream."""
+        self._remove_hook()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in [*self._writers]:
+            writer.close()
+        for task in [*self._tasks]:
+            await cancel_task(task)
+        await self._client.disconnect()
+
+    def _frame_received(self, data: bytes) -> None:
+        """Cache a frame from the spa and fan it out downstream."""
+        if (message_type := data[3]) in CACHED_MESSAGES:
+            self._cache[message_type] = data
+        if not self._writers:
+            return
+        frame = MESSAGE_DELIMETER_BYTE + data + MESSAGE_DELIMETER_BYTE
+        for writer in [*self._writers]:
+            self._write(writer, frame)
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+        """Write a frame downstream, dropping connections that fall behind."""
+        transport = writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > self._write_buffer_limit:
+            _LOGGER.warning(
+                "%s ## dropping slow broker client %s",
+                self._client.host,
+                writer.get_extra_info("peername"),
+            )
+            transport.abort()
+            self._writers.discard(writer)
+            return
+        writer.write(frame)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve a downstream connection until it closes."""
+        task = asyncio.current_task()
+        assert task
+        self._tasks.add(task)
+        self._writers.add(writer)
+        if status := self._cache.get(MessageType.STATUS_UPDATE):
+            self._write(
+                writer, MESSAGE_DELIMETER_BYTE + status + MESSAGE_DELIMETER_BYTE
+            )
+        decoder = FrameDecoder()
+        try:
+            while chunk := await reader.read(READ_SIZE):
+                for data in decoder.feed(chunk):
+                    if isinstance(data, bytes):
+                        await self._frame_sent(writer, data)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _frame_sent(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        """Answer a frame from downstream from the cache or forward it upstream."""
+        if (cached := self._cached_reply(data)) is not None:
+            self.requests_cached += 1
+            self._write(
+                writer, MESSAGE_DELIMETER_BYTE + cached + MESSAGE_DELIMETER_BYTE
+            )
+            return
+        if data[3] == MessageType.FILTER_CYCLE:
+            # the filter cycles are being changed, so fetch them again next time
+            self._cache.pop(MessageType.FILTER_CYCLE, None)
+        async with self._upstream_lock:
+            await self._client.send_frame(data)
+            self.frames_forwarded += 1
+
+    def _cached_reply(self, data: bytes) -> bytes | None:
+        """Return the cached reply to a frame, if there is one."""
+        message_type = data[3]
+        if message_type == MessageType.DEVICE_PRESENT:
+            return self._cache.get(MessageType.MODULE_IDENTIFICATION)
+        if message_type != MessageType.REQUEST or len(data) < 6:
+            return None
+        if (reply := CACHED_REQUESTS.get(SettingsCode(data[4]))) is None:
+            return None
+        return self._cache.get(reply)
+
+    async def __aenter__(self) -> SpaBroker:
+        """Start the broker."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exctype: Any) -> None:
+        """Close the broker."""
+        await self.close()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run a broker until SIGINT or SIGTERM is received."""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:  # Windows, where Ctrl+C cancels the task
+            pass
+    client = SpaClient(args.host, args.spa_port)
+    async with SpaBroker(client, args.bind, args.port) as broker:
+        print(f"Broker for {args.host} listening on {args.bind}:{broker.port}")
+        await stop.wait()
+    print("Broker stopped")
+
+
+def main() -> None:
+    """Parse the arguments and run a broker."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("host", help="spa IP address or hostname")
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="local port, 0 for any"
+    )
+    parser.add_argument("--bind", default=DEFAULT_BROKER_HOST, help="local address")
+    parser.add_argument("--spa-port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "-d", "--debug", action="store_true", help="Enable debug logging"
+    )
+    args = parser.parse_args()
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
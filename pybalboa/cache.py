@@ -0,0 +1,142 @@
+"""Balboa spa discovery cache."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from collections.abc import Callable, Iterable
+from time import time
+from typing import Any
+
+from .discovery import DiscoveredSpa, async_discover
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60
+
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+class DiscoveryCache:
+    """On-disk cache of discovered spas.
+
+    Entries older than `ttl` seconds are ignored when loading.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], ttl: float = DEFAULT_CACHE_TTL
+    ) -> None:
+        """Initialize a discovery cache."""
+        self._path = os.fspath(path)
+        self._ttl = ttl
+        self._entries: dict[str, tuple[DiscoveredSpa, float]] = {}
+        self._loaded = False
+
+    @property
+    def path(self) -> str:
+        """Return the cache file path."""
+        return self._path
+
+    def load(self) -> list[DiscoveredSpa]:
+        """Load the cache file and return the spas that have not expired."""
+        self._loaded = True
+        self._entries.clear()
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Unable to read discovery cache %s: %s", self._path, err)
+            return []
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return []
+        for entry in data.get("spas", []):
+            try:
+                spa = DiscoveredSpa(
+                    entry["address"],
+                    int(entry["port"]),
+                    entry["mac_address"],
+                    entry["hostname"],
+                )
+                self._entries[spa.mac_address] = (spa, float(entry["last_seen"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return self.spas
+
+    @property
+    def spas(self) -> list[DiscoveredSpa]:
+        """Return the cached spas that have not expired."""
+        cutoff = time() - self._ttl
+        return [spa for spa, seen in self._entries.values() if seen >= cutoff]
+
+    def update(self, spas: Iterable[DiscoveredSpa], seen: float | None = None) -> None:
+        """Add or refresh spas in the cache."""
+        if not self._loaded:
+            self.load()
+        seen = time() if seen is None else seen
+        for spa in spas:
+            self._entries[spa.mac_address] = (spa, seen)
+
+    def save(self) -> None:
+        """Write the cache file, dropping expired entries."""
+        cutoff = time() - self._ttl
+        data: dict[str, Any] = {
+            "version": CACHE_VERSION,
+            "spas": [
+                {
+                    "address": spa.address,
+                    "port": spa.port,
+                    "mac_address": spa.mac_address,
+                    "hostname": spa.hostname,
+                    "last_seen": seen,
+                }
+                for spa, seen in self._entries.values()
+                if seen >= cutoff
+            ],
+        }
+        temp_path = f"{self._path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self._path)
+        except OSError as err:
+            _LOGGER.warning("Unable to write discovery cache %s: %s", self._path, err)
+
+
+async def async_discover_cached(
+    cache: DiscoveryCache,
+    return_once_found: bool = False,
+    *,
+    timeout: int = 10,
+    on_validated: Callable[[list[DiscoveredSpa]], None] | None = None,
+) -> list[DiscoveredSpa]:
+    """Discover spas, returning cached spas immediately if there are any.
+
+    When cached spas are returned, discovery continues in the background to refresh
+    the cache, after which `on_validated` is called with the spas that responded.
+    """
+    if not (spas := cache.load()):
+        spas = await async_discover(return_once_found, timeout=timeout)
+        cache.update(spas)
+        cache.save()
+        return spas
+
+    async def _validate() -> None:
+        try:
+            found = await async_discover(timeout=timeout)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Unable to refresh discovery cache %s", cache.path)
+            return
+        cache.update(found)
+        cache.save()
+        if on_validated:
+            on_validated(found)
+
+    task = asyncio.ensure_future(_validate())
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+    return spas[:1] if return_once_found else spas
@@ -0,0 +1,521 @@
+"""Balboa spa packet capture import and replay.
+
+Reads tcpdump captures (pcap or pcapng) of the spa's TCP port, reassembles each
+connection and extracts the frames exchanged with the same resynchronizing
+decoder the client uses. Frames can be written to a replay file, one
+`timestamp direction hex` line per frame, and either source can be replayed into
+a `SpaClient` with `ReplayTransport`.
+
+Usage: python -m pybalboa.capture capture.pcap [replay.txt] [--port N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import struct
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from .client import DEFAULT_PORT, READ_SIZE
+from .framing import FrameDecoder
+from .sniffer import message_type_name
+from .transport import MemoryTransport
+from .utils import MESSAGE_DELIMETER_BYTE, add_slots
+from .wiretrace import DIRECTION_ERROR, DIRECTION_IN, DIRECTION_OUT
+
+_LOGGER = logging.getLogger(__name__)
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+
+# pcapng block types
+BLOCK_INTERFACE_DESCRIPTION = 0x01
+BLOCK_PACKET = 0x02
+BLOCK_SIMPLE_PACKET = 0x03
+BLOCK_ENHANCED_PACKET = 0x06
+OPTION_TIMESTAMP_RESOLUTION = 9
+# the smallest block bodies holding the fields read from them
+BLOCK_MINIMUM_LENGTH = {
+    BLOCK_INTERFACE_DESCRIPTION: 8,
+    BLOCK_PACKET: 20,
+    BLOCK_SIMPLE_PACKET: 4,
+    BLOCK_ENHANCED_PACKET: 20,
+}
+
+# link layer types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+PROTOCOL_TCP = 6
+
+TCP_SYN = 0x02
+TCP_FIN = 0x01
+TCP_RST = 0x04
+SEQUENCE_MODULO = 1 << 32
+# out of order segments kept per direction before the missing data is given up
+MAX_PENDING_SEGMENTS = 64
+
+Packet = tuple[float, int, bytes]
+
+
+@add_slots
+@dataclass
+class CapturedFrame:
+    """A frame, or bytes that could not be decoded, from a captured connection."""
+
+    timestamp: float
+    direction: str
+    data: bytes
+    connection: str = ""
+
+    def format(self) -> str:
+        """Return the frame as a replay file line."""
+        return f"{self.timestamp:.6f} {self.direction} {self.data.hex()}"
+
+
+def read_packets(file: BinaryIO) -> Iterator[Packet]:
+    """Read (timestamp, link type, data) packets from a pcap or pcapng file."""
+    magic = file.read(4)
+    if magic == PCAPNG_MAGIC:
+        yield from _read_pcapng(file)
+    elif magic in PCAP_MAGIC:
+        yield from _read_pcap(file, *PCAP_MAGIC[magic])
+    else:
+        raise ValueError(f"Not a pcap or pcapng file: {magic.hex()}")
+
+
+def _read_pcap(file: BinaryIO, order: str, resolution: float) -> Iterator[Packet]:
+    """Read the records of a pcap file after its magic number."""
+    header = file.read(20)
+    if len(header) < 20:
+        return
+    linktype = struct.unpack(f"{order}I", header[16:])[0] & 0x0FFFFFFF
+    record = struct.Struct(f"{order}IIII")
+    while len(data := file.read(record.size)) == record.size:
+        seconds, fraction, captured, _ = record.unpack(data)
+        packet = file.read(captured)
+        if len(packet) < captured:
+            _LOGGER.warning("## capture truncated")
+            return
+        yield seconds + fraction * resolution, linktype, packet
+
+
+def _read_pcapng(file: BinaryIO) -> Iterator[Packet]:
+    """Read the packet blocks of a pcapng file after its magic number."""
+    order = "<"
+    interfaces: list[tuple[int, float]] = []
+    block_type = int.from_bytes(PCAPNG_MAGIC, "little")
+    while True:
+        length_data = file.read(4)
+        if len(length_data) < 4:
+            return
+        if block_type == int.from_bytes(PCAPNG_MAGIC, "little"):
+            # a section header, its byte order magic sets the order of the section
+            byte_order = file.read(4)
+            order = "<" if byte_order == b"\x4d\x3c\x2b\x1a" else ">"
+            length = struct.unpack(f"{order}I", length_data)[0]
+            body = byte_order + file.read(max(length - 16, 0))
+            interfaces = []
+        else:
+            length = struct.unpack(f"{order}I", length_data)[0]
+            body = file.read(max(length - 12, 0))
+        if length != 12 + len(body) or len(file.read(4)) < 4:
+            _LOGGER.warning("## capture truncated")
+            return
+        if len(body) < BLOCK_MINIMUM_LENGTH.get(block_type, 0):
+            _LOGGER.warning("## skipping malformed block of type %s", block_type)
+        elif block_type == BLOCK_INTERFACE_DESCRIPTION:
+            linktype = struct.unpack(f"{order}H", body[:2])[0]
+            interfaces.append((linktype, _timestamp_resolution(body[8:], order)))
+        elif block_type in (BLOCK_ENHANCED_PACKET, BLOCK_PACKET):
+            if block_type == BLOCK_ENHANCED_PACKET:
+                interface, high, low, captured = struct.unpack(
+                    f"{order}IIII", body[:16]
+                )
+            else:
+                interface, _, high, low, captured = struct.unpack(
+                    f"{order}HHIII", body[:16]
+                )
+            if interface >= len(interfaces):
+                _LOGGER.warning("## skipping packet of unknown interface %s", interface)
+            else:
+                linktype, resolution = interfaces[interface]
+                yield (
+                    (high << 32 | low) * resolution,
+                    linktype,
+                    body[20 : 20 + captured],
+                )
+        elif block_type == BLOCK_SIMPLE_PACKET and interfaces:
+            original = struct.unpack(f"{order}I", body[:4])[0]
+            yield 0.0, interfaces[0][0], body[4 : 4 + original]
+        if not (type_data := file.read(4)):
+            return
+        block_type = struct.unpack(f"{order}I", type_data)[0]
+
+
+def _timestamp_resolution(options: bytes, order: str) -> float:
+    """Return the seconds per timestamp unit given by interface options."""
+    while len(options) >= 4:
+        code, length = struct.unpack(f"{order}HH", options[:4])
+        if code == OPTION_TIMESTAMP_RESOLUTION and length:
+            value = options[4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0**-value
+        if not code:
+            break
+        options = options[4 + (length + 3) // 4 * 4 :]
+    return 1e-6
+
+
+def _ip_packet(linktype: int, data: bytes) -> bytes | None:
+    """Return the IP packet carried by a link layer frame, if any."""
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        return data
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        # the address family is in host or network order, IPv4 is 2 on all systems
+        return data[4:]
+    if linktype == LINKTYPE_ETHERNET:
+        ethertype, offset = int.from_bytes(data[12:14], "big"), 14
+        while ethertype in ETHERTYPE_VLAN:
+            ethertype = int.from_bytes(data[offset + 2 : offset + 4], "big")
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        ethertype, offset = int.from_bytes(data[14:16], "big"), 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        ethertype, offset = int.from_bytes(data[0:2], "big"), 20
+    else:
+        return None
+    if ethertype not in (ETHERTYPE_IPV4, ETHERTYPE_IPV6):
+        return None
+    return data[offset:]
+
+
+def _tcp_segment(
+    packet: bytes,
+) -> tuple[str, int, str, int, int, int, bytes] | None:
+    """Return the addresses, ports, sequence, flags and payload of a TCP packet.
+
+    Returns None for packets that are not TCP and raises ValueError for packets
+    that are malformed or were truncated by the capture's snapshot length.
+    """
+    if not packet:
+        raise ValueError("Empty packet")
+    version = packet[0] >> 4
+    if version == 4:
+        header = (packet[0] & 0x0F) * 4
+        if header < 20 or len(packet) < header:
+            raise ValueError(f"Truncated IPv4 header: {len(packet)} < {header} bytes")
+        # only the first fragment has the TCP header, later ones are skipped
+        if packet[9] != PROTOCOL_TCP or int.from_bytes(packet[6:8], "big") & 0x1FFF:
+            return None
+        end = int.from_bytes(packet[2:4], "big") or len(packet)
+        source, destination = _ipv4(packet[12:16]), _ipv4(packet[16:20])
+    elif version == 6:
+        if len(packet) < 40:
+            raise ValueError(f"Truncated IPv6 header: {len(packet)} < 40 bytes")
+        # extension headers are not followed, the spa modules do not send them
+        if packet[6] != PROTOCOL_TCP:
+            return None
+        header, end = 40, 40 + int.from_bytes(packet[4:6], "big")
+        source, destination = _ipv6(packet[8:24]), _ipv6(packet[24:40])
+    else:
+        return None
+    # link layer padding may follow the packet, but nothing may be missing
+    if end > len(packet) or end < header + 20:
+        raise ValueError(f"Truncated TCP segment: {len(packet)} of {end} bytes")
+    segment = packet[header:end]
+    source_port, destination_port, sequence = struct.unpack("!HHI", segment[:8])
+    offset, flags = (segment[12] >> 4) * 4, segment[13]
+    if offset < 20 or len(segment) < offset:
+        raise ValueError(f"Invalid TCP data offset: {offset} of {len(segment)} bytes")
+    return (
+        source,
+        source_port,
+        destination,
+        destination_port,
+        sequence,
+        flags,
+        segment[offset:],
+    )
+
+
+def _ipv4(address: bytes) -> str:
+    """Format an IPv4 address."""
+    return ".".join(str(byte) for byte in address)
+
+
+def _ipv6(address: bytes) -> str:
+    """Format an IPv6 address, without compressing zeros."""
+    return ":".join(address[i : i + 2].hex() for i in range(0, 16, 2))
+
+
+class TcpStream:
+    """Reassemble one direction of a TCP connection into in-order bytes.
+
+    Retransmitted bytes are dropped and out of order segments are held until the
+    gap before them is filled. If more than `MAX_PENDING_SEGMENTS` are waiting the
+    missing bytes are given up on and the decoder resynchronizes on the next frame.
+    """
+
+    __slots__ = ("_next", "_pending", "gaps")
+
+    def __init__(self) -> None:
+        """Initialize a stream."""
+        self._next: int | None = None
+        self._pending: dict[int, bytes] = {}
+        self.gaps = 0
+
+    def segment(self, sequence: int, payload: bytes, flags: int) -> list[bytes]:
+        """Add a segment and return the bytes that are now in order."""
+        if flags & TCP_SYN:
+            self._next = (sequence + 1) % SEQUENCE_MODULO
+            self._pending.clear()
+            sequence = self._next
+        elif self._next is None:
+            # the capture started mid connection
+            self._next = sequence
+        if payload:
+            self._pending[sequence] = payload
+        chunks = self._drain()
+        if len(self._pending) > MAX_PENDING_SEGMENTS:
+            chunks.extend(self.flush())
+        return chunks
+
+    def flush(self) -> list[bytes]:
+        """Give up on missing bytes and return everything still held."""
+        chunks: list[bytes] = []
+        while self._pending:
+            current = self._next or 0
+            self._next = min(
+                self._pending, key=lambda seq: (seq - current) % SEQUENCE_MODULO
+            )
+            self.gaps += 1
+            chunks.extend(self._drain())
+        return chunks
+
+    def _drain(self) -> list[bytes]:
+        """Return the held bytes that continue the stream."""
+        assert self._next is not None
+        chunks = []
+        found = True
+        while found:
+            found = False
+            for sequence in list(self._pending):
+                ahead = (sequence - self._next) % SEQUENCE_MODULO
+                if 0 < ahead < SEQUENCE_MODULO // 2:
+                    continue
+                payload = self._pending.pop(sequence)
+                # a retransmission overlapping what was already delivered
+                overlap = (SEQUENCE_MODULO - ahead) % SEQUENCE_MODULO
+                if overlap < len(payload):
+                    chunks.append(payload[overlap:])
+                    self._next = (self._next + len(payload) - overlap) % (
+                        SEQUENCE_MODULO
+                    )
+                    found = True
+        return chunks
+
+
+class _Connection:
+    """The two directions of a captured connection to the spa."""
+
+    __slots__ = ("decoders", "name", "streams")
+
+    def __init__(self, name: str) -> None:
+        """Initialize a connection."""
+        self.name = name
+        self.streams = {DIRECTION_IN: TcpStream(), DIRECTION_OUT: TcpStream()}
+        self.decoders = {DIRECTION_IN: FrameDecoder(), DIRECTION_OUT: FrameDecoder()}
+
+    def flush(self, timestamp: float) -> Iterator[CapturedFrame]:
+        """Decode everything still held in both directions."""
+        for direction, stream in self.streams.items():
+            yield from self.frames(timestamp, direction, stream.flush())
+
+    def frames(
+        self, timestamp: float, direction: str, chunks: list[bytes]
+    ) -> Iterator[CapturedFrame]:
+        """Decode reassembled bytes of one direction."""
+        decoder = self.decoders[direction]
+        for chunk in chunks:
+            for frame in decoder.feed(chunk):
+                if isinstance(frame, bytes):
+                    yield CapturedFrame(timestamp, direction, frame, self.name)
+                else:
+                    yield CapturedFrame(
+                        timestamp, DIRECTION_ERROR, frame.data, self.name
+                    )
+
+
+def extract_frames(
+    packets: Iterable[Packet], port: int = DEFAULT_PORT
+) -> Iterator[CapturedFrame]:
+    """Reassemble the connections to `port` and yield the frames exchanged.
+
+    Frames sent by the spa are "in" and frames sent to it are "out", as in the
+    wire trace; bytes skipped while resynchronizing are yielded as "error".
+    """
+    connections: dict[tuple[str, int, str], _Connection] = {}
+    timestamp = 0.0
+    malformed = 0
+    for timestamp, linktype, data in packets:
+        if (packet := _ip_packet(linktype, data)) is None:
+            continue
+        try:
+            segment = _tcp_segment(packet)
+        except ValueError as err:
+            malformed += 1
+            _LOGGER.debug("## skipping packet at %.6f: %s", timestamp, err)
+            continue
+        if segment is None:
+            continue
+        source, source_port, destination, destination_port, sequence, flags, payload = (
+            segment
+        )
+        if source_port == port:
+            key, direction = (destination, destination_port, source), DIRECTION_IN
+        elif destination_port == port:
+            key, direction = (source, source_port, destination), DIRECTION_OUT
+        else:
+            continue
+        connection = connections.get(key)
+        if connection is None or (flags & TCP_SYN and direction == DIRECTION_OUT):
+            # a new connection, possibly reusing the port of an earlier one
+            if connection is not None:
+                yield from connection.flush(timestamp)
+            connection = connections[key] = _Connection(f"{key[0]}:{key[1]}")
+        stream = connection.streams[direction]
+        chunks = stream.segment(sequence, payload, flags)
+        if flags & TCP_FIN:
+            chunks.extend(stream.flush())
+        yield from connection.frames(timestamp, direction, chunks)
+        if flags & TCP_RST:
+            yield from connection.flush(timestamp)
+            del connections[key]
+    for connection in connections.values():
+        yield from connection.flush(timestamp)
+    if malformed:
+        _LOGGER.warning("## skipped %s malformed or truncated packets", malformed)
+
+
+def read_replay(file: Iterable[str]) -> Iterator[CapturedFrame]:
+    """Read the frames of a replay file."""
+    for line in file:
+        if not (line := line.strip()) or line.startswith("#"):
+            continue
+        timestamp, direction, data = line.split()
+        yield CapturedFrame(float(timestamp), direction, bytes.fromhex(data))
+
+
+def write_replay(frames: Iterable[CapturedFrame], file: BinaryIO) -> int:
+    """Write frames to a replay file and return the number written."""
+    count = 0
+    for frame in frames:
+        file.write(frame.format().encode() + b"\n")
+        count += 1
+    return count
+
+
+def read_frames(path: str, port: int = DEFAULT_PORT) -> Iterator[CapturedFrame]:
+    """Read the frames of a pcap, pcapng or replay file, one at a time."""
+    with open(path, "rb") as file:
+        magic = file.read(4)
+        file.seek(0)
+        if magic == PCAPNG_MAGIC or magic in PCAP_MAGIC:
+            yield from extract_frames(read_packets(file), port)
+        else:
+            yield from read_replay(line.decode() for line in file)
+
+
+class ReplayTransport(MemoryTransport):
+    """Play the frames a spa sent in a capture to a client.
+
+    The client connects as usual and its parsers handle every received frame;
+    anything it sends is ignored. The connection stays open once the capture is
+    played, so the client keeps the final state.
+    """
+
+    def __init__(
+        self, path: str, *, speed: float = 0, port: int = DEFAULT_PORT
+    ) -> None:
+        """Initialize a replay transport.
+
+        path: A pcap, pcapng or replay file
+        speed: How much faster than captured to play, or 0 to play without delay
+        port: The spa port in a pcap or pcapng file
+        """
+        super().__init__(self._play)
+        self._path = path
+        self._speed = speed
+        self._port = port
+        self.frames_played = 0
+
+    async def _play(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Write the captured frames, then discard whatever the client sends."""
+        previous: float | None = None
+        for frame in read_frames(self._path, self._port):
+            if frame.direction != DIRECTION_IN:
+                continue
+            if self._speed and previous is not None:
+                await asyncio.sleep(max(frame.timestamp - previous, 0) / self._speed)
+            previous = frame.timestamp
+            writer.write(MESSAGE_DELIMETER_BYTE + frame.data + MESSAGE_DELIMETER_BYTE)
+            self.frames_played += 1
+            # let the client parse each frame, so large captures are not buffered
+            await asyncio.sleep(0)
+        while await reader.read(READ_SIZE):
+            pass
+
+
+def main() -> None:
+    """Summarize a capture and optionally write its frames to a replay file."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="pcap or pcapng file")
+    parser.add_argument("replay", nargs="?", help="replay file to write")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    counts: Counter[tuple[str, str]] = Counter()
+
+    def _count(frames: Iterable[CapturedFrame]) -> Iterator[CapturedFrame]:
+        for frame in frames:
+            name = (
+                f"{len(frame.data)} bytes"
+                if frame.direction == DIRECTION_ERROR
+                else message_type_name(frame.data[3])
+            )
+            counts[(frame.direction, name)] += 1
+            yield frame
+
+    frames = _count(read_frames(args.capture, args.port))
+    if args.replay:
+        with open(args.replay, "wb") as file:
+            write_replay(frames, file)
+    else:
+        for _ in frames:
+            pass
+    for (direction, name), count in sorted(counts.items()):
+        print(f"{direction:>5} {name:<24}{count:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,14 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from collections.abc import AsyncGenerator
 from datetime import datetime, time, timedelta
 from random import uniform
 from typing import Any, Callable, TypeVar, cast
 
+from .cache import DiscoveryCache, async_discover_cached
 from .control import EVENT_UPDATE, EventMixin, FaultLog, HeatModeSpaControl, SpaControl
-from .discovery import async_discover
+from .discovery import DiscoveredSpa, async_discover
 from .enums import (
     AccessibilityType,
     ControlType,
@@ -27,6 +29,25 @@ from .exceptions import (
     SpaConnectionError,
     SpaMessageError,
 )
+from .framing import FrameDecoder
+from .governor import ReconnectGovernor
+from .keepalive import DEFAULT_IDLE_TIMEOUT, DEFAULT_KEEPALIVE_INTERVAL, KeepalivePolicy
+from .metrics import SpaMetrics
+from .snapshot import (
+    UPDATE_POLICIES,
+    UPDATES_DROP_OLDEST,
+    UPDATES_LATEST_ONLY,
+    SpaSnapshot,
+)
+from .tracing import (
+    DEFAULT_COMMAND_TIMEOUT,
+    STAGE_TIMEOUT,
+    CommandTrace,
+    CommandTracker,
+    LatencyHistogram,
+    TraceHook,
+)
+from .transport import SpaTransport, TcpTransport
 from .utils import (
     byte_parser,
     calculate_checksum,
@@ -34,14 +55,17 @@ from .utils import (
     calculate_time_difference,
     cancel_task,
     default,
-    read_one_message,
     to_celsius,
     utcnow,
 )
+from .wiretrace import DEFAULT_WIRE_TRACE_SIZE, WireTrace
 
 _LOGGER = logging.getLogger(__name__)
 _T = TypeVar("_T")
 
+WIRE_TRACE_ERROR_STREAK = 3
+READ_SIZE = 4096
+
 DEFAULT_PORT = 4257
 MESSAGE_DELIMETER_BYTE = b"~"
 MESSAGE_DELIMETER = MESSAGE_DELIMETER_BYTE[0]
@@ -57,12 +81,104 @@ ACCESSIBILITY_TYPE_MAP = {
 class SpaClient(EventMixin):
     """Spa client."""
 
+    __slots__ = (
+        "_accessibility_type",
+        "_bootstrap_task",
+        "_commands",
+        "_configuration_loaded",
+        "_configuration_signature",
+        "_connection_monitor",
+        "_controls",
+        "_current_setup",
+        "_device_configuration_loaded",
+        "_dip_switch",
+        "_disconnect",
+        "_error_streak",
+        "_fault",
+        "_filter_cycle_1_duration",
+        "_filter_cycle_1_end",
+        "_filter_cycle_1_running",
+        "_filter_cycle_1_start",
+        "_filter_cycle_2_duration",
+        "_filter_cycle_2_enabled",
+        "_filter_cycle_2_end",
+        "_filter_cycle_2_running",
+        "_filter_cycle_2_start",
+        "_filter_cycle_loaded",
+        "_frame_hooks",
+        "_governor",
+        "_heat_state",
+        "_heater_type",
+        "_high_range",
+        "_host",
+        "_idigi_device_id",
+        "_is_24_hour",
+        "_keepalive",
+        "_keepalive_task",
+        "_last_log_mesage",
+        "_last_message_received",
+        "_last_message_sent",
+        "_listener",
+        "_low_range",
+        "_mac_address",
+        "_metrics",
+        "_model",
+        "_module_identification_loaded",
+        "_port",
+        "_previous_status",
+        "_pump_count",
+        "_reader",
+        "_setup_parameters_loaded",
+        "_snapshot",
+        "_software_version",
+        "_state",
+        "_state_updated",
+        "_system_information_loaded",
+        "_target_temperature",
+        "_temperature",
+        "_temperature_range",
+        "_temperature_unit",
+        "_time_hour",
+        "_time_minute",
+        "_time_offset",
+        "_transport",
+        "_voltage",
+        "_wifi_state",
+        "_wire_trace",
+        "_writer",
+    )
+
     def __init__(
-        self, host: str, port: int = DEFAULT_PORT, *, mac_address: str | None = None
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        *,
+        mac_address: str | None = None,
+        keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        governor: ReconnectGovernor | None = None,
+        command_timeout: float = DEFAULT_COMMAND_TIMEOUT,
+        wire_trace_size: int = DEFAULT_WIRE_TRACE_SIZE,
+        transport: SpaTransport | None = None,
     ) -> None:
-        """Initialize a spa client."""
+        """Initialize a spa client.
+
+        keepalive_interval: The base number of seconds of silence before a device
+        present message is sent; adapts to link quality at runtime
+        idle_timeout: The number of seconds without any received message before the
+        connection is considered dead and re-established
+        governor: An optional reconnect governor shared with other clients to limit
+        concurrent connection attempts and configuration bootstraps
+        command_timeout: The number of seconds to wait for a status update confirming
+        a command before it is recorded as timed out
+        wire_trace_size: The number of recent raw frames kept for dumping when
+        message errors repeat, the connection drops or a command times out
+        transport: The transport opening the connection to `host` and `port`,
+        TCP by default
+        """
         self._host = host
         self._port = port
+        self._transport = transport or TcpTransport()
 
         self._device_configuration_loaded = False
         self._filter_cycle_loaded = False
@@ -80,7 +196,17 @@ class SpaClient(EventMixin):
         self._reader: asyncio.StreamReader | None = None
         self._writer: asyncio.StreamWriter | None = None
         self._connection_monitor: asyncio.Task | None = None
+        self._bootstrap_task: asyncio.Task | None = None
         self._listener: asyncio.Task | None = None
+        self._keepalive_task: asyncio.Task | None = None
+        self._keepalive = KeepalivePolicy(keepalive_interval, idle_timeout)
+        self._governor = governor
+        self._metrics = SpaMetrics()
+        self._commands = CommandTracker(command_timeout)
+        self._commands.add_hook(self._dump_on_timeout)
+        self._wire_trace = WireTrace(wire_trace_size)
+        self._error_streak = 0
+        self._frame_hooks: list[Callable[[bytes], None]] = []
 
         self._controls: list[SpaControl] = [
             HeatModeSpaControl(self),
@@ -139,6 +265,9 @@ class SpaClient(EventMixin):
         # fault log
         self._fault: FaultLog | None = None
 
+        self._snapshot: SpaSnapshot | None = None
+        self._state_updated: datetime | None = None
+
     def _require_configured(self, value: _T | None) -> _T:
         """Ensure the given value is set before returning it, otherwise raise an error."""
         if value is None:
@@ -150,6 +279,15 @@ class SpaClient(EventMixin):
         """Return the host address."""
         return self._host
 
+    def update_host(self, host: str) -> None:
+        """Update the host address, reconnecting if currently connected."""
+        if host == self._host:
+            return
+        _LOGGER.debug("%s -- host changed to %s", self._host, host)
+        self._host = host
+        if self._writer is not None:
+            self._writer.transport.abort()
+
     @property
     def available(self) -> bool:
         """Return True if the client is connected and available."""
@@ -162,7 +300,56 @@ class SpaClient(EventMixin):
         """Return `True` if the client is connected."""
         if self._writer is None:
             return False
-        return self._writer.transport.is_reading()  # type: ignore
+        # not is_reading(), which is also false while reading is paused because
+        # the reader buffer is full
+        return not self._writer.transport.is_closing()
+
+    @property
+    def metrics(self) -> SpaMetrics:
+        """Return the connection metrics."""
+        return self._metrics
+
+    @property
+    def wire_trace(self) -> WireTrace:
+        """Return the trace of recent raw frames."""
+        return self._wire_trace
+
+    @property
+    def command_latency(self) -> dict[str, LatencyHistogram]:
+        """Return the command confirmation latency histograms by command."""
+        return self._commands.histograms
+
+    def add_trace_hook(self, hook: TraceHook) -> Callable[[], None]:
+        """Register a hook called with each command trace at every lifecycle stage.
+
+        Stages are queued, written, drained and then confirmed or timeout.
+        """
+        return self._commands.add_hook(hook)
+
+    def add_frame_hook(self, hook: Callable[[bytes], None]) -> Callable[[], None]:
+        """Register a hook called with every valid frame received from the spa.
+
+        Frames are passed without the delimiters, before they are parsed. Hooks run
+        in the listener and must not block; their errors are logged.
+        """
+        self._frame_hooks.append(hook)
+
+        def remove() -> None:
+            """Remove the hook."""
+            if hook in self._frame_hooks:
+                self._frame_hooks.remove(hook)
+
+        return remove
+
+    def trace_command(
+        self, command: str, predicate: Callable[[], bool]
+    ) -> CommandTrace:
+        """Create a trace for a command that is confirmed once `predicate` is true.
+
+        Tracing starts when the command is written by `send_message`, so a command
+        that is never sent does not time out.
+        """
+        return CommandTrace(command, predicate)
 
     @property
     def last_message_received(self) -> datetime | None:
@@ -377,6 +564,68 @@ class SpaClient(EventMixin):
         """Return `True` if the configuration is loaded."""
         return self._configuration_loaded.is_set()
 
+    def snapshot(self) -> SpaSnapshot:
+        """Return an immutable snapshot of the current state.
+
+        The same snapshot is returned until a message changes the state.
+        """
+        if (snapshot := self._snapshot) is None:
+            snapshot = self._snapshot = SpaSnapshot(
+                updated=self._state_updated,
+                model=self._model,
+                mac_address=self._mac_address,
+                state=self._state,
+                temperature_unit=self._temperature_unit,
+                temperature=self._temperature,
+                target_temperature=self._target_temperature,
+                temperature_minimum=self.temperature_minimum,
+                temperature_maximum=self.temperature_maximum,
+                heat_state=self._heat_state,
+                time_hour=self._time_hour,
+                time_minute=self._time_minute,
+                is_24_hour=self._is_24_hour,
+                filter_cycle_1_running=self._filter_cycle_1_running,
+                filter_cycle_2_running=self._filter_cycle_2_running,
+                wifi_state=self._wifi_state,
+                controls=tuple(
+                    (control.name, control.state) for control in self._controls
+                ),
+            )
+        return snapshot
+
+    async def updates(
+        self, maxsize: int = 16, policy: str = UPDATES_DROP_OLDEST
+    ) -> AsyncGenerator[SpaSnapshot, None]:
+        """Iterate over snapshots of the spa state as it is updated.
+
+        Snapshots are queued without blocking the listener, so a slow consumer
+        only ever falls behind by `maxsize` snapshots. Iteration ends once the
+        client is disconnected.
+
+        maxsize: The most snapshots to queue
+        policy: "drop_oldest" to drop the oldest queued snapshot when the queue is
+            full, or "latest_only" to only ever keep the most recent snapshot
+        """
+        if policy not in UPDATE_POLICIES:
+            raise ValueError(f"Invalid update policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        queue: asyncio.Queue[SpaSnapshot | None] = asyncio.Queue(
+            1 if policy == UPDATES_LATEST_ONLY else maxsize
+        )
+
+        def _enqueue() -> None:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None if self._disconnect else self.snapshot())
+
+        unsubscribe = self.on(EVENT_UPDATE, _enqueue)
+        try:
+            while (snapshot := await queue.get()) is not None:
+                yield snapshot
+        finally:
+            unsubscribe()
+
     def get_current_time(self) -> datetime:
         """Return the current time."""
         return datetime.now() + self._time_offset
@@ -424,9 +673,7 @@ class SpaClient(EventMixin):
 
         _LOGGER.debug("%s -- establishing connection", self._host)
         try:
-            self._reader, self._writer = await asyncio.wait_for(
-                asyncio.open_connection(self._host, self._port), 10
-            )
+            self._reader, self._writer = await self._open_connection()
         except (
             asyncio.TimeoutError,
             ConnectionRefusedError,
@@ -435,12 +682,19 @@ class SpaClient(EventMixin):
         ) as err:
             msg = "Timed out" if isinstance(err, asyncio.TimeoutError) else err
             _LOGGER.error("%s ## cannot connect: %s", self._host, msg)
+            self._metrics.connect_failures += 1
         except Exception as ex:  # pylint: disable=broad-except
             _LOGGER.error("%s ## error connecting: %s", self._host, ex)
+            self._metrics.connect_failures += 1
         else:
             _LOGGER.debug("%s -- connected", self._host)
+            self._metrics.connects += 1
+            self._keepalive.reset()
             self._listener = asyncio.ensure_future(self._start_listener())
-            asyncio.ensure_future(self.request_all_configuration(True))
+            await cancel_task(self._keepalive_task)
+            self._keepalive_task = asyncio.ensure_future(self._start_keepalive())
+            await cancel_task(self._bootstrap_task)
+            self._bootstrap_task = asyncio.ensure_future(self._bootstrap())
             await cancel_task(self._connection_monitor)
 
             async def _monitor() -> None:
@@ -455,11 +709,44 @@ class SpaClient(EventMixin):
             self._connection_monitor = asyncio.ensure_future(_monitor())
         return self.connected
 
+    async def _open_connection(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open a connection, waiting for the governor if one is set."""
+        if self._governor is None:
+            return await self._transport.open(self._host, self._port)
+        async with self._governor.connect_slot():
+            return await self._transport.open(self._host, self._port)
+
+    async def _bootstrap(self) -> None:
+        """Request the configuration, waiting for the governor if one is set.
+
+        A bootstrap that times out releases its governor slot and queues again.
+        """
+        if self._governor is None:
+            await self.request_all_configuration(True)
+            return
+        while self.connected and not self._configuration_loaded.is_set():
+            try:
+                async with self._governor.bootstrap_slot():
+                    await asyncio.wait_for(
+                        self.request_all_configuration(True),
+                        self._governor.bootstrap_timeout,
+                    )
+            except asyncio.TimeoutError:
+                _LOGGER.error(
+                    "%s ## configuration not received after %s seconds",
+                    self._host,
+                    self._governor.bootstrap_timeout,
+                )
+
     async def disconnect(self) -> None:
         """Disconnect from the spa."""
         _LOGGER.debug("%s -- disconnect requested", self._host)
         self._disconnect = True
         await cancel_task(self._connection_monitor)
+        await cancel_task(self._keepalive_task)
+        await cancel_task(self._bootstrap_task)
         if self._writer is not None:
             self._writer.close()
             try:
@@ -467,41 +754,95 @@ class SpaClient(EventMixin):
             except Exception:  # pylint: disable=broad-except
                 pass
         await cancel_task(self._listener)
+        self._commands.cancel()
         self._reader = self._writer = None
+        self.emit(EVENT_UPDATE)
         _LOGGER.debug("%s -- disconnected", self._host)
 
     async def _start_listener(self) -> None:
         """Start the listener."""
-        timeout = 15
-        wait_time = timedelta(seconds=timeout)
         assert self._reader
+        decoder = FrameDecoder()
         while self.connected:
             try:
-                data = await read_one_message(self._reader, timeout)
-            except SpaMessageError as err:
-                _LOGGER.debug("%s ## %s", self._host, err)
-                continue
-            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
-                if not (sent := self._last_message_sent) or sent + wait_time < utcnow():
-                    self.emit(EVENT_UPDATE)
-                    await self.send_device_present()
+                chunk = await asyncio.wait_for(
+                    self._reader.read(READ_SIZE), self._keepalive.idle_timeout
+                )
+            except asyncio.TimeoutError:
                 continue
             except Exception as ex:  # pylint: disable=broad-except
                 _LOGGER.error("%s ## %s", self._host, ex)
                 continue
-            self._process_message(data)
+            if not chunk:
+                break
+            for data in decoder.feed(chunk):
+                if isinstance(data, SpaMessageError):
+                    self._message_error(data)
+                    continue
+                self._error_streak = 0
+                self._process_message(data)
+        if not self._disconnect:
+            self._wire_trace.dump(self._host, "connection lost")
         self.emit(EVENT_UPDATE)
         _LOGGER.debug("%s -- stopped listening", self._host)
 
+    def _message_error(self, err: SpaMessageError) -> None:
+        """Record bytes discarded while resynchronizing."""
+        _LOGGER.debug("%s ## %s", self._host, err)
+        self._keepalive.frame_error()
+        self._metrics.message_error(err.reason, err.discarded)
+        self._wire_trace.error(err.data)
+        self._error_streak += 1
+        if self._error_streak == WIRE_TRACE_ERROR_STREAK:
+            self._wire_trace.dump(self._host, "repeated message errors")
+
+    def _dump_on_timeout(self, trace: CommandTrace, stage: str) -> None:
+        """Dump the wire trace when a command is not confirmed."""
+        if stage == STAGE_TIMEOUT:
+            self._wire_trace.dump(self._host, f"{trace.command} timed out")
+
+    async def _start_keepalive(self) -> None:
+        """Send keepalives when the link is idle and drop it once it goes dead."""
+        keepalive = self._keepalive
+        while True:
+            await asyncio.sleep(keepalive.next_delay())
+            if not self.connected:
+                break
+            if keepalive.expired():
+                _LOGGER.debug(
+                    "%s ## no message received in %s seconds, reconnecting",
+                    self._host,
+                    keepalive.idle_timeout,
+                )
+                assert self._writer
+                self._writer.transport.abort()
+                break
+            if keepalive.tick():
+                self.emit(EVENT_UPDATE)
+                self._metrics.keepalives_sent += 1
+                await self.send_device_present()
+
     def _process_message(self, data: bytes) -> None:
         """Process a message."""
         self._last_message_received = utcnow()
+        self._keepalive.frame_received()
+        metrics = self._metrics
+        metrics.frames_received[data[3]] += 1
+        metrics.bytes_received += len(data) + 2
+        self._wire_trace.received(data)
+        for hook in self._frame_hooks:
+            try:
+                hook(data)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("%s ## error in frame hook %s", self._host, hook)
         message_type = self._log_message(data)
         data = data[4:-1]
 
         if message_type == MessageType.STATUS_UPDATE:
             self._parse_status_update(data)
-        elif message_type == MessageType.MODULE_IDENTIFICATION:
+            return
+        self._snapshot = None
+        if message_type == MessageType.MODULE_IDENTIFICATION:
             self._parse_module_identification(data)
         elif message_type == MessageType.FILTER_CYCLE:
             self._parse_filter_cycle(data)
@@ -688,9 +1029,14 @@ class SpaClient(EventMixin):
         """
         if data == self._previous_status and not reprocess:
             # No new information, so ignore it
+            self._metrics.duplicate_status += 1
+            if self._commands.pending:
+                self._commands.check()
             return
 
         self._previous_status = data
+        self._snapshot = None
+        self._state_updated = self._last_message_received
         self._state = SpaState(data[0])
         self._time_hour = data[3]
         self._time_minute = data[4]
@@ -738,6 +1084,9 @@ class SpaClient(EventMixin):
         if not self.configuration_loaded and not reprocess:
             self._check_configuration_loaded()
 
+        if self._commands.pending:
+            self._commands.check()
+
         self.emit(EVENT_UPDATE)
 
     def _update_control_states(
@@ -784,7 +1133,7 @@ class SpaClient(EventMixin):
     def _log_message(self, data: bytes) -> MessageType:
         """Log message and return message type."""
         message_type = MessageType(data[3])
-        if self._last_log_mesage != data:
+        if self._last_log_mesage != data and _LOGGER.isEnabledFor(logging.DEBUG):
             self._last_log_mesage = data
             _LOGGER.debug("%s -> %s: %s", self._host, message_type.name, data.hex())
         return message_type
@@ -852,9 +1201,15 @@ class SpaClient(EventMixin):
         await self.send_message(MessageType.DEVICE_PRESENT)
 
     async def send_message(
-        self, message_type: MessageType | None, *message: int
+        self,
+        message_type: MessageType | None,
+        *message: int,
+        trace: CommandTrace | None = None,
     ) -> None:
-        """Send a message to the spa with variable length."""
+        """Send a message to the spa with variable length.
+
+        trace: An optional command trace to record the written and drained stages
+        """
         if not self.connected:
             return
         if not message_type:
@@ -869,20 +1224,46 @@ class SpaClient(EventMixin):
         data[-2] = calculate_checksum(data[1:message_length])
         data[-1] = MESSAGE_DELIMETER
 
-        _LOGGER.debug(
-            "%s <- %s%s: %s",
-            self._host,
-            message_type.name,
-            f"_{SettingsCode(data[5]).name}"
-            if message_type == MessageType.REQUEST
-            else "",
-            data[1:-1].hex(),
-        )
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "%s <- %s%s: %s",
+                self._host,
+                message_type.name,
+                f"_{SettingsCode(data[5]).name}"
+                if message_type == MessageType.REQUEST
+                else "",
+                data[1:-1].hex(),
+            )
+        await self._write(data, trace)
+
+    async def send_frame(self, frame: bytes) -> None:
+        """Send a raw frame, given without the delimiters, to the spa."""
+        if not self.connected:
+            return
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "%s <- %s: %s", self._host, MessageType(frame[3]).name, frame.hex()
+            )
+        await self._write(MESSAGE_DELIMETER_BYTE + frame + MESSAGE_DELIMETER_BYTE)
+
+    async def _write(
+        self, data: bytes | bytearray, trace: CommandTrace | None = None
+    ) -> None:
+        """Write a delimited frame to the spa and wait for it to drain."""
+        self._wire_trace.sent(bytes(data[1:-1]))
         try:
             assert self._writer
             self._writer.write(data)
+            if trace:
+                self._commands.begin(trace)
+                self._commands.written(trace)
             await self._writer.drain()
+            if trace:
+                self._commands.drained(trace)
             self._last_message_sent = utcnow()
+            self._keepalive.frame_sent()
+            self._metrics.frames_sent += 1
+            self._metrics.bytes_sent += len(data)
         except Exception as ex:  # pylint: disable=broad-except
             _LOGGER.error("%s ## error sending message: %s", self._host, ex)
 
@@ -1028,9 +1409,17 @@ class SpaClient(EventMixin):
             raise ValueError(
                 f"Invalid temperature: {temperature} (expected {low}..{high})"
             )
-        if self._temperature_unit == TemperatureUnit.CELSIUS:
-            temperature *= 2
-        await self.send_message(MessageType.SET_TEMPERATURE, int(temperature))
+        divisor = 2 if self._temperature_unit == TemperatureUnit.CELSIUS else 1
+        value = int(temperature * divisor)
+        # compare the encoded value, the spa reports what was sent, not the float
+        trace = self.trace_command(
+            "set_temperature",
+            lambda: (
+                self._target_temperature is not None
+                and round(self._target_temperature * divisor) == value
+            ),
+        )
+        await self.send_message(MessageType.SET_TEMPERATURE, value, trace=trace)
 
     async def set_temperature_range(self, temperature_range: LowHighRange) -> None:
         """Set the temperature range."""
@@ -1062,11 +1451,34 @@ class SpaClient(EventMixin):
 
     @classmethod
     async def discover(
-        cls, return_once_found: bool = False, *, timeout: int = 10
+        cls,
+        return_once_found: bool = False,
+        *,
+        timeout: int = 10,
+        cache: DiscoveryCache | None = None,
     ) -> list[SpaClient]:
         """Discover spas on the network within a specified timeout.
 
         If return_once_found is True, the first spa found will stop the scan.
+
+        If a cache is provided and holds unexpired spas, clients for them are
+        returned immediately while discovery refreshes the cache in the background
+        and updates the host of any client whose spa has changed address.
         """
-        spas = await async_discover(return_once_found, timeout=timeout)
-        return [cls(spa.address, mac_address=spa.mac_address) for spa in spas]
+        if cache is None:
+            spas = await async_discover(return_once_found, timeout=timeout)
+            return [cls(spa.address, mac_address=spa.mac_address) for spa in spas]
+
+        clients: dict[str, SpaClient] = {}
+
+        def _validated(found: list[DiscoveredSpa]) -> None:
+            for spa in found:
+                if client := clients.get(spa.mac_address):
+                    client.update_host(spa.address)
+
+        spas = await async_discover_cached(
+            cache, return_once_found, timeout=timeout, on_validated=_validated
+        )
+        for spa in spas:
+            clients[spa.mac_address] = cls(spa.address, mac_address=spa.mac_address)
+        return list(clients.values())
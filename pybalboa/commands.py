@@ -0,0 +1,71 @@
+"""Balboa spa commands from JSON compatible values."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import time, timedelta
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .client import SpaClient
+    from .control import SpaControl
+
+COMMAND_SET_STATE = "set_state"
+COMMAND_SET_TEMPERATURE = "set_temperature"
+COMMAND_CONFIGURE_FILTER_CYCLE = "configure_filter_cycle"
+COMMANDS = (COMMAND_SET_STATE, COMMAND_SET_TEMPERATURE, COMMAND_CONFIGURE_FILTER_CYCLE)
+
+
+def find_control(client: SpaClient, name: str) -> SpaControl:
+    """Return the control with a name like "Pump 1", ignoring case."""
+    folded = name.casefold()
+    for control in client.controls:
+        if control.name.casefold() == folded:
+            return control
+    raise ValueError(f"Unknown control: {name}")
+
+
+def parse_state(control: SpaControl, state: Any) -> IntEnum:
+    """Return the option of a control matching a state name or value."""
+    for option in control.options:
+        if isinstance(state, str):
+            if option.name.casefold() == state.casefold():
+                return option
+        elif option == state:
+            return option
+    raise ValueError(f"Invalid state for {control.name}: {state}")
+
+
+async def execute_command(
+    client: SpaClient, command: str, arguments: Mapping[str, Any]
+) -> None:
+    """Execute a command with JSON compatible arguments.
+
+    set_state: control (name) and state (name or value)
+    set_temperature: temperature
+    configure_filter_cycle: filter_cycle and any of start and end ("HH:MM"),
+    duration (minutes) and enabled
+    """
+    try:
+        if command == COMMAND_SET_STATE:
+            control = find_control(client, arguments["control"])
+            if not await control.set_state(parse_state(control, arguments["state"])):
+                raise ValueError(f"Unable to set the state of {control.name}")
+        elif command == COMMAND_SET_TEMPERATURE:
+            await client.set_temperature(float(arguments["temperature"]))
+        elif command == COMMAND_CONFIGURE_FILTER_CYCLE:
+            start, end, duration = (
+                arguments.get(key) for key in ("start", "end", "duration")
+            )
+            await client.configure_filter_cycle(
+                int(arguments["filter_cycle"]),
+                start=None if start is None else time.fromisoformat(start),
+                end=None if end is None else time.fromisoformat(end),
+                duration=None if duration is None else timedelta(minutes=duration),
+                enabled=arguments.get("enabled"),
+            )
+        else:
+            raise ValueError(f"Unknown command: {command}")
+    except KeyError as err:
+        raise ValueError(f"Missing argument for {command}: {err}") from err
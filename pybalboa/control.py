@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from collections.abc import Callable
+from concurrent.futures import Executor
 from dataclasses import InitVar, dataclass, field
 from datetime import datetime, time, timedelta
 from enum import IntEnum
+from functools import cache
+from time import perf_counter
 from typing import TYPE_CHECKING, Any, Final
 
 from .enums import (
@@ -19,9 +23,11 @@ from .enums import (
     ToggleItemCode,
     UnknownState,
 )
+from .utils import add_slots
 
 if TYPE_CHECKING:
     from .client import SpaClient
+    from .tracing import CommandTrace
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -44,6 +50,8 @@ STATE_OPTIONS_MAP: dict[int, list[IntEnum]] = {
 
 EVENT_UPDATE = "update"
 
+DEFAULT_LISTENER_CONCURRENCY = 16
+
 FAULT_LOG_ERROR_CODES: Final[dict[int, str]] = {
     15: "Sensors are out of sync",
     16: "The water flow is low",
@@ -67,34 +75,408 @@ FAULT_LOG_ERROR_CODES: Final[dict[int, str]] = {
 }
 
 
+class Listener:
+    """Registered event listener and its execution statistics."""
+
+    __slots__ = (
+        "active",
+        "callback",
+        "calls",
+        "coalesced",
+        "debounce",
+        "errors",
+        "handle",
+        "is_coroutine",
+        "leading",
+        "pending",
+        "queued",
+        "threaded",
+        "throttle",
+        "time_max",
+        "time_total",
+        "trailing",
+    )
+
+    def __init__(
+        self,
+        callback: Callable,
+        threaded: bool = False,
+        *,
+        debounce: float | None = None,
+        throttle: float | None = None,
+        leading: bool | None = None,
+        trailing: bool = True,
+    ) -> None:
+        """Initialize a listener."""
+        self.callback = callback
+        self.is_coroutine = asyncio.iscoroutinefunction(callback)
+        self.threaded = threaded and not self.is_coroutine
+        self.debounce = debounce
+        self.throttle = throttle
+        # a throttled listener fires on the leading edge by default, a debounced
+        # listener only once the burst is over
+        self.leading = throttle is not None if leading is None else leading
+        self.trailing = trailing
+        self.handle: asyncio.TimerHandle | None = None
+        self.pending: tuple[tuple[Any, ...], dict[str, Any]] | None = None
+        # coroutine invocations in flight, and the latest event held back
+        # once too many are
+        self.active = 0
+        self.queued: tuple[tuple[Any, ...], dict[str, Any]] | None = None
+        self.calls = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.time_total = 0.0
+        self.time_max = 0.0
+
+    def __repr__(self) -> str:
+        """Return repr(self)."""
+        return f"{getattr(self.callback, '__qualname__', self.callback)}: {self.calls}"
+
+    def observe(self, elapsed: float, failed: bool = False) -> None:
+        """Record a call that took `elapsed` seconds."""
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.time_total += elapsed
+        self.time_max = max(self.time_max, elapsed)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics as a dictionary."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "time_total": self.time_total,
+            "time_max": self.time_max,
+        }
+
+
+class _Dispatch:
+    """How listeners are run outside of the emitter."""
+
+    __slots__ = ("executor", "max_concurrency", "semaphore", "tasks")
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_LISTENER_CONCURRENCY,
+        executor: Executor | None = None,
+    ) -> None:
+        """Initialize listener dispatch options."""
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        self.semaphore: asyncio.Semaphore | None = None
+        self.tasks: set[asyncio.Future] = set()
+
+
 class EventMixin:
-    """Event mixin."""
+    """Event mixin.
+
+    Synchronous listeners run inline unless registered with `threaded`, which
+    runs them in an executor, or with `debounce` or `throttle`, which calls them
+    from loop timers. Coroutine listeners can not run inline, so they are
+    scheduled as tasks, at most `max_concurrency` running at once; events that
+    arrive while a listener has that many in flight are coalesced into its
+    latest one. Listener errors are logged and counted rather than raised into
+    the emitter. Without a running loop, debounced, throttled and threaded
+    listeners are called inline and coroutine listeners are skipped.
+    """
 
-    _listeners: dict[str, list[Callable]] = {}
+    __slots__ = ("__weakref__", "_dispatch", "_listeners")
+
+    _listeners: dict[str, list[Listener]]
+    _dispatch: _Dispatch
 
     def on(  # pylint: disable=invalid-name
-        self, event_name: str, callback: Callable
+        self,
+        event_name: str,
+        callback: Callable,
+        *,
+        threaded: bool = False,
+        debounce: float | None = None,
+        throttle: float | None = None,
+        leading: bool | None = None,
+        trailing: bool = True,
     ) -> Callable:
-        """Register an event callback."""
-        listeners: list = self._listeners.setdefault(event_name, [])
-        listeners.append(callback)
+        """Register an event callback.
+
+        threaded: Run a synchronous callback in the listener executor
+        debounce: Only call back once no event has been emitted for this many seconds
+        throttle: Call back at most once every this many seconds
+        leading: Call back on the first event of a burst, by default only when
+            throttled
+        trailing: Call back with the last event of a burst
+        """
+        if debounce is not None and throttle is not None:
+            raise ValueError("Use either debounce or throttle, not both")
+        if (debounce is not None or throttle is not None) and not (leading or trailing):
+            raise ValueError("At least one of leading or trailing is required")
+        try:
+            events = self._listeners
+        except AttributeError:  # listeners are created per instance on first use
+            events = self._listeners = {}
+        listeners = events.setdefault(event_name, [])
+        listener = Listener(
+            callback,
+            threaded,
+            debounce=debounce,
+            throttle=throttle,
+            leading=leading,
+            trailing=trailing,
+        )
+        listeners.append(listener)
 
         def unsubscribe() -> None:
             """Unsubscribe listeners."""
-            if callback in listeners:
-                listeners.remove(callback)
+            if listener in listeners:
+                listeners.remove(listener)
+            if listener.handle is not None:
+                listener.handle.cancel()
+                listener.handle = None
 
         return unsubscribe
 
+    def set_listener_options(
+        self,
+        *,
+        max_concurrency: int = DEFAULT_LISTENER_CONCURRENCY,
+        executor: Executor | None = None,
+    ) -> None:
+        """Set how listeners are run.
+
+        max_concurrency: The most coroutine listeners running at once
+        executor: The executor for threaded listeners, or the loop default if None
+        """
+        self._dispatch = _Dispatch(max_concurrency, executor)
+
+    def listeners(self, event_name: str) -> list[Listener]:
+        """Return the listeners registered for an event."""
+        try:
+            return [*self._listeners.get(event_name, [])]
+        except AttributeError:
+            return []
+
     def emit(self, event_name: str, *args: Any, **kwargs: dict[str, Any]) -> None:
         """Run all callbacks for an event."""
-        for listener in self._listeners.get(event_name, []):
-            listener(*args, **kwargs)
+        try:
+            listeners = self._listeners.get(event_name)
+        except AttributeError:
+            return
+        if not listeners:
+            return
+        for listener in [*listeners]:
+            if listener.debounce is not None:
+                self._debounce_listener(event_name, listener, args, kwargs)
+            elif listener.throttle is not None:
+                self._throttle_listener(event_name, listener, args, kwargs)
+            else:
+                self._call_listener(event_name, listener, args, kwargs)
+
+    def _call_listener(
+        self,
+        event_name: str,
+        listener: Listener,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Call a listener the way its callback needs to be run."""
+        if listener.is_coroutine:
+            self._schedule_listener(event_name, listener, args, kwargs)
+        elif listener.threaded and (loop := _running_loop()) is not None:
+            self._offload_listener(loop, event_name, listener, args, kwargs)
+        else:
+            _run_listener(event_name, listener, args, kwargs)
+
+    def _debounce_listener(
+        self,
+        event_name: str,
+        listener: Listener,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Call a listener once events stop arriving."""
+        assert listener.debounce is not None
+        if (loop := _running_loop()) is None:
+            self._call_listener(event_name, listener, args, kwargs)
+            return
+        if listener.handle is not None:
+            listener.handle.cancel()
+            listener.pending = (args, kwargs)
+        elif listener.leading:
+            self._call_listener(event_name, listener, args, kwargs)
+        else:
+            listener.pending = (args, kwargs)
+
+        def _quiet() -> None:
+            listener.handle = None
+            if listener.pending is not None and listener.trailing:
+                self._call_listener(event_name, listener, *listener.pending)
+            listener.pending = None
+
+        listener.handle = loop.call_later(listener.debounce, _quiet)
+
+    def _throttle_listener(
+        self,
+        event_name: str,
+        listener: Listener,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Call a listener at most once per throttle window."""
+        throttle = listener.throttle
+        assert throttle is not None
+        if (loop := _running_loop()) is None:
+            self._call_listener(event_name, listener, args, kwargs)
+            return
+        if listener.handle is not None:
+            listener.pending = (args, kwargs)
+            return
+
+        def _window_end() -> None:
+            listener.handle = None
+            if listener.pending is not None and listener.trailing:
+                self._call_listener(event_name, listener, *listener.pending)
+                # keep the rate limit for events right after the trailing call
+                listener.handle = loop.call_later(throttle, _window_end)
+            listener.pending = None
+
+        if listener.leading:
+            self._call_listener(event_name, listener, args, kwargs)
+        else:
+            listener.pending = (args, kwargs)
+        listener.handle = loop.call_later(throttle, _window_end)
+
+    def _get_dispatch(self) -> _Dispatch:
+        """Return the listener dispatch options."""
+        try:
+            return self._dispatch
+        except AttributeError:
+            dispatch = self._dispatch = _Dispatch()
+            return dispatch
+
+    def _schedule_listener(
+        self,
+        event_name: str,
+        listener: Listener,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Run a coroutine listener as a task, coalescing events beyond the limit."""
+        if (loop := _running_loop()) is None:
+            listener.errors += 1
+            _LOGGER.error("No running loop for %s listener %s", event_name, listener)
+            return
+        dispatch = self._get_dispatch()
+        if listener.active >= dispatch.max_concurrency:
+            listener.coalesced += listener.queued is not None
+            listener.queued = (args, kwargs)
+            return
+        if dispatch.semaphore is None:
+            dispatch.semaphore = asyncio.Semaphore(dispatch.max_concurrency)
+        semaphore = dispatch.semaphore
+
+        async def _run(args: tuple[Any, ...], kwargs: dict[str, Any]) -> None:
+            try:
+                while True:
+                    async with semaphore:
+                        start = perf_counter()
+                        failed = False
+                        try:
+                            await listener.callback(*args, **kwargs)
+                        except Exception:  # pylint: disable=broad-except
+                            failed = True
+                            _LOGGER.exception(
+                                "Error in %s listener %s", event_name, listener
+                            )
+                        listener.observe(perf_counter() - start, failed)
+                    if listener.queued is None:
+                        return
+                    (args, kwargs), listener.queued = listener.queued, None
+            finally:
+                listener.active -= 1
+
+        listener.active += 1
+        task = loop.create_task(_run(args, kwargs))
+        dispatch.tasks.add(task)
+        task.add_done_callback(dispatch.tasks.discard)
+
+    def _offload_listener(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        event_name: str,
+        listener: Listener,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Run a synchronous listener in the executor."""
+        dispatch = self._get_dispatch()
+        future = loop.run_in_executor(
+            dispatch.executor,
+            _run_listener,
+            event_name,
+            listener,
+            args,
+            kwargs,
+            loop,
+        )
+        dispatch.tasks.add(future)
+        future.add_done_callback(dispatch.tasks.discard)
+
+
+def _run_listener(
+    event_name: str,
+    listener: Listener,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> None:
+    """Run a synchronous listener, recording its time and any error.
+
+    loop: The loop to record the statistics on, when running in another thread
+    """
+    start = perf_counter()
+    failed = False
+    try:
+        listener.callback(*args, **kwargs)
+    except Exception:  # pylint: disable=broad-except
+        failed = True
+        _LOGGER.exception("Error in %s listener %s", event_name, listener)
+    if loop is None:
+        listener.observe(perf_counter() - start, failed)
+    else:
+        loop.call_soon_threadsafe(listener.observe, perf_counter() - start, failed)
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    """Return the running event loop, or `None` outside of one."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+@cache
+def _control_name(control_type: ControlType, index: int | None) -> str:
+    """Return a control name, shared by the same control of every spa."""
+    return f"{control_type.value}{'' if index is None else f' {index + 1}'}"
 
 
 class SpaControl(EventMixin):
     """Spa control."""
 
+    __slots__ = (
+        "_client",
+        "_code",
+        "_control_type",
+        "_custom_options",
+        "_index",
+        "_name",
+        "_options",
+        "_state",
+        "_state_value",
+        "_states",
+    )
+
     _options: list[IntEnum]
 
     def __init__(
@@ -110,7 +492,7 @@ class SpaControl(EventMixin):
         self._control_type = control_type
         self._index = index
 
-        self._name = f"{control_type.value}{'' if index is None else f' {index + 1}'}"
+        self._name = _control_name(control_type, index)
         self._code = CONTROL_TYPE_MAP[control_type]
         self._state_value = UnknownState.UNKNOWN.value
         self._state: IntEnum = UnknownState.UNKNOWN
@@ -186,16 +568,26 @@ class SpaControl(EventMixin):
         min_toggle = 1
         if self._state != UnknownState.UNKNOWN:
             min_toggle = max((state - self._state) % self._states, 1)
+        trace = self._trace_state(state)
         for _ in range(min_toggle):
             await self._client.send_message(
-                MessageType.TOGGLE_STATE, self._code + (self._index or 0)
+                MessageType.TOGGLE_STATE, self._code + (self._index or 0), trace=trace
             )
         return True
 
+    def _trace_state(self, state: int | IntEnum) -> CommandTrace:
+        """Start tracing a state change until the spa reports it."""
+        return self._client.trace_command(
+            f"set_state:{self._control_type.name.lower()}",
+            lambda: self._state == state,
+        )
+
 
 class HeatModeSpaControl(SpaControl):
     """Heat mode spa control."""
 
+    __slots__ = ()
+
     def __init__(self, client: SpaClient) -> None:
         """Initialize a heat mode spa control."""
         super().__init__(
@@ -213,11 +605,15 @@ class HeatModeSpaControl(SpaControl):
         if self._state == state:
             return True
         i = 2 if self.state == HeatMode.READY_IN_REST and state == HeatMode.READY else 1
+        trace = self._trace_state(state)
         for _ in range(i):
-            await self._client.send_message(MessageType.TOGGLE_STATE, self._code)
+            await self._client.send_message(
+                MessageType.TOGGLE_STATE, self._code, trace=trace
+            )
         return True
 
 
+@add_slots
 @dataclass
 class FaultLog:
     """Fault log."""
@@ -4,42 +4,272 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import socket
+import struct
+import sys
+from collections.abc import AsyncIterator, Callable, Iterable
 from dataclasses import dataclass
+from functools import partial
+from ipaddress import IPv4Network
+from itertools import islice
 from socket import AF_INET, IPPROTO_UDP
-from typing import Any
+from time import monotonic
+from typing import TYPE_CHECKING, Any
+
+from .control import EventMixin
+from .exceptions import SpaConfigurationNotLoadedError
+from .utils import add_slots, cancel_task
+
+if TYPE_CHECKING:
+    from .client import SpaClient
 
 _LOGGER = logging.getLogger(__name__)
 
 BROADCAST_ADDRESS = ("255.255.255.255", 30303)
 BROADCAST_MESSAGE = b"Discovery"
 BROADCAST_INTERVAL = 3
+DEFAULT_SWEEP_CONCURRENCY = 64
+SWEEP_BATCH_DELAY = 0.01
+
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+
+EVENT_ADDED = "added"
+EVENT_MOVED = "moved"
+EVENT_LOST = "lost"
 
 
 async def async_discover(
-    return_once_found: bool = False, *, timeout: int = 10
+    return_once_found: bool = False,
+    *,
+    timeout: float = 10,
+    all_interfaces: bool = False,
+    networks: Iterable[str] | None = None,
+    sweep_concurrency: int = DEFAULT_SWEEP_CONCURRENCY,
 ) -> list[DiscoveredSpa]:
-    """Discover spas on the network within a specified timeout."""
+    """Discover spas on the network within a specified timeout.
+
+    all_interfaces: Broadcast from every local IPv4 interface concurrently
+    networks: CIDR ranges to sweep with unicast discovery requests
+    sweep_concurrency: The number of unicast requests sent per batch
+
+    Raises ValueError if a network is not a valid IPv4 CIDR range.
+    """
+    targets = _parse_networks(networks)
+    session = _DiscoverySession(return_once_found=return_once_found)
+    try:
+        await session.start(all_interfaces, targets, sweep_concurrency)
+        await asyncio.wait_for(session.discovery_complete.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        if not session.spas:
+            _LOGGER.debug("Discovery timed out")
+    finally:
+        await session.close()
+
+    return list(session.spas.values())
+
+
+async def discover_stream(
+    *,
+    timeout: float = 10,
+    all_interfaces: bool = False,
+    networks: Iterable[str] | None = None,
+    sweep_concurrency: int = DEFAULT_SWEEP_CONCURRENCY,
+) -> AsyncIterator[DiscoveredSpa]:
+    """Yield spas as their discovery responses arrive within a specified timeout.
+
+    Each spa is yielded once, the first time a response from its MAC address is
+    received. See `async_discover` for the remaining options.
+    """
+    loop = asyncio.get_running_loop()
+    targets = _parse_networks(networks)
+    found: asyncio.Queue[DiscoveredSpa] = asyncio.Queue()
+    session = _DiscoverySession(on_found=found.put_nowait)
+    deadline = loop.time() + timeout
+    try:
+        await session.start(all_interfaces, targets, sweep_concurrency)
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                yield await asyncio.wait_for(found.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+    finally:
+        await session.close()
+
+
+def _parse_networks(networks: Iterable[str] | None) -> list[IPv4Network]:
+    """Parse CIDR ranges, raising ValueError for an invalid one."""
+    return [IPv4Network(network, strict=False) for network in networks or ()]
+
+
+def get_broadcast_addresses() -> list[tuple[str, str]]:
+    """Return (address, broadcast address) pairs for local IPv4 interfaces.
+
+    Interfaces can only be enumerated on Linux; elsewhere an empty list is returned.
+    """
+    return [
+        (address, str(network.broadcast_address))
+        for address, network in _get_interfaces()
+    ]
+
+
+def _get_interfaces() -> list[tuple[str, IPv4Network]]:
+    """Return (address, network) pairs for local IPv4 interfaces."""
+    if sys.platform != "linux":
+        return []
+    import fcntl  # pylint: disable=import-outside-toplevel
+
+    interfaces: list[tuple[str, IPv4Network]] = []
+    with socket.socket(AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, name in socket.if_nameindex():
+            request = struct.pack("256s", name.encode()[:15])
+            try:
+                address = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)[20:24]
+                netmask = fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, request)[20:24]
+            except OSError:
+                continue  # interface has no IPv4 address
+            network = IPv4Network(
+                f"{socket.inet_ntoa(address)}/{socket.inet_ntoa(netmask)}",
+                strict=False,
+            )
+            if network.is_loopback or network.prefixlen > 30:
+                continue
+            interfaces.append((socket.inet_ntoa(address), network))
+    return interfaces
+
+
+async def _create_discovery_endpoint(
+    protocol_factory: Callable[[], SpaDiscoveryProtocol],
+    local_addr: tuple[str, int] | None = None,
+) -> tuple[asyncio.DatagramTransport, SpaDiscoveryProtocol]:
+    """Create a UDP endpoint for discovery broadcasts."""
     loop = asyncio.get_running_loop()
-    transport, protocol = await loop.create_datagram_endpoint(
-        lambda: SpaDiscoveryProtocol(return_once_found),
-        # local_addr=("0.0.0.0", 0),
+    return await loop.create_datagram_endpoint(
+        protocol_factory,
+        local_addr=local_addr,
         family=AF_INET,
         proto=IPPROTO_UDP,
         # reuse_port=True,
         allow_broadcast=True,
     )
 
-    try:
-        await asyncio.wait_for(protocol.discovery_complete.wait(), timeout=timeout)
-    except asyncio.TimeoutError:
-        if not protocol.spas:
-            _LOGGER.debug("Discovery timed out")
-    finally:
-        transport.close()
 
-    return protocol.spas
+class _DiscoverySession:
+    """Discovery across one or more endpoints, merging responses by MAC address."""
 
+    def __init__(
+        self,
+        *,
+        return_once_found: bool = False,
+        on_found: Callable[[DiscoveredSpa], None] | None = None,
+    ) -> None:
+        """Initialize a discovery session."""
+        self.spas: dict[str, DiscoveredSpa] = {}
+        self.discovery_complete = asyncio.Event()
+        self._return_once_found = return_once_found
+        self._on_found = on_found
+        self._transports: list[asyncio.DatagramTransport] = []
+        self._sweeps: list[asyncio.Task] = []
+
+    async def start(
+        self,
+        all_interfaces: bool,
+        networks: list[IPv4Network],
+        sweep_concurrency: int,
+    ) -> None:
+        """Open the discovery endpoints, which `close` closes even if this fails.
+
+        Each network is swept from the interface endpoint whose network overlaps it,
+        or otherwise from an endpoint bound to the default address.
+        """
+        interfaces = _get_interfaces() if all_interfaces else []
+        if all_interfaces and not interfaces:
+            _LOGGER.debug("No interfaces found, using the default broadcast")
+        routes: list[tuple[IPv4Network, asyncio.DatagramTransport]] = []
+        for address, interface in interfaces:
+            try:
+                transport, _ = await _create_discovery_endpoint(
+                    partial(
+                        SpaDiscoveryProtocol,
+                        return_once_found=self._return_once_found,
+                        on_found=self._found,
+                        target=(str(interface.broadcast_address), BROADCAST_ADDRESS[1]),
+                    ),
+                    (address, 0),
+                )
+            except OSError as err:
+                _LOGGER.debug("Unable to broadcast from %s: %s", address, err)
+                continue
+            self._transports.append(transport)
+            routes.append((interface, transport))
+        default = None if self._transports else await self._open_default_endpoint()
+        sweeps: dict[asyncio.DatagramTransport, list[IPv4Network]] = {}
+        for network in networks:
+            endpoint = next(
+                (transport for route, transport in routes if network.overlaps(route)),
+                default,
+            )
+            if endpoint is None:
+                endpoint = default = await self._open_default_endpoint()
+            sweeps.setdefault(endpoint, []).append(network)
+        self._sweeps = [
+            asyncio.ensure_future(_sweep(transport, targets, max(sweep_concurrency, 1)))
+            for transport, targets in sweeps.items()
+        ]
+
+    async def _open_default_endpoint(self) -> asyncio.DatagramTransport:
+        """Open an endpoint bound to the default address."""
+        transport, _ = await _create_discovery_endpoint(
+            lambda: SpaDiscoveryProtocol(
+                return_once_found=self._return_once_found, on_found=self._found
+            )
+        )
+        self._transports.append(transport)
+        return transport
 
+    async def close(self) -> None:
+        """Close the discovery endpoints."""
+        for sweep in self._sweeps:
+            await cancel_task(sweep)
+        for transport in self._transports:
+            transport.close()
+
+    def _found(self, spa: DiscoveredSpa) -> None:
+        """Handle a spa found by one of the endpoints."""
+        if spa.mac_address in self.spas:
+            return
+        self.spas[spa.mac_address] = spa
+        if self._on_found:
+            self._on_found(spa)
+        if self._return_once_found:
+            self.discovery_complete.set()
+
+
+async def _sweep(
+    transport: asyncio.DatagramTransport,
+    networks: list[IPv4Network],
+    concurrency: int,
+) -> None:
+    """Send unicast discovery requests to every host in the networks.
+
+    Requests are sent in batches of `concurrency` and the sweep repeats every
+    broadcast interval to catch spas that missed a request.
+    """
+    port = BROADCAST_ADDRESS[1]
+    while not transport.is_closing():
+        for network in networks:
+            hosts = network.hosts()
+            while batch := list(islice(hosts, concurrency)):
+                if transport.is_closing():
+                    return
+                for host in batch:
+                    transport.sendto(BROADCAST_MESSAGE, (str(host), port))
+                await asyncio.sleep(SWEEP_BATCH_DELAY)
+        _LOGGER.debug("UDP discovery sweep sent")
+        await asyncio.sleep(BROADCAST_INTERVAL)
+
+
+@add_slots
 @dataclass
 class DiscoveredSpa:
     """Discovered spa."""
@@ -53,29 +283,52 @@ class DiscoveredSpa:
 class SpaDiscoveryProtocol(asyncio.DatagramProtocol):
     """Spa discovery protocol."""
 
-    def __init__(self, return_once_found: bool = False) -> None:
-        """Initialize a spa discovery protocol."""
+    def __init__(
+        self,
+        return_once_found: bool = False,
+        *,
+        on_found: Callable[[DiscoveredSpa], None] | None = None,
+        on_response: Callable[[DiscoveredSpa], None] | None = None,
+        interval: float = BROADCAST_INTERVAL,
+        target: tuple[str, int] | None = None,
+    ) -> None:
+        """Initialize a spa discovery protocol.
+
+        on_found: Called with each spa the first time its MAC address responds
+        on_response: Called with the spa for every valid response
+        interval: The number of seconds between broadcasts
+        target: The broadcast address, defaults to `BROADCAST_ADDRESS`
+        """
         self.transport: asyncio.DatagramTransport | None = None
         self.broadcast_handle: asyncio.TimerHandle | None = None
 
-        self.spas: list[DiscoveredSpa] = []
+        self._spas: dict[str, DiscoveredSpa] = {}
         self.discovery_complete = asyncio.Event()
         self.return_once_found = return_once_found
+        self.on_found = on_found
+        self.on_response = on_response
+        self.interval = interval
+        self.target = target
+
+    @property
+    def spas(self) -> list[DiscoveredSpa]:
+        """Return the discovered spas."""
+        return list(self._spas.values())
 
     def broadcast(self) -> None:
         """Send a broadcast message."""
-        if self.return_once_found and self.spas:  # stop broadcasting if a spa is found
+        if self.return_once_found and self._spas:  # stop broadcasting if a spa is found
             self.discovery_complete.set()
             return
         if not (transport := self.transport) or transport.is_closing():
             return  # if the transport is closed, don't broadcast
 
-        self.transport.sendto(BROADCAST_MESSAGE, BROADCAST_ADDRESS)
+        self.transport.sendto(BROADCAST_MESSAGE, self.target or BROADCAST_ADDRESS)
         _LOGGER.debug("UDP discovery broadcast sent")
 
-        # Re-broadcast at BROADCAST_INTERVAL
+        # Re-broadcast at the broadcast interval
         self.broadcast_handle = asyncio.get_running_loop().call_later(
-            BROADCAST_INTERVAL, self.broadcast
+            self.interval, self.broadcast
         )
 
     def connection_lost(self, exc: Exception | None) -> None:
@@ -95,8 +348,13 @@ class SpaDiscoveryProtocol(asyncio.DatagramProtocol):
             return  # Unexpected response, ignore
         try:
             hostname, mac = map(str.strip, data.decode().splitlines()[:2])
-            if (spa := DiscoveredSpa(*addr, mac, hostname)) not in self.spas:
-                self.spas.append(spa)
+            spa = DiscoveredSpa(*addr, mac, hostname)
+            if mac not in self._spas:
+                self._spas[mac] = spa
+                if self.on_found:
+                    self.on_found(spa)
+            if self.on_response:
+                self.on_response(spa)
             if self.return_once_found:
                 self.discovery_complete.set()
         except Exception as ex:
@@ -105,3 +363,125 @@ class SpaDiscoveryProtocol(asyncio.DatagramProtocol):
     def error_received(self, exc: Exception) -> None:
         """Called when a send or receive operation raises an OSError."""
         _LOGGER.error(exc)
+
+
+class SpaDiscoveryService(EventMixin):
+    """Continuous spa discovery service.
+
+    Keeps a table of spas keyed by MAC address and emits `EVENT_ADDED` (spa),
+    `EVENT_MOVED` (spa, previous address) and `EVENT_LOST` (spa) as spas appear,
+    change address or stop responding for `lost_after` seconds.
+    """
+
+    def __init__(
+        self, *, interval: float = BROADCAST_INTERVAL, lost_after: float = 30
+    ) -> None:
+        """Initialize a spa discovery service."""
+        self._interval = interval
+        self._lost_after = lost_after
+        self._spas: dict[str, DiscoveredSpa] = {}
+        self._last_seen: dict[str, float] = {}
+        self._clients: list[SpaClient] = []
+        self._transport: asyncio.DatagramTransport | None = None
+        self._expiry: asyncio.Task | None = None
+
+    @property
+    def spas(self) -> dict[str, DiscoveredSpa]:
+        """Return the spas currently on the network keyed by MAC address."""
+        return dict(self._spas)
+
+    @property
+    def running(self) -> bool:
+        """Return `True` if the service is running."""
+        return self._transport is not None
+
+    def last_seen(self, mac_address: str) -> float | None:
+        """Return the monotonic time a spa last responded."""
+        return self._last_seen.get(mac_address)
+
+    async def start(self) -> None:
+        """Start broadcasting and tracking responses."""
+        if self._transport is not None:
+            return
+        self._transport, _ = await _create_discovery_endpoint(
+            lambda: SpaDiscoveryProtocol(
+                on_response=self._handle_response, interval=self._interval
+            )
+        )
+        self._expiry = asyncio.ensure_future(self._expire())
+
+    async def stop(self) -> None:
+        """Stop the service."""
+        await cancel_task(self._expiry)
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def track(self, client: SpaClient) -> Callable[[], None]:
+        """Keep a client's host up to date as its spa changes address."""
+        self._clients.append(client)
+        if (mac := _client_mac(client)) and (spa := self._spas.get(mac)):
+            self._update_client(client, spa)
+
+        def untrack() -> None:
+            """Stop tracking the client."""
+            if client in self._clients:
+                self._clients.remove(client)
+
+        return untrack
+
+    def _handle_response(self, spa: DiscoveredSpa) -> None:
+        """Handle a discovery response."""
+        mac = _normalize_mac(spa.mac_address)
+        self._last_seen[mac] = monotonic()
+        if (previous := self._spas.get(mac)) is None:
+            self._spas[mac] = spa
+            _LOGGER.debug("Spa %s added at %s", mac, spa.address)
+            self.emit(EVENT_ADDED, spa)
+        elif previous.address != spa.address or previous.port != spa.port:
+            self._spas[mac] = spa
+            _LOGGER.debug("Spa %s moved to %s", mac, spa.address)
+            self.emit(EVENT_MOVED, spa, previous.address)
+        else:
+            return
+        for client in self._clients:
+            if _client_mac(client) == mac:
+                self._update_client(client, spa)
+
+    def _update_client(self, client: SpaClient, spa: DiscoveredSpa) -> None:
+        """Point a client at a spa's current address."""
+        if client.host != spa.address:
+            client.update_host(spa.address)
+
+    async def _expire(self) -> None:
+        """Remove spas that stopped responding."""
+        while True:
+            await asyncio.sleep(self._interval)
+            cutoff = monotonic() - self._lost_after
+            for mac in [mac for mac, seen in self._last_seen.items() if seen < cutoff]:
+                del self._last_seen[mac]
+                spa = self._spas.pop(mac)
+                _LOGGER.debug("Spa %s lost", mac)
+                self.emit(EVENT_LOST, spa)
+
+    async def __aenter__(self) -> SpaDiscoveryService:
+        """Start the service."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exctype: Any) -> None:
+        """Stop the service."""
+        await self.stop()
+
+
+def _normalize_mac(mac_address: str) -> str:
+    """Normalize a MAC address to lowercase and colon separated."""
+    return mac_address.lower().replace("-", ":")
+
+
+def _client_mac(client: SpaClient) -> str | None:
+    """Return a client's normalized MAC address if known."""
+    try:
+        return _normalize_mac(client.mac_address)
+    except SpaConfigurationNotLoadedError:
+        return None
@@ -20,3 +20,21 @@ class SpaConfigurationNotLoadedError(Exception):
 
 class SpaMessageError(Exception):
     """Spa message is invalid."""
+
+    def __init__(
+        self,
+        message: str,
+        reason: str = "invalid",
+        discarded: int = 0,
+        data: bytes = b"",
+    ):
+        """Initialize a spa message error.
+
+        reason: One of "invalid", "incomplete" or "checksum"
+        discarded: The number of bytes discarded while resynchronizing
+        data: The raw bytes that were discarded
+        """
+        super().__init__(message)
+        self.reason = reason
+        self.discarded = discarded
+        self.data = data
@@ -0,0 +1,139 @@
+"""Balboa spa message framing."""
+
+from __future__ import annotations
+
+from .exceptions import SpaMessageError
+from .utils import MESSAGE_DELIMETER, calculate_checksum
+
+# length, 2 address/header bytes, message type and checksum
+MIN_FRAME_LENGTH = 5
+# keep a length byte of 0x7E from being read as a window, since "~~" is almost
+# always the closing delimiter of one frame followed by the opening of the next
+DEFAULT_MAX_FRAME_LENGTH = 0x7D
+# only keep this many discarded bytes for the error, the count is always exact
+MAX_ERROR_DATA = 256
+
+
+class FrameDecoder:
+    """Resynchronizing decoder for a stream of `~ len ... crc ~` frames.
+
+    Bytes are buffered until a complete window can be checked. A window is only
+    accepted if its closing delimiter and checksum both match; otherwise just its
+    opening delimiter is dropped and scanning resumes from the next byte, so a
+    glitch never consumes the start of the frame that follows it. The closing
+    delimiter of a frame is kept until the next window is checked, so it can also
+    open the next frame when that frame's own delimiter was lost. Bytes skipped
+    in a run are reported as a single `SpaMessageError`, ahead of the frame that
+    ended the run or once the decoder has to wait for more data.
+    """
+
+    __slots__ = ("_buffer", "_discarded", "_junk", "_reason", "_shared", "max_length")
+
+    def __init__(self, max_length: int = DEFAULT_MAX_FRAME_LENGTH) -> None:
+        """Initialize a frame decoder.
+
+        max_length: The largest length byte accepted as the start of a window
+        """
+        self.max_length = max_length
+        self._buffer = bytearray()
+        self._junk = bytearray()
+        self._discarded = 0
+        self._reason: str | None = None
+        # the buffer starts with the closing delimiter of the last frame, which
+        # doubles as the opening delimiter if the next one was lost
+        self._shared = False
+
+    @property
+    def buffered(self) -> int:
+        """Return the number of bytes waiting for the rest of a frame."""
+        return len(self._buffer) - self._shared
+
+    def reset(self) -> None:
+        """Drop any buffered bytes, e.g. after reconnecting."""
+        self._buffer.clear()
+        self._junk.clear()
+        self._discarded = 0
+        self._reason = None
+        self._shared = False
+
+    def feed(self, data: bytes) -> list[bytes | SpaMessageError]:
+        """Decode received bytes.
+
+        Returns the complete frames found, without delimiters, in the same form as
+        `read_one_message`, interleaved with errors for any bytes skipped.
+        """
+        buffer = self._buffer
+        buffer += data
+        results: list[bytes | SpaMessageError] = []
+        while buffer:
+            if (start := buffer.find(MESSAGE_DELIMETER)) < 0:
+                self._discard(len(buffer), "invalid")
+                break
+            if start:
+                self._discard(start, "invalid")
+            if len(buffer) < 2:
+                break
+            if self._shared and buffer[1] == MESSAGE_DELIMETER:
+                del buffer[:1]
+                self._shared = False
+                continue
+            length = buffer[1]
+            if not MIN_FRAME_LENGTH <= length <= self.max_length:
+                self._discard(1, "invalid")
+                continue
+            if len(buffer) <= (end := length + 1):
+                break
+            if buffer[end] != MESSAGE_DELIMETER:
+                self._discard(1, "incomplete")
+                continue
+            frame = bytes(buffer[1:end])
+            if calculate_checksum(frame[:-1]) != frame[-1]:
+                self._discard(1, "checksum")
+                continue
+            del buffer[:end]
+            self._shared = True
+            if self._discarded:
+                results.append(self._error())
+            results.append(frame)
+        if self._discarded:
+            results.append(self._error())
+        return results
+
+    def _discard(self, count: int, reason: str) -> None:
+        """Discard bytes from the front of the buffer."""
+        if self._shared:
+            # the delimiter already belongs to the last frame
+            del self._buffer[:1]
+            self._shared = False
+            if not (count := count - 1):
+                return
+        if len(self._junk) < MAX_ERROR_DATA:
+            self._junk += self._buffer[: min(count, MAX_ERROR_DATA - len(self._junk))]
+        del self._buffer[:count]
+        self._discarded += count
+        if self._reason is None:
+            self._reason = reason
+
+    def _error(self) -> SpaMessageError:
+        """Return an error for the bytes discarded since the last frame."""
+        data = bytes(self._junk)
+        error = SpaMessageError(
+            f"Discarded {self._discarded} bytes: {data.hex()}",
+            self._reason or "invalid",
+            self._discarded,
+            data,
+        )
+        self._junk.clear()
+        self._discarded = 0
+        self._reason = None
+        return error
+
+
+def encode_frame(body: bytes) -> bytes:
+    """Return a delimited frame with the length and checksum of a message body.
+
+    body: The address/header bytes, message type and payload
+    """
+    data = bytes((len(body) + 2,)) + body
+    delimiter = bytes((MESSAGE_DELIMETER,))
+    return delimiter + data + bytes((calculate_checksum(data),)) + delimiter
@@ -0,0 +1,411 @@
+"""Balboa spa WebSocket and server-sent events gateway."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from base64 import b64encode
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from .commands import execute_command
+from .publisher import (
+    DEFAULT_KEYFRAME_INTERVAL,
+    StatePublisher,
+    StateReceiver,
+    StateSink,
+)
+from .utils import cancel_task
+
+if TYPE_CHECKING:
+    from .client import SpaClient
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_GATEWAY_HOST = "127.0.0.1"
+DEFAULT_GATEWAY_PORT = 8765
+DEFAULT_WRITE_BUFFER_LIMIT = 256 * 1024
+MAX_REQUEST_SIZE = 64 * 1024
+REQUEST_TIMEOUT = 10
+
+PATH_WEBSOCKET = "/ws"
+PATH_EVENTS = "/events"
+PATH_STATE = "/state"
+PATH_COMMAND = "/command"
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_TOO_BIG = 1009
+
+
+class _MessageTooBig(ValueError):
+    """A WebSocket frame or message larger than `MAX_REQUEST_SIZE`."""
+
+
+class SpaGateway:
+    """Serve live spa state to browsers over WebSocket or server-sent events.
+
+    Subscribers to `/ws` or `/events` first get a keyframe per spa and then the
+    keyframe and delta messages of `StatePublisher`. Each message is encoded to
+    JSON and framed once per protocol, and the same bytes are written to every
+    subscriber; the bytes queued for a subscriber are bounded, and subscribers
+    that stop reading are disconnected once `write_buffer_limit` is exceeded.
+    WebSocket messages larger than `MAX_REQUEST_SIZE` close the connection with
+    status 1009.
+
+    Commands are JSON objects with a "command" of set_state, set_temperature or
+    configure_filter_cycle, its arguments, an optional "mac" when serving more
+    than one spa and an optional "id" echoed in the result. They are accepted as
+    WebSocket text messages or posted to `/command`. `/state` returns the current
+    state of every spa.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_GATEWAY_HOST,
+        port: int = DEFAULT_GATEWAY_PORT,
+        *,
+        keyframe_interval: float = DEFAULT_KEYFRAME_INTERVAL,
+        write_buffer_limit: int = DEFAULT_WRITE_BUFFER_LIMIT,
+    ) -> None:
+        """Initialize a gateway.
+
+        host: The local address to listen on
+        port: The local port to listen on, 0 to pick a free port
+        keyframe_interval: The most seconds between two keyframes of the same spa
+        write_buffer_limit: The most bytes queued for a subscriber
+        """
+        self._host = host
+        self._port = port
+        self._write_buffer_limit = write_buffer_limit
+        self._server: asyncio.Server | None = None
+        self._clients: list[SpaClient] = []
+        self._receiver = StateReceiver()
+        self._publisher = StatePublisher(
+            _GatewaySink(self), keyframe_interval=keyframe_interval
+        )
+        self._websockets: set[asyncio.StreamWriter] = set()
+        self._event_streams: set[asyncio.StreamWriter] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def port(self) -> int:
+        """Return the local port, which is only known after start if it was 0."""
+        if self._server is not None and self._server.sockets:
+            return int(self._server.sockets[0].getsockname()[1])
+        return self._port
+
+    @property
+    def subscribers(self) -> int:
+        """Return the number of WebSocket and event stream subscribers."""
+        return len(self._websockets) + len(self._event_streams)
+
+    def add(self, client: SpaClient) -> Callable[[], None]:
+        """Serve the state of a client, which the caller connects."""
+        self._clients.append(client)
+        remove_listener = self._publisher.add(client)
+        self._publisher.publish(client)
+
+        def remove() -> None:
+            """Stop serving the client."""
+            remove_listener()
+            if client in self._clients:
+                self._clients.remove(client)
+
+        return remove
+
+    async def start(self) -> None:
+        """Start accepting connections."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self._host, self._port, limit=MAX_REQUEST_SIZE
+        )
+        _LOGGER.debug("gateway listening on %s:%s", self._host, self.port)
+
+    async def close(self) -> None:
+        """Close all connections."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in [*self._websockets, *self._event_streams]:
+            writer.close()
+        for task in [*self._tasks]:
+            await cancel_task(task)
+
+    def _broadcast(self, message: dict[str, Any]) -> None:
+        """Keep track of the state and write a message to every subscriber."""
+        self._receiver.apply(message)
+        if not self._websockets and not self._event_streams:
+            return
+        payload = _encode(message)
+        if self._websockets:
+            frame = _websocket_frame(OP_TEXT, payload)
+            for writer in [*self._websockets]:
+                self._write(writer, frame, self._websockets)
+        if self._event_streams:
+            event = b"data: " + payload + b"\n\n"
+            for writer in [*self._event_streams]:
+                self._write(writer, event, self._event_streams)
+
+    def _write(
+        self,
+        writer: asyncio.StreamWriter,
+        data: bytes,
+        subscribers: set[asyncio.StreamWriter],
+    ) -> None:
+        """Write to a subscriber, dropping subscribers that fall behind."""
+        transport = writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > self._write_buffer_limit:
+            _LOGGER.warning(
+                "dropping slow gateway subscriber %s",
+                writer.get_extra_info("peername"),
+            )
+            transport.abort()
+            subscribers.discard(writer)
+            return
+        writer.write(data)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one HTTP request or WebSocket connection."""
+        task = asyncio.current_task()
+        assert task
+        self._tasks.add(task)
+        try:
+            request = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT
+            )
+            method, path, headers = _parse_request(request)
+            if (
+                path == PATH_WEBSOCKET
+                and "websocket" in headers.get("upgrade", "").lower()
+            ):
+                await self._serve_websocket(reader, writer, headers)
+            elif path == PATH_EVENTS and method == "GET":
+                await self._serve_events(reader, writer)
+            elif path == PATH_STATE and method == "GET":
+                _respond(writer, 200, _encode(self._receiver.states))
+            elif path == PATH_COMMAND and method == "POST":
+                length = int(headers.get("content-length", 0))
+                if length > MAX_REQUEST_SIZE:
+                    raise ValueError("Request too large")
+                body = await reader.readexactly(length)
+                result = await self._command(body)
+                _respond(writer, 200 if result["ok"] else 400, _encode(result))
+            else:
+                _respond(writer, 404, _encode({"error": "not found"}))
+            await writer.drain()
+        except (
+            ConnectionError,
+            ValueError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+        ) as err:
+            _LOGGER.debug("gateway connection closed: %r", err)
+        finally:
+            self._websockets.discard(writer)
+            self._event_streams.discard(writer)
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _serve_websocket(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        headers: dict[str, str],
+    ) -> None:
+        """Complete the WebSocket handshake and serve commands until closed."""
+        key = headers.get("sec-websocket-key", "").encode()
+        accept = b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest()).decode()
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        for message in self._receiver.keyframes():
+            writer.write(_websocket_frame(OP_TEXT, _encode(message)))
+        self._websockets.add(writer)
+        fragments: list[bytes] = []
+        message_opcode = OP_TEXT
+        while True:
+            try:
+                fin, opcode, payload = await _read_websocket_frame(reader)
+            except _MessageTooBig:
+                writer.write(_close_frame(CLOSE_TOO_BIG))
+                return
+            if opcode == OP_CLOSE:
+                writer.write(_websocket_frame(OP_CLOSE, payload[:2]))
+                return
+            if opcode == OP_PING:
+                self._write(
+                    writer, _websocket_frame(OP_PONG, payload), self._websockets
+                )
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if sum(map(len, fragments)) > MAX_REQUEST_SIZE:
+                writer.write(_close_frame(CLOSE_TOO_BIG))
+                return
+            if not fin:
+                continue
+            text, fragments = b"".join(fragments), []
+            if message_opcode != OP_TEXT:
+                writer.write(_close_frame(CLOSE_PROTOCOL_ERROR))
+                return
+            result = await self._command(text)
+            self._write(
+                writer, _websocket_frame(OP_TEXT, _encode(result)), self._websockets
+            )
+
+    async def _serve_events(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Stream server-sent events until the subscriber disconnects."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        for message in self._receiver.keyframes():
+            writer.write(b"data: " + _encode(message) + b"\n\n")
+        self._event_streams.add(writer)
+        while await reader.read(MAX_REQUEST_SIZE):
+            pass
+
+    async def _command(self, body: bytes) -> dict[str, Any]:
+        """Execute a JSON command and return the result."""
+        result: dict[str, Any] = {"type": "result", "id": None, "ok": False}
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            result["id"] = request.get("id")
+            await execute_command(
+                self._find_client(request.get("mac")),
+                str(request.get("command")),
+                request,
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            result["error"] = str(ex)
+        else:
+            result["ok"] = True
+        return result
+
+    def _find_client(self, mac_address: str | None) -> SpaClient:
+        """Return the client with a MAC address, or the only client."""
+        if mac_address is None:
+            if len(self._clients) != 1:
+                raise ValueError("A mac is required when serving several spas")
+            return self._clients[0]
+        for client in self._clients:
+            if mac_address in (client.snapshot().mac_address, client.host):
+                return client
+        raise ValueError(f"Unknown spa: {mac_address}")
+
+    async def __aenter__(self) -> SpaGateway:
+        """Start the gateway."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exctype: Any) -> None:
+        """Close the gateway."""
+        await self.close()
+
+
+class _GatewaySink(StateSink):
+    """Hand published messages to the gateway."""
+
+    def __init__(self, gateway: SpaGateway) -> None:
+        """Initialize the sink."""
+        self._gateway = gateway
+
+    def publish(self, message: dict[str, Any]) -> None:
+        """Broadcast a message."""
+        self._gateway._broadcast(message)  # pylint: disable=protected-access
+
+
+def _encode(value: Any) -> bytes:
+    """Return a value as compact JSON."""
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _parse_request(request: bytes) -> tuple[str, str, dict[str, str]]:
+    """Return the method, path and lower case headers of an HTTP request."""
+    request_line, *lines = request.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError as err:
+        raise ValueError(f"Invalid request line: {request_line}") from err
+    headers = {}
+    for line in filter(None, lines):
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target.split("?", 1)[0], headers
+
+
+def _respond(writer: asyncio.StreamWriter, status: int, body: bytes) -> None:
+    """Write a JSON response."""
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[status]
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode()
+        + body
+    )
+
+
+def _websocket_frame(opcode: int, payload: bytes) -> bytes:
+    """Return an unmasked, unfragmented WebSocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 0x10000:
+        header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, "big")
+    else:
+        header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, "big")
+    return header + payload
+
+
+def _close_frame(code: int) -> bytes:
+    """Return a WebSocket close frame with a status code."""
+    return _websocket_frame(OP_CLOSE, code.to_bytes(2, "big"))
+
+
+async def _read_websocket_frame(
+    reader: asyncio.StreamReader,
+) -> tuple[bool, int, bytes]:
+    """Read a masked WebSocket frame and return its fin flag, opcode and payload."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), "big")
+    if not second & 0x80:
+        raise ValueError("Unmasked client frame")
+    if length > MAX_REQUEST_SIZE:
+        raise _MessageTooBig(f"Frame too large: {length} bytes")
+    mask = await reader.readexactly(4)
+    payload = await reader.readexactly(length)
+    # unmask with one big integer xor instead of a loop over the bytes
+    key = (mask * (length // 4 + 1))[:length]
+    unmasked = int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")
+    return bool(first & 0x80), first & 0x0F, unmasked.to_bytes(length, "big")
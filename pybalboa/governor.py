@@ -0,0 +1,134 @@
+"""Balboa spa reconnect governor."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from time import monotonic
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BOOTSTRAP_TIMEOUT = 30
+
+
+class _SlotMetrics:
+    """Queue wait metrics for a governed slot."""
+
+    def __init__(self) -> None:
+        """Initialize slot metrics."""
+        self.acquired = 0
+        self.active = 0
+        self.waiting = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics as a dictionary."""
+        return {
+            "acquired": self.acquired,
+            "active": self.active,
+            "waiting": self.waiting,
+            "wait_total": self.wait_total,
+            "wait_max": self.wait_max,
+            "wait_average": self.wait_total / self.acquired if self.acquired else 0.0,
+            "timeouts": self.timeouts,
+        }
+
+
+class ReconnectGovernor:
+    """Shared reconnect governor.
+
+    Clients that share a governor are limited to `connect_rate` connection attempts
+    per second (with bursts of up to `connect_burst`), `max_connects` concurrent
+    connection attempts and `max_bootstraps` concurrent configuration bootstraps.
+    A bootstrap gives up its slot after `bootstrap_timeout` seconds, so a spa that
+    never answers can not hold one forever.
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_rate: float = 10,
+        connect_burst: int = 10,
+        max_connects: int = 10,
+        max_bootstraps: int = 10,
+        bootstrap_timeout: float = DEFAULT_BOOTSTRAP_TIMEOUT,
+    ) -> None:
+        """Initialize a reconnect governor."""
+        if connect_rate <= 0 or min(connect_burst, max_connects, max_bootstraps) < 1:
+            raise ValueError("Governor rate and limits must be positive")
+        if bootstrap_timeout <= 0:
+            raise ValueError("Governor bootstrap timeout must be positive")
+        self.bootstrap_timeout = bootstrap_timeout
+        self._rate = connect_rate
+        self._burst = connect_burst
+        self._tokens = float(connect_burst)
+        self._updated = monotonic()
+        self._bucket_lock = asyncio.Lock()
+        self._connects = asyncio.Semaphore(max_connects)
+        self._bootstraps = asyncio.Semaphore(max_bootstraps)
+        self._connect_metrics = _SlotMetrics()
+        self._bootstrap_metrics = _SlotMetrics()
+
+    @property
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Return connect and bootstrap queue metrics."""
+        return {
+            "connect": self._connect_metrics.as_dict(),
+            "bootstrap": self._bootstrap_metrics.as_dict(),
+        }
+
+    async def _take_token(self) -> None:
+        """Wait for a connection token from the bucket."""
+        async with self._bucket_lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(
+                    self._tokens + (now - self._updated) * self._rate, self._burst
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    @asynccontextmanager
+    async def _slot(
+        self, semaphore: asyncio.Semaphore, metrics: _SlotMetrics, rated: bool
+    ) -> AsyncIterator[None]:
+        """Acquire a governed slot and record the queue wait."""
+        start = monotonic()
+        metrics.waiting += 1
+        try:
+            if rated:
+                await self._take_token()
+            await semaphore.acquire()
+        finally:
+            metrics.waiting -= 1
+        wait = monotonic() - start
+        metrics.acquired += 1
+        metrics.active += 1
+        metrics.wait_total += wait
+        metrics.wait_max = max(metrics.wait_max, wait)
+        if wait >= 1:
+            _LOGGER.debug("Governor slot acquired after %.2f seconds", wait)
+        try:
+            yield
+        except asyncio.TimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.active -= 1
+            semaphore.release()
+
+    def connect_slot(self) -> AbstractAsyncContextManager[None]:
+        """Return an async context manager guarding a connection attempt."""
+        return self._slot(self._connects, self._connect_metrics, True)
+
+    def bootstrap_slot(self) -> AbstractAsyncContextManager[None]:
+        """Return an async context manager guarding a configuration bootstrap."""
+        return self._slot(self._bootstraps, self._bootstrap_metrics, False)
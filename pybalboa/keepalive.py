@@ -0,0 +1,98 @@
+"""Keepalive scheduling."""
+
+from __future__ import annotations
+
+from time import monotonic
+
+from .utils import default
+
+DEFAULT_KEEPALIVE_INTERVAL = 15
+DEFAULT_IDLE_TIMEOUT = 45
+
+
+class KeepalivePolicy:
+    """Adaptive keepalive policy.
+
+    The interval stretches (up to `maximum`) while frames are flowing and
+    tightens (down to `minimum`) when probes go unanswered or frames are
+    corrupted, so a half-open socket is detected well before `idle_timeout`.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        *,
+        minimum: float | None = None,
+        maximum: float | None = None,
+    ) -> None:
+        """Initialize a keepalive policy."""
+        if interval <= 0 or idle_timeout <= 0:
+            raise ValueError("Keepalive interval and idle timeout must be positive")
+        self.base_interval = interval
+        self.idle_timeout = idle_timeout
+        self.minimum = min(default(minimum, interval / 4), interval)
+        self.maximum = max(
+            default(maximum, min(interval * 4, idle_timeout / 2)), interval
+        )
+        self.interval = interval
+
+        self.last_received = self.last_sent = monotonic()
+        self.pending_probes = 0
+        self._frames_since_tick = 0
+
+    def reset(self) -> None:
+        """Reset the policy for a new connection."""
+        self.interval = self.base_interval
+        self.last_received = self.last_sent = monotonic()
+        self.pending_probes = 0
+        self._frames_since_tick = 0
+
+    def frame_received(self) -> None:
+        """Record a received frame."""
+        self.last_received = monotonic()
+        self.pending_probes = 0
+        self._frames_since_tick += 1
+
+    def frame_sent(self) -> None:
+        """Record a sent frame."""
+        self.last_sent = monotonic()
+
+    def frame_error(self) -> None:
+        """Record a corrupt frame, which indicates a flaky link."""
+        self._tighten()
+
+    def idle_for(self, now: float | None = None) -> float:
+        """Return the number of seconds since the last received frame."""
+        return (monotonic() if now is None else now) - self.last_received
+
+    def expired(self, now: float | None = None) -> bool:
+        """Return `True` if nothing has been received within the idle timeout."""
+        return self.idle_for(now) >= self.idle_timeout
+
+    def tick(self, now: float | None = None) -> bool:
+        """Adapt the interval and return `True` if a keepalive should be sent."""
+        now = monotonic() if now is None else now
+        if self._frames_since_tick:
+            self._frames_since_tick = 0
+            self.interval = min(self.interval * 2, self.maximum)
+        elif self.pending_probes:
+            self._tighten()
+        if (
+            now - self.last_received >= self.interval
+            and now - self.last_sent >= self.interval
+        ):
+            self.pending_probes += 1
+            return True
+        return False
+
+    def next_delay(self, now: float | None = None) -> float:
+        """Return the number of seconds until the next keepalive decision."""
+        now = monotonic() if now is None else now
+        due = max(self.last_received, self.last_sent) + self.interval
+        expires = self.last_received + self.idle_timeout
+        return max(min(due, expires) - now, 0.05)
+
+    def _tighten(self) -> None:
+        """Shorten the interval."""
+        self.interval = max(self.interval / 2, self.minimum)
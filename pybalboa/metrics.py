@@ -0,0 +1,156 @@
+"""Balboa spa connection metrics."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+from .enums import MessageType
+
+if TYPE_CHECKING:
+    from .tracing import LatencyHistogram
+
+MESSAGE_ERROR_REASONS = ("invalid", "incomplete", "checksum")
+
+
+class SpaMetrics:
+    """Spa connection counters.
+
+    Counters are plain attributes incremented on the hot path; nothing is
+    formatted or aggregated until `snapshot` is called.
+    """
+
+    __slots__ = (
+        "bytes_received",
+        "bytes_sent",
+        "connect_failures",
+        "connects",
+        "duplicate_status",
+        "frames_received",
+        "frames_sent",
+        "keepalives_sent",
+        "message_errors",
+        "resync_bytes_discarded",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        # keyed by message type byte, only the handful of types seen take memory
+        self.frames_received: defaultdict[int, int] = defaultdict(int)
+        self.bytes_received = 0
+        self.duplicate_status = 0
+        self.message_errors = dict.fromkeys(MESSAGE_ERROR_REASONS, 0)
+        self.resync_bytes_discarded = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.keepalives_sent = 0
+        self.connects = 0
+        self.connect_failures = 0
+
+    @property
+    def reconnects(self) -> int:
+        """Return the number of successful connections after the first."""
+        return max(self.connects - 1, 0)
+
+    def message_error(self, reason: str, discarded: int) -> None:
+        """Record a message error."""
+        self.message_errors[reason] = self.message_errors.get(reason, 0) + 1
+        self.resync_bytes_discarded += discarded
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the counters as a dictionary."""
+        return {
+            "frames_received": {
+                _message_type_name(message_type): count
+                for message_type, count in sorted(self.frames_received.items())
+            },
+            "bytes_received": self.bytes_received,
+            "duplicate_status": self.duplicate_status,
+            "message_errors": dict(self.message_errors),
+            "resync_bytes_discarded": self.resync_bytes_discarded,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "keepalives_sent": self.keepalives_sent,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "reconnects": self.reconnects,
+        }
+
+
+def _message_type_name(message_type: int) -> str:
+    """Return the name of a message type byte."""
+    if (name := MessageType(message_type)) is MessageType.UNKNOWN:
+        return f"0x{message_type:02X}"
+    return name.name
+
+
+_COUNTERS = (
+    ("bytes_received", "Bytes received in valid frames"),
+    ("duplicate_status", "Unchanged status frames skipped"),
+    ("resync_bytes_discarded", "Bytes discarded while resynchronizing"),
+    ("frames_sent", "Frames sent"),
+    ("bytes_sent", "Bytes sent"),
+    ("keepalives_sent", "Keepalive messages sent"),
+    ("connects", "Successful connections"),
+    ("connect_failures", "Failed connection attempts"),
+    ("reconnects", "Successful connections after the first"),
+)
+
+
+def render_prometheus(
+    metrics: Mapping[str, SpaMetrics],
+    latencies: Mapping[str, Mapping[str, LatencyHistogram]] | None = None,
+) -> str:
+    """Render metrics keyed by spa in the Prometheus text exposition format.
+
+    latencies: Optional command latency histograms keyed by spa and then command
+    """
+    snapshots = {spa: spa_metrics.snapshot() for spa, spa_metrics in metrics.items()}
+    lines = [
+        "# HELP pybalboa_frames_received_total Frames received by message type",
+        "# TYPE pybalboa_frames_received_total counter",
+    ]
+    for spa, snapshot in snapshots.items():
+        for message_type, count in snapshot["frames_received"].items():
+            lines.append(
+                f'pybalboa_frames_received_total{{spa="{_escape(spa)}",'
+                f'type="{message_type}"}} {count}'
+            )
+    lines.append(
+        "# HELP pybalboa_message_errors_total Invalid frames received by reason"
+    )
+    lines.append("# TYPE pybalboa_message_errors_total counter")
+    for spa, snapshot in snapshots.items():
+        for reason, count in snapshot["message_errors"].items():
+            lines.append(
+                f'pybalboa_message_errors_total{{spa="{_escape(spa)}",'
+                f'reason="{reason}"}} {count}'
+            )
+    for name, description in _COUNTERS:
+        lines.append(f"# HELP pybalboa_{name}_total {description}")
+        lines.append(f"# TYPE pybalboa_{name}_total counter")
+        lines.extend(
+            f'pybalboa_{name}_total{{spa="{_escape(spa)}"}} {snapshot[name]}'
+            for spa, snapshot in snapshots.items()
+        )
+    if latencies:
+        name = "pybalboa_command_latency_seconds"
+        lines.append(f"# HELP {name} Seconds from command until a status confirms it")
+        lines.append(f"# TYPE {name} histogram")
+        for spa, histograms in latencies.items():
+            for command, histogram in histograms.items():
+                labels = f'spa="{_escape(spa)}",command="{_escape(command)}"'
+                snapshot = histogram.snapshot()
+                lines.extend(
+                    f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+                    for bound, count in snapshot["buckets"].items()
+                )
+                lines.append(f"{name}_sum{{{labels}}} {snapshot['sum']}")
+                lines.append(f"{name}_count{{{labels}}} {snapshot['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,464 @@
+"""Balboa spa MQTT bridge."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from os import urandom
+from random import uniform
+from typing import TYPE_CHECKING, Any
+
+from .commands import COMMAND_SET_STATE, COMMAND_SET_TEMPERATURE, execute_command
+from .control import EVENT_UPDATE
+from .utils import cancel_task
+
+if TYPE_CHECKING:
+    from .client import SpaClient
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MQTT_PORT = 1883
+DEFAULT_MQTT_KEEPALIVE = 60
+DEFAULT_TOPIC_PREFIX = "spa"
+CONNECT_TIMEOUT = 10
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 60
+
+# state fields published as topics, in addition to one topic per control
+STATE_TOPICS = (
+    "state",
+    "temperature_unit",
+    "temperature",
+    "target_temperature",
+    "temperature_minimum",
+    "temperature_maximum",
+    "heat_state",
+    "filter_cycle_1_running",
+    "filter_cycle_2_running",
+    "wifi_state",
+)
+TOPIC_AVAILABLE = "available"
+TOPIC_TIME = "time"
+TOPIC_SET = "set"
+
+PACKET_CONNECT = 0x10
+PACKET_CONNACK = 0x20
+PACKET_PUBLISH = 0x30
+PACKET_PUBACK = 0x40
+PACKET_SUBSCRIBE = 0x82
+PACKET_SUBACK = 0x90
+PACKET_PINGREQ = 0xC0
+PACKET_PINGRESP = 0xD0
+PACKET_DISCONNECT = 0xE0
+
+MessageHandler = Callable[[str, bytes], None]
+ConnectionHandler = Callable[[bool], None]
+
+
+class MqttConnection(ABC):
+    """Connection to an MQTT broker used by the bridge.
+
+    Implement this to use any MQTT library; `MqttClient` is a minimal built-in
+    implementation. `publish` is called from the event loop and must not block.
+    Call `connection_changed` when the broker connection is lost and when it is
+    made again, so retained topics are published again after a reconnect.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the connection."""
+        self.message_handler: MessageHandler | None = None
+        self.connection_handler: ConnectionHandler | None = None
+
+    @abstractmethod
+    def publish(self, messages: Iterable[tuple[str, bytes, bool]]) -> None:
+        """Publish a batch of (topic, payload, retain) messages at QoS 0."""
+
+    @abstractmethod
+    async def subscribe(self, topic_filters: list[str]) -> None:
+        """Subscribe to topic filters, passing messages to `message_handler`."""
+
+    def message_received(self, topic: str, payload: bytes) -> None:
+        """Pass a received message to the handler, logging its errors."""
+        if self.message_handler is None:
+            return
+        try:
+            self.message_handler(topic, payload)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error handling MQTT message on %s", topic)
+
+    def connection_changed(self, connected: bool) -> None:
+        """Pass a lost or restored broker connection to the handler."""
+        if self.connection_handler is not None:
+            self.connection_handler(connected)
+
+
+class MqttClient(MqttConnection):
+    """Minimal MQTT 3.1.1 client supporting QoS 0 only, using no dependencies.
+
+    A lost connection is reconnected with exponential backoff and the topic
+    filters subscribed to are subscribed to again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_MQTT_PORT,
+        *,
+        client_id: str | None = None,
+        username: str | None = None,
+        password: str | None = None,
+        keepalive: int = DEFAULT_MQTT_KEEPALIVE,
+        reconnect_delay: float = RECONNECT_DELAY,
+    ) -> None:
+        """Initialize an MQTT client.
+
+        client_id: The client identifier, random if not provided
+        keepalive: The number of seconds between pings to the broker
+        reconnect_delay: The seconds before the first reconnect attempt, doubled
+            after every failed attempt
+        """
+        super().__init__()
+        self._host = host
+        self._port = port
+        self._client_id = client_id or f"pybalboa-{urandom(4).hex()}"
+        self._username = username
+        self._password = password
+        self._keepalive = keepalive
+        self._reconnect_delay = reconnect_delay
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._listener: asyncio.Task | None = None
+        self._pinger: asyncio.Task | None = None
+        self._reconnector: asyncio.Task | None = None
+        self._disconnect = False
+        self._packet_id = 0
+        self._subacks: dict[int, asyncio.Future[None]] = {}
+        self._topic_filters: list[str] = []
+
+    @property
+    def connected(self) -> bool:
+        """Return `True` if connected to the broker."""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        """Connect to the broker."""
+        self._disconnect = False
+        await self._open()
+
+    async def _open(self) -> None:
+        """Open a connection and start listening and pinging."""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port), CONNECT_TIMEOUT
+        )
+        flags = 0x02  # clean session
+        payload = _string(self._client_id)
+        if self._username is not None:
+            flags |= 0x80
+            payload += _string(self._username)
+        if self._password is not None:
+            flags |= 0x40
+            payload += _string(self._password)
+        writer.write(
+            _packet(
+                PACKET_CONNECT,
+                _string("MQTT")
+                + bytes((4, flags))
+                + self._keepalive.to_bytes(2, "big")
+                + payload,
+            )
+        )
+        packet_type, body = await asyncio.wait_for(
+            _read_packet(reader), CONNECT_TIMEOUT
+        )
+        if packet_type != PACKET_CONNACK or body[1] != 0:
+            writer.close()
+            raise ConnectionError(f"MQTT connection refused: {body.hex()}")
+        self._reader, self._writer = reader, writer
+        self._listener = asyncio.ensure_future(self._listen())
+        self._pinger = asyncio.ensure_future(self._ping())
+
+    async def disconnect(self) -> None:
+        """Disconnect from the broker."""
+        self._disconnect = True
+        await cancel_task(self._reconnector)
+        await cancel_task(self._pinger)
+        await cancel_task(self._listener)
+        if self._writer is not None:
+            if not self._writer.is_closing():
+                self._writer.write(bytes((PACKET_DISCONNECT, 0)))
+            self._writer.close()
+            self._writer = None
+
+    def publish(self, messages: Iterable[tuple[str, bytes, bool]]) -> None:
+        """Publish a batch of messages with a single write."""
+        data = b"".join(
+            _packet(PACKET_PUBLISH | retain, _string(topic) + payload)
+            for topic, payload, retain in messages
+        )
+        if data and self.connected:
+            assert self._writer
+            self._writer.write(data)
+
+    async def subscribe(self, topic_filters: list[str]) -> None:
+        """Subscribe to topic filters at QoS 0 and wait for the acknowledgement.
+
+        The filters are subscribed to again after a reconnect.
+        """
+        self._topic_filters.extend(
+            topic for topic in topic_filters if topic not in self._topic_filters
+        )
+        await self._subscribe(topic_filters)
+
+    async def _subscribe(self, topic_filters: list[str]) -> None:
+        """Send a subscribe packet and wait for the acknowledgement."""
+        assert self._writer
+        self._packet_id = self._packet_id % 0xFFFF + 1
+        future = self._subacks[self._packet_id] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._writer.write(
+            _packet(
+                PACKET_SUBSCRIBE,
+                self._packet_id.to_bytes(2, "big")
+                + b"".join(_string(topic) + b"\x00" for topic in topic_filters),
+            )
+        )
+        await asyncio.wait_for(future, CONNECT_TIMEOUT)
+
+    async def _listen(self) -> None:
+        """Read packets from the broker until the connection closes."""
+        assert self._reader and self._writer
+        try:
+            while True:
+                packet_type, body = await _read_packet(self._reader)
+                if packet_type & 0xF0 == PACKET_PUBLISH:
+                    length = int.from_bytes(body[:2], "big")
+                    topic = body[2 : 2 + length].decode(errors="replace")
+                    payload = body[2 + length :]
+                    if qos := (packet_type >> 1) & 0x03:
+                        if qos == 1:
+                            self._writer.write(_packet(PACKET_PUBACK, payload[:2]))
+                        payload = payload[2:]
+                    self.message_received(topic, payload)
+                elif packet_type == PACKET_SUBACK:
+                    packet_id = int.from_bytes(body[:2], "big")
+                    if (future := self._subacks.pop(packet_id, None)) is not None:
+                        future.set_result(None)
+        except (asyncio.IncompleteReadError, ConnectionError) as err:
+            _LOGGER.error("MQTT connection lost: %r", err)
+            self._writer.close()
+        if not self._disconnect:
+            self.connection_changed(False)
+            self._reconnector = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        """Reconnect with exponential backoff and restore the subscriptions."""
+        await cancel_task(self._pinger)
+        delay = self._reconnect_delay
+        while not self._disconnect:
+            await asyncio.sleep(delay + uniform(0, delay / 4))
+            try:
+                await self._open()
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError) as err:
+                _LOGGER.debug("MQTT reconnect failed: %r", err)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            try:
+                if self._topic_filters:
+                    await self._subscribe(self._topic_filters)
+            except asyncio.TimeoutError:
+                # the listener reconnects again once the connection closes
+                _LOGGER.error("MQTT subscribe timed out after reconnecting")
+                assert self._writer
+                self._writer.close()
+                return
+            _LOGGER.debug("MQTT connection restored")
+            self.connection_changed(True)
+            return
+
+    async def _ping(self) -> None:
+        """Ping the broker so it keeps the connection open."""
+        while self.connected:
+            await asyncio.sleep(self._keepalive * 0.75)
+            assert self._writer
+            self._writer.write(bytes((PACKET_PINGREQ, 0)))
+
+
+class SpaMqttBridge:
+    """Publish spas as retained MQTT topics and accept commands.
+
+    Each spa gets topics like `spa/<mac>/temperature` and `spa/<mac>/pump/1`,
+    where the MAC address is lower case without separators. On every update only
+    the topics whose value changed are published, as one batch. Payloads are
+    plain strings: names for states and JSON for numbers and booleans.
+
+    Publish to `<topic>/set` to change a control, e.g. "HIGH" to
+    `spa/<mac>/pump/1/set`, or a temperature to `spa/<mac>/target_temperature/set`.
+    """
+
+    def __init__(
+        self, mqtt: MqttConnection, *, prefix: str = DEFAULT_TOPIC_PREFIX
+    ) -> None:
+        """Initialize a bridge on a connected MQTT connection."""
+        self._mqtt = mqtt
+        self._prefix = prefix
+        self._clients: dict[str, SpaClient] = {}
+        self._published: dict[str, bytes] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._online = True
+        mqtt.message_handler = self._message_received
+        mqtt.connection_handler = self._connection_changed
+
+    async def start(self) -> None:
+        """Subscribe to the command topics."""
+        await self._mqtt.subscribe(
+            [f"{self._prefix}/+/+/{TOPIC_SET}", f"{self._prefix}/+/+/+/{TOPIC_SET}"]
+        )
+
+    def add(self, client: SpaClient) -> Callable[[], None]:
+        """Publish the state of a client as it changes."""
+        remove_listener = client.on(EVENT_UPDATE, lambda: self.publish(client))
+        self.publish(client)
+        return remove_listener
+
+    def publish(self, client: SpaClient) -> None:
+        """Publish the topics of a client whose values changed.
+
+        Nothing is published until the MAC address is known, so retained topics
+        are never left behind under another key.
+        """
+        if not self._online or (spa_id := _spa_id(client)) is None:
+            return
+        self._clients[spa_id] = client
+        base = f"{self._prefix}/{spa_id}"
+        changed = [
+            (topic, payload, True)
+            for topic, payload in _topics(client, base)
+            if self._published.get(topic) != payload
+        ]
+        if not changed:
+            return
+        for topic, payload, _ in changed:
+            self._published[topic] = payload
+        self._mqtt.publish(changed)
+
+    def _connection_changed(self, connected: bool) -> None:
+        """Forget what was published when the broker connection is lost.
+
+        The broker may have restarted without its retained topics, so everything
+        is published again once the connection is restored.
+        """
+        self._online = connected
+        self._published.clear()
+        if connected:
+            for client in [*self._clients.values()]:
+                self.publish(client)
+
+    def _message_received(self, topic: str, payload: bytes) -> None:
+        """Execute a command received on a set topic."""
+        parts = topic.split("/")
+        if len(parts) < 4 or parts[0] != self._prefix or parts[-1] != TOPIC_SET:
+            return
+        if (client := self._clients.get(parts[1])) is None:
+            _LOGGER.warning("MQTT command for an unknown spa: %s", topic)
+            return
+        field = "/".join(parts[2:-1])
+        try:
+            value = payload.decode()
+        except UnicodeDecodeError:
+            _LOGGER.warning("MQTT command is not UTF-8 on %s: %r", topic, payload)
+            return
+        if field == "target_temperature":
+            arguments: dict[str, Any] = {"temperature": value}
+            command = COMMAND_SET_TEMPERATURE
+        else:
+            control = next(
+                (c for c in client.controls if _control_topic(c.name) == field), None
+            )
+            if control is None:
+                _LOGGER.warning("MQTT command for an unknown topic: %s", topic)
+                return
+            command = COMMAND_SET_STATE
+            arguments = {
+                "control": control.name,
+                "state": int(value) if value.isdecimal() else value,
+            }
+        task = asyncio.ensure_future(self._execute(client, topic, command, arguments))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(
+        self, client: SpaClient, topic: str, command: str, arguments: dict[str, Any]
+    ) -> None:
+        """Execute a command, logging failures."""
+        try:
+            await execute_command(client, command, arguments)
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.error("%s ## MQTT command on %s failed: %s", client.host, topic, ex)
+
+
+def _spa_id(client: SpaClient) -> str | None:
+    """Return the topic level identifying a spa, or `None` until it is known."""
+    if not (mac_address := client.snapshot().mac_address):
+        return None
+    return mac_address.replace(":", "").lower()
+
+
+def _control_topic(name: str) -> str:
+    """Return the topic of a control, e.g. "pump/1" for "Pump 1"."""
+    base, _, index = name.rpartition(" ")
+    if base and index.isdigit():
+        return f"{base.lower().replace(' ', '_')}/{index}"
+    return name.lower().replace(" ", "_")
+
+
+def _topics(client: SpaClient, base: str) -> Iterable[tuple[str, bytes]]:
+    """Return the topics and payloads of a client."""
+    snapshot = client.snapshot()
+    state = snapshot.to_dict()
+    yield f"{base}/{TOPIC_AVAILABLE}", b"online" if client.available else b"offline"
+    for field in STATE_TOPICS:
+        yield f"{base}/{field}", _payload(state[field])
+    yield (
+        f"{base}/{TOPIC_TIME}",
+        f"{snapshot.time_hour:02d}:{snapshot.time_minute:02d}".encode(),
+    )
+    for name, control_state in snapshot.controls:
+        yield f"{base}/{_control_topic(name)}", control_state.name.encode()
+
+
+def _payload(value: Any) -> bytes:
+    """Return the payload of a value."""
+    return value.encode() if isinstance(value, str) else json.dumps(value).encode()
+
+
+def _string(value: str) -> bytes:
+    """Return an MQTT length prefixed string."""
+    encoded = value.encode()
+    return len(encoded).to_bytes(2, "big") + encoded
+
+
+def _packet(packet_type: int, body: bytes) -> bytes:
+    """Return an MQTT packet with a fixed header."""
+    header = bytearray((packet_type,))
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(header) + body
+
+
+async def _read_packet(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """Read an MQTT packet and return its type and flags and its body."""
+    packet_type = (await reader.readexactly(1))[0]
+    length = 0
+    for multiplier in (1, 128, 128**2, 128**3):
+        byte = (await reader.readexactly(1))[0]
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+    return packet_type, await reader.readexactly(length)
@@ -0,0 +1,235 @@
+"""Balboa spa state publishing."""
+
+from __future__ import annotations
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from time import monotonic
+from typing import IO, TYPE_CHECKING, Any
+
+from .control import EVENT_UPDATE
+
+if TYPE_CHECKING:
+    from .client import SpaClient
+    from .snapshot import SpaSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_KEYFRAME_INTERVAL = 300
+
+MESSAGE_KEYFRAME = "keyframe"
+MESSAGE_DELTA = "delta"
+
+
+class StateSink(ABC):
+    """Destination for published state messages.
+
+    Subclasses implement `publish`, which is called from the event loop and must
+    not block; hand the message off to a queue or task for slow transports.
+    """
+
+    @abstractmethod
+    def publish(self, message: dict[str, Any]) -> None:
+        """Publish a keyframe or delta message."""
+
+    def close(self) -> None:
+        """Release any resources held by the sink."""
+
+
+class JsonLinesSink(StateSink):
+    """Write each message as a line of JSON to a text stream."""
+
+    def __init__(self, stream: IO[str], flush: bool = True) -> None:
+        """Initialize a JSON lines sink.
+
+        flush: Flush the stream after every message
+        """
+        self._stream = stream
+        self._flush = flush
+
+    def publish(self, message: dict[str, Any]) -> None:
+        """Write a message."""
+        self._stream.write(json.dumps(message, separators=(",", ":")) + "\n")
+        if self._flush:
+            self._stream.flush()
+
+    def close(self) -> None:
+        """Flush the stream."""
+        self._stream.flush()
+
+
+class _SpaStream:
+    """Publishing state of a single spa."""
+
+    __slots__ = ("keyframe_due", "last_keyframe", "sequence", "snapshot", "state")
+
+    def __init__(self) -> None:
+        """Initialize the stream."""
+        self.sequence = 0
+        self.snapshot: SpaSnapshot | None = None
+        self.state: dict[str, Any] | None = None
+        self.last_keyframe = 0.0
+        self.keyframe_due = True
+
+
+class StatePublisher:
+    """Publish spa state as periodic keyframes and field level deltas.
+
+    Messages are keyed by MAC address and numbered per spa, so a receiver that
+    sees a gap in `seq` can call `request_keyframe`; nothing is published for a
+    spa until its MAC address is known. Deltas only hold the fields that changed;
+    changed controls are nested under "controls", and fields that no longer exist
+    are listed by path under "removed".
+    """
+
+    def __init__(
+        self,
+        sink: StateSink,
+        *,
+        keyframe_interval: float = DEFAULT_KEYFRAME_INTERVAL,
+    ) -> None:
+        """Initialize a state publisher.
+
+        keyframe_interval: The most seconds between two keyframes of the same spa
+        """
+        self._sink = sink
+        self._keyframe_interval = keyframe_interval
+        self._streams: dict[str, _SpaStream] = {}
+
+    def add(self, client: SpaClient) -> Callable[[], None]:
+        """Publish the state of a client as it changes."""
+        return client.on(EVENT_UPDATE, lambda: self.publish(client))
+
+    def request_keyframe(self, mac_address: str | None = None) -> None:
+        """Send a keyframe with the next update of one spa, or of all spas."""
+        for key, stream in self._streams.items():
+            if mac_address is None or key == mac_address:
+                stream.keyframe_due = True
+
+    def publish(self, client: SpaClient) -> None:
+        """Publish the current state of a client if it changed."""
+        snapshot = client.snapshot()
+        if (key := snapshot.mac_address) is None:
+            return
+        if (stream := self._streams.get(key)) is None:
+            stream = self._streams[key] = _SpaStream()
+        now = monotonic()
+        if now - stream.last_keyframe >= self._keyframe_interval:
+            stream.keyframe_due = True
+        if snapshot is stream.snapshot and not stream.keyframe_due:
+            return
+        state = snapshot.to_dict()
+        message: dict[str, Any]
+        removed: list[list[str]] = []
+        if stream.keyframe_due or stream.state is None:
+            message = {"type": MESSAGE_KEYFRAME, "state": state}
+            stream.keyframe_due = False
+            stream.last_keyframe = now
+        elif (changes := _diff(stream.state, state, removed)) or removed:
+            message = {"type": MESSAGE_DELTA, "changes": changes}
+            if removed:
+                message["removed"] = removed
+        else:
+            stream.snapshot = snapshot
+            return
+        stream.sequence += 1
+        message["mac"] = key
+        message["seq"] = stream.sequence
+        stream.snapshot = snapshot
+        stream.state = state
+        try:
+            self._sink.publish(message)
+        except Exception as ex:  # pylint: disable=broad-except
+            _LOGGER.error("%s ## unable to publish state: %s", key, ex)
+            # the receiver missed this message, so it will have to resynchronize
+            stream.keyframe_due = True
+
+    def close(self) -> None:
+        """Close the sink."""
+        self._sink.close()
+
+
+class StateReceiver:
+    """Rebuild spa state from keyframe and delta messages."""
+
+    def __init__(self) -> None:
+        """Initialize a state receiver."""
+        self.states: dict[str, dict[str, Any]] = {}
+        self._sequences: dict[str, int] = {}
+
+    def apply(self, message: dict[str, Any]) -> dict[str, Any] | None:
+        """Apply a message and return the spa state.
+
+        Returns None if a delta can not be applied because messages were missed,
+        in which case a keyframe should be requested.
+        """
+        key = message["mac"]
+        if message["type"] == MESSAGE_KEYFRAME:
+            self.states[key] = _copy(message["state"])
+        elif key not in self.states or self._sequences[key] != message["seq"] - 1:
+            return None
+        else:
+            _apply(self.states[key], message["changes"], message.get("removed", ()))
+        self._sequences[key] = message["seq"]
+        return self.states[key]
+
+    def keyframes(self) -> list[dict[str, Any]]:
+        """Return keyframe messages holding the current state of every spa."""
+        return [
+            {
+                "type": MESSAGE_KEYFRAME,
+                "state": state,
+                "mac": key,
+                "seq": self._sequences[key],
+            }
+            for key, state in self.states.items()
+        ]
+
+
+def _diff(
+    old: dict[str, Any],
+    new: dict[str, Any],
+    removed: list[list[str]],
+    path: tuple[str, ...] = (),
+) -> dict[str, Any]:
+    """Return the values of `new` that differ from `old`, recursing into dicts.
+
+    removed: Receives the path of every field of `old` missing from `new`
+    """
+    changes: dict[str, Any] = {}
+    for name, value in new.items():
+        previous = old.get(name)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            if nested := _diff(previous, value, removed, (*path, name)):
+                changes[name] = nested
+        elif value != previous or name not in old:
+            changes[name] = value
+    removed.extend([*path, name] for name in old if name not in new)
+    return changes
+
+
+def _apply(
+    state: dict[str, Any], changes: dict[str, Any], removed: Iterable[list[str]] = ()
+) -> None:
+    """Apply changes and removed paths from `_diff` to a state."""
+    for name, value in changes.items():
+        if isinstance(value, dict) and isinstance(state.get(name), dict):
+            _apply(state[name], value)
+        else:
+            state[name] = value
+    for *parents, name in removed:
+        parent: Any = state
+        for parent_name in parents:
+            parent = parent.get(parent_name) if isinstance(parent, dict) else None
+        if isinstance(parent, dict):
+            parent.pop(name, None)
+
+
+def _copy(state: dict[str, Any]) -> dict[str, Any]:
+    """Copy a state so applying changes does not modify the message."""
+    return {
+        name: _copy(value) if isinstance(value, dict) else value
+        for name, value in state.items()
+    }
@@ -0,0 +1,326 @@
+"""Balboa spa RS-485 bus transport."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import deque
+from time import monotonic
+
+from .enums import MessageType
+from .framing import FrameDecoder, encode_frame
+from .transport import SpaTransport, Streams, memory_pipe
+from .utils import MESSAGE_DELIMETER, cancel_task
+
+_LOGGER = logging.getLogger(__name__)
+
+_DELIMITER = bytes((MESSAGE_DELIMETER,))
+
+DEFAULT_BAUDRATE = 115200
+READ_SIZE = 1024
+# the most messages waiting for a clear to send slot before the oldest is dropped
+MAX_PENDING = 32
+# seconds without a clear to send for our channel before asking for a new one
+CHANNEL_TIMEOUT = 10
+
+HEADER = 0xBF
+CHANNEL_NEW_CLIENT = 0xFE
+# the Wi-Fi module channel used by the client, replaced by the assigned channel
+CHANNEL_WIFI = 0x0A
+
+# bus control message types, only sent on client channels
+NEW_CLIENT_CLEAR_TO_SEND = 0x00
+CHANNEL_ASSIGNMENT_REQUEST = 0x01
+CHANNEL_ASSIGNMENT_RESPONSE = 0x02
+CHANNEL_ASSIGNMENT_ACK = 0x03
+CLEAR_TO_SEND = 0x06
+NOTHING_TO_SEND = 0x07
+BUS_CONTROL_TYPES = frozenset(range(0x08))
+
+# device type and client hash sent with the channel assignment request
+DEVICE_TYPE = 0x02
+CLIENT_HASH = b"\xf1\x73"
+
+
+class SerialTransport(SpaTransport):
+    """Attach directly to the spa's RS-485 bus through a serial adapter.
+
+    The client connects with the device path as host, e.g. "/dev/ttyUSB0"; the
+    port is ignored. The transport joins the bus as a new client, asks the spa
+    for a channel and only transmits when the spa grants that channel a clear
+    to send slot. Messages from the client are queued until then and readdressed
+    from the Wi-Fi module channel to the assigned channel.
+
+    The bus has no Wi-Fi module to answer device present messages, so they are
+    answered locally with a module identification holding `mac_address`, as long
+    as the spa was heard from recently.
+    """
+
+    def __init__(
+        self,
+        mac_address: str = "02:00:00:00:00:01",
+        baudrate: int = DEFAULT_BAUDRATE,
+    ) -> None:
+        """Initialize a serial transport.
+
+        mac_address: The MAC address reported for the spa
+        baudrate: The bus speed, which is 115200 on all known spas
+        """
+        self._mac_address = bytes.fromhex(mac_address.replace(":", ""))
+        self._baudrate = baudrate
+
+    async def open(self, host: str, port: int) -> Streams:
+        """Open the serial device and return the client end of the bus link."""
+        fd = open_serial(host, self._baudrate)
+        client, link = memory_pipe()
+        BusLink(fd, *link, mac_address=self._mac_address).start()
+        return client
+
+
+class SerialMonitorTransport(SpaTransport):
+    """Listen to the spa's RS-485 bus through a serial adapter without sending.
+
+    The device is opened read only, so nothing written by the client can reach
+    the bus; every byte heard on the bus is passed through unchanged.
+    """
+
+    def __init__(self, baudrate: int = DEFAULT_BAUDRATE) -> None:
+        """Initialize a serial monitor transport.
+
+        baudrate: The bus speed, which is 115200 on all known spas
+        """
+        self._baudrate = baudrate
+
+    async def open(self, host: str, port: int) -> Streams:
+        """Open the serial device and return the client end of the tap."""
+        fd = open_serial(host, self._baudrate, read_only=True)
+        client, tap = memory_pipe()
+        BusTap(fd, *tap).start()
+        return client
+
+
+class BusTap:
+    """Copy the bytes read from a serial file descriptor to a stream."""
+
+    def __init__(
+        self, fd: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Initialize a bus tap."""
+        self._fd = fd
+        self._reader = reader
+        self._writer = writer
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start copying."""
+        asyncio.get_running_loop().add_reader(self._fd, self._bus_readable)
+        self._task = asyncio.ensure_future(self._wait_closed())
+
+    def close(self) -> None:
+        """Stop copying and close the serial device."""
+        if self._fd < 0:
+            return
+        asyncio.get_running_loop().remove_reader(self._fd)
+        os.close(self._fd)
+        self._fd = -1
+        self._writer.close()
+        if self._task is not None and self._task is not asyncio.current_task():
+            asyncio.ensure_future(cancel_task(self._task))
+
+    def _bus_readable(self) -> None:
+        """Pass the bytes read from the bus to the client."""
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as err:
+            _LOGGER.error("## serial read failed: %s", err)
+            data = b""
+        if not data:
+            self.close()
+            return
+        self._writer.write(data)
+
+    async def _wait_closed(self) -> None:
+        """Discard anything written by the client and close once it is done."""
+        try:
+            while await self._reader.read(READ_SIZE):
+                pass
+        finally:
+            self.close()
+
+
+class BusLink:
+    """Relay frames between a client stream and a serial file descriptor."""
+
+    def __init__(
+        self,
+        fd: int,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        *,
+        mac_address: bytes = bytes(6),
+    ) -> None:
+        """Initialize a bus link."""
+        self.channel: int | None = None
+        self._fd = fd
+        self._reader = reader
+        self._writer = writer
+        self._mac_address = mac_address
+        self._decoder = FrameDecoder()
+        self._pending: deque[bytes] = deque(maxlen=MAX_PENDING)
+        # bytes the serial device did not accept yet, written once it is writable
+        self._output = bytearray()
+        self._last_received = 0.0
+        self._last_clear_to_send = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start relaying."""
+        asyncio.get_running_loop().add_reader(self._fd, self._bus_readable)
+        self._task = asyncio.ensure_future(self._relay_client())
+
+    def close(self) -> None:
+        """Stop relaying and close the serial device."""
+        if self._fd < 0:
+            return
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(self._fd)
+        loop.remove_writer(self._fd)
+        self._output.clear()
+        os.close(self._fd)
+        self._fd = -1
+        self._writer.close()
+        if self._task is not None and self._task is not asyncio.current_task():
+            asyncio.ensure_future(cancel_task(self._task))
+
+    def _bus_readable(self) -> None:
+        """Read from the bus and handle every complete frame."""
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as err:
+            _LOGGER.error("## serial read failed: %s", err)
+            data = b""
+        if not data:
+            self.close()
+            return
+        for frame in self._decoder.feed(data):
+            if isinstance(frame, bytes):
+                self._bus_frame(frame)
+
+    def _bus_frame(self, frame: bytes) -> None:
+        """Handle bus control frames and pass everything else to the client."""
+        now = self._last_received = monotonic()
+        channel, message_type = frame[1], frame[3]
+        if frame[2] != HEADER or message_type not in BUS_CONTROL_TYPES:
+            if (
+                self.channel is not None
+                and now - self._last_clear_to_send > CHANNEL_TIMEOUT
+            ):
+                _LOGGER.warning("## no clear to send on channel %02x", self.channel)
+                self.channel = None
+            self._writer.write(_DELIMITER + frame + _DELIMITER)
+        elif channel == CHANNEL_NEW_CLIENT and self.channel is None:
+            if message_type == NEW_CLIENT_CLEAR_TO_SEND:
+                self._send(
+                    CHANNEL_NEW_CLIENT,
+                    CHANNEL_ASSIGNMENT_REQUEST,
+                    bytes((DEVICE_TYPE,)) + CLIENT_HASH,
+                )
+            elif (
+                message_type == CHANNEL_ASSIGNMENT_RESPONSE
+                and frame[5:7] == CLIENT_HASH
+            ):
+                self.channel = frame[4]
+                self._last_clear_to_send = now
+                _LOGGER.debug("-- assigned bus channel %02x", self.channel)
+                self._send(self.channel, CHANNEL_ASSIGNMENT_ACK)
+        elif channel == self.channel and message_type == CLEAR_TO_SEND:
+            self._last_clear_to_send = now
+            if self._pending:
+                body = self._pending.popleft()
+                self._send(self.channel, body[0], body[1:])
+            else:
+                self._send(self.channel, NOTHING_TO_SEND)
+
+    def _send(self, channel: int, message_type: int, payload: bytes = b"") -> None:
+        """Write a message to the bus."""
+        waiting = bool(self._output)
+        self._output += encode_frame(bytes((channel, HEADER, message_type)) + payload)
+        if not waiting:
+            self._bus_writable()
+
+    def _bus_writable(self) -> None:
+        """Write as much of the output as the device accepts, waiting for the rest."""
+        loop = asyncio.get_running_loop()
+        try:
+            written = os.write(self._fd, self._output)
+        except BlockingIOError:
+            written = 0
+        except OSError as err:
+            _LOGGER.error("## serial write failed: %s", err)
+            written = len(self._output)
+        del self._output[:written]
+        if self._output:
+            loop.add_writer(self._fd, self._bus_writable)
+        else:
+            loop.remove_writer(self._fd)
+
+    async def _relay_client(self) -> None:
+        """Queue the messages of the client for the next clear to send slot."""
+        decoder = FrameDecoder()
+        try:
+            while data := await self._reader.read(READ_SIZE):
+                for frame in decoder.feed(data):
+                    if isinstance(frame, bytes):
+                        self._client_frame(frame)
+        finally:
+            self.close()
+
+    def _client_frame(self, frame: bytes) -> None:
+        """Answer or queue a frame from the client."""
+        if frame[3] == MessageType.DEVICE_PRESENT:
+            if monotonic() - self._last_received < CHANNEL_TIMEOUT:
+                self._writer.write(self._module_identification())
+            return
+        if len(self._pending) == MAX_PENDING:
+            _LOGGER.warning("## dropping unsent message %s", self._pending[0].hex())
+        # keep the message type and payload, the channel is set when sent
+        self._pending.append(frame[3:-1])
+
+    def _module_identification(self) -> bytes:
+        """Return a module identification frame for the client."""
+        return encode_frame(
+            bytes((CHANNEL_WIFI, HEADER, MessageType.MODULE_IDENTIFICATION))
+            + bytes(3)
+            + self._mac_address
+            + bytes(16)
+        )
+
+
+def open_serial(
+    path: str, baudrate: int = DEFAULT_BAUDRATE, *, read_only: bool = False
+) -> int:
+    """Open a serial device in raw 8N1 mode and return its file descriptor.
+
+    read_only: Open the device for reading only, so nothing can be sent
+    """
+    import termios  # pylint: disable=import-outside-toplevel
+
+    speed = getattr(termios, f"B{baudrate}")
+    mode = os.O_RDONLY if read_only else os.O_RDWR
+    fd = os.open(path, mode | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        cc = termios.tcgetattr(fd)[6]
+        cc[termios.VMIN] = 0
+        cc[termios.VTIME] = 0
+        cflag = termios.CS8 | termios.CREAD | termios.CLOCAL
+        termios.tcsetattr(fd, termios.TCSANOW, [0, 0, cflag, 0, speed, speed, cc])
+        termios.tcflush(fd, termios.TCIOFLUSH)
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
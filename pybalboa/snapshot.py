@@ -0,0 +1,155 @@
+"""Balboa spa state snapshots."""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from enum import IntEnum
+from typing import Any, NoReturn
+
+from .enums import HeatState, SpaState, TemperatureUnit, WiFiState
+
+UPDATES_DROP_OLDEST = "drop_oldest"
+UPDATES_LATEST_ONLY = "latest_only"
+UPDATE_POLICIES = (UPDATES_DROP_OLDEST, UPDATES_LATEST_ONLY)
+
+SNAPSHOT_FIELDS = (
+    "updated",
+    "model",
+    "mac_address",
+    "state",
+    "temperature_unit",
+    "temperature",
+    "target_temperature",
+    "temperature_minimum",
+    "temperature_maximum",
+    "heat_state",
+    "time_hour",
+    "time_minute",
+    "is_24_hour",
+    "filter_cycle_1_running",
+    "filter_cycle_2_running",
+    "wifi_state",
+    "controls",
+)
+
+
+class SpaSnapshot:
+    """Immutable point-in-time view of the spa state.
+
+    The client builds one snapshot per changed status frame and hands the same
+    instance to every consumer; the JSON encoding is built on first use and then
+    shared as well.
+    """
+
+    __slots__ = (*SNAPSHOT_FIELDS, "_json")
+
+    updated: datetime | None
+    model: str | None
+    mac_address: str | None
+    state: SpaState
+    temperature_unit: TemperatureUnit
+    temperature: float | None
+    target_temperature: float | None
+    temperature_minimum: float
+    temperature_maximum: float
+    heat_state: HeatState
+    time_hour: int
+    time_minute: int
+    is_24_hour: bool
+    filter_cycle_1_running: bool
+    filter_cycle_2_running: bool
+    wifi_state: WiFiState | None
+    controls: tuple[tuple[str, IntEnum], ...]
+    _json: str | None
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        *,
+        updated: datetime | None,
+        model: str | None,
+        mac_address: str | None,
+        state: SpaState,
+        temperature_unit: TemperatureUnit,
+        temperature: float | None,
+        target_temperature: float | None,
+        temperature_minimum: float,
+        temperature_maximum: float,
+        heat_state: HeatState,
+        time_hour: int,
+        time_minute: int,
+        is_24_hour: bool,
+        filter_cycle_1_running: bool,
+        filter_cycle_2_running: bool,
+        wifi_state: WiFiState | None,
+        controls: tuple[tuple[str, IntEnum], ...],
+    ) -> None:
+        """Initialize a spa snapshot."""
+        values = locals()
+        for name in SNAPSHOT_FIELDS:
+            object.__setattr__(self, name, values[name])
+        object.__setattr__(self, "_json", None)
+
+    def __setattr__(self, name: str, value: Any) -> NoReturn:
+        """Prevent changes to the snapshot."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> NoReturn:
+        """Prevent changes to the snapshot."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        """Return repr(self)."""
+        return f"SpaSnapshot({self.state.name}, {self.temperature}, {self.updated})"
+
+    def __eq__(self, other: object) -> bool:
+        """Return self == other."""
+        if not isinstance(other, SpaSnapshot):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self) -> int:
+        """Return hash(self)."""
+        return hash(self._values())
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Support pickling, which would otherwise set the slots directly."""
+        return (_restore, (self._values(),))
+
+    def _values(self) -> tuple[Any, ...]:
+        """Return the field values in order."""
+        return tuple(getattr(self, name) for name in SNAPSHOT_FIELDS)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the snapshot as JSON compatible values."""
+        return {
+            "updated": None if self.updated is None else self.updated.isoformat(),
+            "model": self.model,
+            "mac_address": self.mac_address,
+            "state": self.state.name,
+            "temperature_unit": self.temperature_unit.name,
+            "temperature": self.temperature,
+            "target_temperature": self.target_temperature,
+            "temperature_minimum": self.temperature_minimum,
+            "temperature_maximum": self.temperature_maximum,
+            "heat_state": self.heat_state.name,
+            "time_hour": self.time_hour,
+            "time_minute": self.time_minute,
+            "is_24_hour": self.is_24_hour,
+            "filter_cycle_1_running": self.filter_cycle_1_running,
+            "filter_cycle_2_running": self.filter_cycle_2_running,
+            "wifi_state": None if self.wifi_state is None else self.wifi_state.name,
+            "controls": {name: state.name for name, state in self.controls},
+        }
+
+    def to_json(self) -> str:
+        """Return the snapshot as compact JSON."""
+        if (encoded := self._json) is None:
+            encoded = json.dumps(self.to_dict(), separators=(",", ":"))
+            object.__setattr__(self, "_json", encoded)
+        return encoded
+
+
+def _restore(values: tuple[Any, ...]) -> SpaSnapshot:
+    """Recreate a pickled snapshot."""
+    return SpaSnapshot(**dict(zip(SNAPSHOT_FIELDS, values)))
@@ -0,0 +1,303 @@
+"""Balboa spa passive bus sniffer."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Callable
+from dataclasses import dataclass
+from time import time
+from typing import Any
+
+from .client import DEFAULT_PORT, READ_SIZE
+from .enums import MessageType
+from .exceptions import SpaConnectionError, SpaMessageError
+from .framing import FrameDecoder
+from .metrics import MESSAGE_ERROR_REASONS
+from .rs485 import (
+    CHANNEL_ASSIGNMENT_ACK,
+    CHANNEL_ASSIGNMENT_REQUEST,
+    CHANNEL_ASSIGNMENT_RESPONSE,
+    CLEAR_TO_SEND,
+    DEFAULT_BAUDRATE,
+    NEW_CLIENT_CLEAR_TO_SEND,
+    NOTHING_TO_SEND,
+)
+from .transport import SpaTransport, TcpTransport
+from .utils import add_slots, cancel_task
+
+_LOGGER = logging.getLogger(__name__)
+
+# start and stop bit around each byte on the 8N1 bus
+BITS_PER_BYTE = 10
+
+BUS_CONTROL_NAMES = {
+    NEW_CLIENT_CLEAR_TO_SEND: "NEW_CLIENT_CLEAR_TO_SEND",
+    CHANNEL_ASSIGNMENT_REQUEST: "CHANNEL_ASSIGNMENT_REQUEST",
+    CHANNEL_ASSIGNMENT_RESPONSE: "CHANNEL_ASSIGNMENT_RESPONSE",
+    CHANNEL_ASSIGNMENT_ACK: "CHANNEL_ASSIGNMENT_ACK",
+    CLEAR_TO_SEND: "CLEAR_TO_SEND",
+    NOTHING_TO_SEND: "NOTHING_TO_SEND",
+}
+
+
+def message_type_name(message_type: int) -> str:
+    """Return the name of a message type byte, including bus control types."""
+    if (name := MessageType(message_type)) is not MessageType.UNKNOWN:
+        return name.name
+    return BUS_CONTROL_NAMES.get(message_type, f"0x{message_type:02X}")
+
+
+@add_slots
+@dataclass(frozen=True)
+class SniffedFrame:
+    """A frame seen on the bus, whoever it was addressed to."""
+
+    timestamp: float
+    data: bytes
+
+    @property
+    def channel(self) -> int:
+        """Return the channel the frame was addressed to."""
+        return self.data[1]
+
+    @property
+    def message_type(self) -> int:
+        """Return the message type byte."""
+        return self.data[3]
+
+    @property
+    def name(self) -> str:
+        """Return the name of the message type."""
+        return message_type_name(self.data[3])
+
+    @property
+    def payload(self) -> bytes:
+        """Return the payload, without the header, type and checksum."""
+        return self.data[4:-1]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the frame as a dictionary."""
+        return {
+            "timestamp": self.timestamp,
+            "channel": self.channel,
+            "type": self.name,
+            "payload": self.payload.hex(),
+        }
+
+
+class BusStatistics:
+    """Frame and byte counts per channel and message type.
+
+    Counters are keyed by `(channel, message_type)` and only formatted when
+    `snapshot` is called.
+    """
+
+    __slots__ = (
+        "bytes",
+        "bytes_discarded",
+        "first_timestamp",
+        "frames",
+        "last_timestamp",
+        "message_errors",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.frames: defaultdict[tuple[int, int], int] = defaultdict(int)
+        self.bytes: defaultdict[tuple[int, int], int] = defaultdict(int)
+        self.message_errors = dict.fromkeys(MESSAGE_ERROR_REASONS, 0)
+        self.bytes_discarded = 0
+        self.first_timestamp: float | None = None
+        self.last_timestamp: float | None = None
+
+    def frame(self, frame: SniffedFrame) -> None:
+        """Record a frame."""
+        key = (frame.data[1], frame.data[3])
+        self.frames[key] += 1
+        # count the delimiters, they take bus time too
+        self.bytes[key] += len(frame.data) + 2
+        self._seen(frame.timestamp)
+
+    def error(self, err: SpaMessageError, timestamp: float) -> None:
+        """Record bytes discarded while resynchronizing."""
+        self.message_errors[err.reason] = self.message_errors.get(err.reason, 0) + 1
+        self.bytes_discarded += err.discarded
+        self._seen(timestamp)
+
+    def _seen(self, timestamp: float) -> None:
+        """Extend the time span covered by the counters."""
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+
+    @property
+    def duration(self) -> float:
+        """Return the seconds between the first and last frame seen."""
+        if self.first_timestamp is None or self.last_timestamp is None:
+            return 0.0
+        return self.last_timestamp - self.first_timestamp
+
+    def utilization(self, baudrate: int = DEFAULT_BAUDRATE) -> float | None:
+        """Return the fraction of the bus capacity used, if a duration is known."""
+        if not (duration := self.duration):
+            return None
+        total = sum(self.bytes.values()) + self.bytes_discarded
+        return total * BITS_PER_BYTE / (baudrate * duration)
+
+    def snapshot(self, baudrate: int = DEFAULT_BAUDRATE) -> dict[str, Any]:
+        """Return the counters as a dictionary, grouped by channel."""
+        channels: dict[str, dict[str, dict[str, int]]] = {}
+        for (channel, message_type), count in sorted(self.frames.items()):
+            channels.setdefault(f"0x{channel:02X}", {})[
+                message_type_name(message_type)
+            ] = {"frames": count, "bytes": self.bytes[(channel, message_type)]}
+        return {
+            "channels": channels,
+            "frames": sum(self.frames.values()),
+            "bytes": sum(self.bytes.values()),
+            "message_errors": dict(self.message_errors),
+            "bytes_discarded": self.bytes_discarded,
+            "duration": self.duration,
+            "utilization": self.utilization(baudrate),
+        }
+
+
+class SpaSniffer:
+    """Passively decode every frame on a spa connection.
+
+    Unlike `SpaClient`, the sniffer never sends anything: no device present
+    probe, no configuration requests and no keepalives. Frames addressed to other
+    channels and of unknown types are decoded and counted like any other, which
+    helps to reverse engineer new models and to measure how busy the bus is.
+
+    Over TCP only the frames the Wi-Fi module relays are seen; use
+    `SerialMonitorTransport` to listen to the RS-485 bus itself.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        *,
+        transport: SpaTransport | None = None,
+    ) -> None:
+        """Initialize a sniffer.
+
+        host: The host, or the serial device with a serial transport
+        port: The port
+        transport: The transport to listen through, TCP by default
+        """
+        self._host = host
+        self._port = port
+        self._transport = transport or TcpTransport()
+        self._writer: asyncio.StreamWriter | None = None
+        self._listener: asyncio.Task | None = None
+        self._decoder = FrameDecoder()
+        self._frame_hooks: list[Callable[[SniffedFrame | None], None]] = []
+        self.statistics = BusStatistics()
+
+    @property
+    def connected(self) -> bool:
+        """Return `True` while listening."""
+        return self._listener is not None and not self._listener.done()
+
+    async def __aenter__(self) -> SpaSniffer:
+        """Connect when entering the context."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Disconnect when leaving the context."""
+        await self.disconnect()
+
+    async def connect(self) -> None:
+        """Open the connection and start listening."""
+        if self.connected:
+            return
+        try:
+            reader, self._writer = await self._transport.open(self._host, self._port)
+        except (asyncio.TimeoutError, OSError) as err:
+            raise SpaConnectionError(f"Cannot connect to {self._host}") from err
+        self._decoder.reset()
+        self._listener = asyncio.ensure_future(self._listen(reader))
+        _LOGGER.debug("%s -- sniffing", self._host)
+
+    async def disconnect(self) -> None:
+        """Stop listening and close the connection."""
+        await cancel_task(self._listener)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _listen(self, reader: asyncio.StreamReader) -> None:
+        """Feed everything read to the decoder until the connection closes."""
+        try:
+            while data := await reader.read(READ_SIZE):
+                self.feed(data)
+        except OSError as err:
+            _LOGGER.error("%s ## %s", self._host, err)
+        finally:
+            for hook in self._frame_hooks:
+                hook(None)
+            _LOGGER.debug("%s -- stopped sniffing", self._host)
+
+    def feed(self, data: bytes, timestamp: float | None = None) -> list[SniffedFrame]:
+        """Decode bytes, count and pass on the frames found and return them.
+
+        timestamp: When the bytes were received, now if not given
+        """
+        if timestamp is None:
+            timestamp = time()
+        frames = []
+        for frame in self._decoder.feed(data):
+            if isinstance(frame, SpaMessageError):
+                _LOGGER.debug("%s ## %s", self._host, frame)
+                self.statistics.error(frame, timestamp)
+                continue
+            sniffed = SniffedFrame(timestamp, frame)
+            self.statistics.frame(sniffed)
+            for hook in self._frame_hooks:
+                hook(sniffed)
+            frames.append(sniffed)
+        return frames
+
+    def add_frame_hook(
+        self, hook: Callable[[SniffedFrame | None], None]
+    ) -> Callable[[], None]:
+        """Call `hook` with every frame and with `None` once listening stops.
+
+        Returns a callable that removes the hook.
+        """
+        self._frame_hooks.append(hook)
+
+        def remove() -> None:
+            if hook in self._frame_hooks:
+                self._frame_hooks.remove(hook)
+
+        return remove
+
+    async def frames(self, maxsize: int = 256) -> AsyncGenerator[SniffedFrame, None]:
+        """Iterate over the frames as they are received.
+
+        Frames are queued without blocking the listener; once `maxsize` frames
+        are waiting the oldest is dropped. Iteration ends once listening stops.
+
+        maxsize: The most frames to queue
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        queue: asyncio.Queue[SniffedFrame | None] = asyncio.Queue(maxsize)
+
+        def _enqueue(frame: SniffedFrame | None) -> None:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+        remove = self.add_frame_hook(_enqueue)
+        try:
+            while (frame := await queue.get()) is not None:
+                yield frame
+        finally:
+            remove()
@@ -0,0 +1,208 @@
+"""Synchronous access to spa clients from other threads."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable, Coroutine
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from enum import IntEnum
+from typing import Any, TypeVar
+
+from .client import DEFAULT_PORT, SpaClient
+from .control import EVENT_UPDATE
+from .snapshot import SpaSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
+
+DEFAULT_SYNC_TIMEOUT = 30
+
+
+class SpaLoopThread:
+    """Event loop running in a dedicated thread, shared by many clients.
+
+    Blocking calls submit coroutines to the loop with `run_coroutine_threadsafe`
+    and wait up to `timeout` seconds for the result.
+    """
+
+    def __init__(
+        self, *, name: str = "pybalboa", timeout: float = DEFAULT_SYNC_TIMEOUT
+    ) -> None:
+        """Initialize a loop thread.
+
+        timeout: The default number of seconds to wait for a call to complete
+        """
+        self.timeout = timeout
+        self._name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._clients: list[SyncSpaClient] = []
+
+    @property
+    def running(self) -> bool:
+        """Return `True` if the loop thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the loop thread."""
+        if self.running:
+            return
+        started = threading.Event()
+
+        def _run() -> None:
+            loop = self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            try:
+                loop.run_forever()
+            finally:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+
+        self._thread = threading.Thread(target=_run, name=self._name, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Disconnect all clients and stop the loop thread."""
+        if not self.running:
+            return
+        for client in [*self._clients]:
+            try:
+                client.disconnect(timeout)
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.error("%s ## error disconnecting: %s", client.host, ex)
+        self._clients.clear()
+        assert self._loop and self._thread
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(self.timeout if timeout is None else timeout)
+        self._thread = None
+
+    def run(self, coro: Coroutine[Any, Any, _T], timeout: float | None = None) -> _T:
+        """Run a coroutine on the loop and wait for its result."""
+        if not self.running:
+            coro.close()
+            raise RuntimeError("Loop thread is not running")
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Blocking call from the loop thread would deadlock")
+        assert self._loop
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def add_client(
+        self, host: str, port: int = DEFAULT_PORT, **kwargs: Any
+    ) -> SyncSpaClient:
+        """Create a client on the loop; keyword arguments are passed to SpaClient."""
+
+        async def _create() -> SyncSpaClient:
+            return SyncSpaClient(self, SpaClient(host, port, **kwargs))
+
+        client = self.run(_create())
+        self._clients.append(client)
+        return client
+
+    def __enter__(self) -> SpaLoopThread:
+        """Start the loop thread."""
+        self.start()
+        return self
+
+    def __exit__(self, *exctype: Any) -> None:
+        """Stop the loop thread."""
+        self.stop()
+
+
+class SyncSpaClient:
+    """Thread-safe, blocking view of a client running on a `SpaLoopThread`.
+
+    The latest snapshot is swapped in by the loop thread on every update, so
+    reading it never takes a lock or touches the loop.
+    """
+
+    def __init__(self, loop_thread: SpaLoopThread, client: SpaClient) -> None:
+        """Initialize a synchronous client, on the loop thread like the client."""
+        self._loop_thread = loop_thread
+        self._client = client
+        self._snapshot = client.snapshot()
+        self._updated = threading.Condition()
+        client.on(EVENT_UPDATE, self._update)
+
+    @property
+    def client(self) -> SpaClient:
+        """Return the client, only to be used from the loop thread."""
+        return self._client
+
+    @property
+    def host(self) -> str:
+        """Return the host address."""
+        return self._client.host
+
+    @property
+    def snapshot(self) -> SpaSnapshot:
+        """Return the latest snapshot of the spa state."""
+        return self._snapshot
+
+    def _update(self) -> None:
+        """Swap in the latest snapshot and wake up waiting threads."""
+        if (snapshot := self._client.snapshot()) is self._snapshot:
+            return
+        self._snapshot = snapshot
+        with self._updated:
+            self._updated.notify_all()
+
+    def wait_for_update(self, timeout: float | None = None) -> SpaSnapshot | None:
+        """Wait for the next changed snapshot, or return None on timeout."""
+        current = self._snapshot
+        with self._updated:
+            if not self._updated.wait_for(
+                lambda: self._snapshot is not current, timeout
+            ):
+                return None
+        return self._snapshot
+
+    def call(
+        self,
+        method: Callable[[SpaClient], Awaitable[_T]],
+        timeout: float | None = None,
+    ) -> _T:
+        """Call a coroutine function with the client on the loop and wait for it."""
+
+        async def _call() -> _T:
+            return await method(self._client)
+
+        return self._loop_thread.run(_call(), timeout)
+
+    def connect(self, timeout: float | None = None) -> bool:
+        """Connect to the spa and wait for the configuration to load."""
+
+        async def _connect(client: SpaClient) -> bool:
+            return await client.connect() and await client.async_configuration_loaded()
+
+        return self.call(_connect, timeout)
+
+    def disconnect(self, timeout: float | None = None) -> None:
+        """Disconnect from the spa."""
+        self.call(SpaClient.disconnect, timeout)
+
+    def set_temperature(self, temperature: float, timeout: float | None = None) -> None:
+        """Set the target temperature."""
+        self.call(lambda client: client.set_temperature(temperature), timeout)
+
+    def set_control_state(
+        self, name: str, state: int | IntEnum, timeout: float | None = None
+    ) -> bool:
+        """Set the state of the control with the given name, e.g. "Pump 1"."""
+
+        async def _set(client: SpaClient) -> bool:
+            for control in client.controls:
+                if control.name == name:
+                    return await control.set_state(state)
+            raise ValueError(f"Unknown control: {name}")
+
+        return self.call(_set, timeout)
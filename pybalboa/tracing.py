@@ -0,0 +1,197 @@
+"""Balboa spa command tracing."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from bisect import bisect_left
+from collections.abc import Callable
+from time import monotonic
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_COMMAND_TIMEOUT = 10
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_QUEUED = "queued"
+STAGE_WRITTEN = "written"
+STAGE_DRAINED = "drained"
+STAGE_CONFIRMED = "confirmed"
+STAGE_TIMEOUT = "timeout"
+
+TraceHook = Callable[["CommandTrace", str], None]
+
+
+class CommandTrace:
+    """Lifecycle of a single command, from queued to confirmed by a status frame."""
+
+    __slots__ = (
+        "command",
+        "confirmed",
+        "drained",
+        "handle",
+        "predicate",
+        "queued",
+        "timed_out",
+        "written",
+    )
+
+    def __init__(self, command: str, predicate: Callable[[], bool]) -> None:
+        """Initialize a command trace."""
+        self.command = command
+        self.queued = monotonic()
+        self.written: float | None = None
+        self.drained: float | None = None
+        self.confirmed: float | None = None
+        self.timed_out = False
+        self.predicate = predicate
+        self.handle: asyncio.TimerHandle | None = None
+
+    def __repr__(self) -> str:
+        """Return repr(self)."""
+        return f"{self.command}: {self.latency}"
+
+    @property
+    def latency(self) -> float | None:
+        """Return the seconds from queued until confirmed."""
+        return None if self.confirmed is None else self.confirmed - self.queued
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the trace as a dictionary of monotonic stage times."""
+        return {
+            "command": self.command,
+            STAGE_QUEUED: self.queued,
+            STAGE_WRITTEN: self.written,
+            STAGE_DRAINED: self.drained,
+            STAGE_CONFIRMED: self.confirmed,
+            STAGE_TIMEOUT: self.timed_out,
+        }
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize a latency histogram."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a latency in seconds."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return cumulative bucket counts, count and sum."""
+        cumulative: dict[str, int] = {}
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+class CommandTracker:
+    """Track pending commands until a status frame confirms them."""
+
+    def __init__(self, timeout: float = DEFAULT_COMMAND_TIMEOUT) -> None:
+        """Initialize a command tracker."""
+        self.timeout = timeout
+        self.pending: list[CommandTrace] = []
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.timeouts: dict[str, int] = {}
+        self._hooks: list[TraceHook] = []
+
+    def add_hook(self, hook: TraceHook) -> Callable[[], None]:
+        """Register a hook called with each trace at every stage."""
+        self._hooks.append(hook)
+
+        def remove() -> None:
+            """Remove the hook."""
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+        return remove
+
+    def start(self, command: str, predicate: Callable[[], bool]) -> CommandTrace:
+        """Start tracing a command that is confirmed once `predicate` is true."""
+        trace = CommandTrace(command, predicate)
+        self.begin(trace)
+        return trace
+
+    def begin(self, trace: CommandTrace) -> None:
+        """Start tracing a created trace, e.g. once its command was written.
+
+        A command whose result already holds, like setting the current target
+        temperature, is confirmed right away since no status will change.
+        """
+        if trace.handle is not None:
+            return
+        trace.handle = asyncio.get_running_loop().call_later(
+            self.timeout, self._expire, trace
+        )
+        self.pending.append(trace)
+        self._notify(trace, STAGE_QUEUED)
+        if trace.predicate():
+            self._confirm(trace)
+
+    def written(self, trace: CommandTrace) -> None:
+        """Record that a command was written to the transport."""
+        trace.written = monotonic()
+        if trace in self.pending:
+            self._notify(trace, STAGE_WRITTEN)
+
+    def drained(self, trace: CommandTrace) -> None:
+        """Record that a command was flushed from the transport."""
+        trace.drained = monotonic()
+        if trace in self.pending:
+            self._notify(trace, STAGE_DRAINED)
+
+    def check(self) -> None:
+        """Confirm pending commands reflected by the latest status."""
+        for trace in [trace for trace in self.pending if trace.predicate()]:
+            self._confirm(trace)
+
+    def _confirm(self, trace: CommandTrace) -> None:
+        """Confirm a pending command."""
+        trace.confirmed = monotonic()
+        self._finish(trace)
+        self.histograms.setdefault(trace.command, LatencyHistogram()).observe(
+            trace.confirmed - trace.queued
+        )
+        self._notify(trace, STAGE_CONFIRMED)
+
+    def cancel(self) -> None:
+        """Drop all pending commands."""
+        for trace in [*self.pending]:
+            self._finish(trace)
+
+    def _expire(self, trace: CommandTrace) -> None:
+        """Time out a command that was never confirmed."""
+        if trace not in self.pending:
+            return
+        trace.timed_out = True
+        self._finish(trace)
+        self.timeouts[trace.command] = self.timeouts.get(trace.command, 0) + 1
+        _LOGGER.debug("Command %s was not confirmed", trace.command)
+        self._notify(trace, STAGE_TIMEOUT)
+
+    def _finish(self, trace: CommandTrace) -> None:
+        """Remove a trace from the pending commands."""
+        self.pending.remove(trace)
+        if trace.handle is not None:
+            trace.handle.cancel()
+
+    def _notify(self, trace: CommandTrace, stage: str) -> None:
+        """Call the trace hooks."""
+        for hook in self._hooks:
+            try:
+                hook(trace, stage)
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.error("Trace hook error: %s", ex)
@@ -0,0 +1,161 @@
+"""Balboa spa transports."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 10
+
+Streams = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+ConnectionHandler = Callable[
+    [asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]
+]
+
+
+class SpaTransport(ABC):
+    """Opens the byte stream a client talks to the spa over."""
+
+    @abstractmethod
+    async def open(self, host: str, port: int) -> Streams:
+        """Open a connection and return its reader and writer."""
+
+
+class TcpTransport(SpaTransport):
+    """Connect to a Wi-Fi module over TCP."""
+
+    def __init__(self, timeout: float = CONNECT_TIMEOUT) -> None:
+        """Initialize a TCP transport.
+
+        timeout: The number of seconds to wait for the connection
+        """
+        self._timeout = timeout
+
+    async def open(self, host: str, port: int) -> Streams:
+        """Open a TCP connection."""
+        return await asyncio.wait_for(
+            asyncio.open_connection(host, port), self._timeout
+        )
+
+
+class MemoryTransport(SpaTransport):
+    """Connect to an in-process spa over an in-memory pipe.
+
+    Each connection runs `handler` with the spa end of the pipe, like a callback
+    of `asyncio.start_server`, so tests and benchmarks skip the kernel socket.
+    """
+
+    def __init__(self, handler: ConnectionHandler) -> None:
+        """Initialize a memory transport."""
+        self._handler = handler
+        self._tasks: set[asyncio.Task] = set()
+
+    async def open(self, host: str, port: int) -> Streams:
+        """Open a pipe and start the handler on its other end."""
+        client, spa = memory_pipe()
+        task = asyncio.ensure_future(self._handler(*spa))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return client
+
+
+class _PipeTransport(asyncio.Transport):
+    """One end of an in-memory pipe, delivering writes to the other end."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, name: str) -> None:
+        """Initialize the transport."""
+        super().__init__({"peername": (name, 0), "sockname": (name, 0)})
+        self._loop = loop
+        self._protocol: asyncio.Protocol | None = None
+        self.peer: _PipeTransport | None = None
+        self._closing = False
+
+    def set_protocol(self, protocol: asyncio.BaseProtocol) -> None:
+        """Set the protocol receiving the data of this end."""
+        assert isinstance(protocol, asyncio.Protocol)
+        self._protocol = protocol
+
+    def get_protocol(self) -> asyncio.BaseProtocol:
+        """Return the protocol."""
+        assert self._protocol
+        return self._protocol
+
+    def is_closing(self) -> bool:
+        """Return `True` if the pipe is closing."""
+        return self._closing
+
+    def write(self, data: bytes | bytearray | memoryview) -> None:
+        """Deliver data to the other end on the next loop iteration."""
+        if self._closing or self.peer is None:
+            return
+        self._loop.call_soon(self.peer.data_received, bytes(data))
+
+    def data_received(self, data: bytes) -> None:
+        """Pass data written by the other end to the protocol."""
+        if not self._closing and self._protocol is not None:
+            self._protocol.data_received(data)
+
+    def get_write_buffer_size(self) -> int:
+        """Return 0, as writes are never buffered."""
+        return 0
+
+    def can_write_eof(self) -> bool:
+        """Return `False`, half closed pipes are not supported."""
+        return False
+
+    def is_reading(self) -> bool:
+        """Return `True` until the pipe is closed."""
+        return not self._closing
+
+    def pause_reading(self) -> None:
+        """Ignore, the pipe has no reader to pause."""
+
+    def resume_reading(self) -> None:
+        """Ignore, the pipe has no reader to resume."""
+
+    def close(self) -> None:
+        """Close both ends of the pipe."""
+        if self._closing:
+            return
+        self._closing = True
+        if self._protocol is not None:
+            self._loop.call_soon(self._protocol.connection_lost, None)
+        if self.peer is not None:
+            self._loop.call_soon(self.peer.close)
+
+    def abort(self) -> None:
+        """Close both ends of the pipe."""
+        self.close()
+
+
+def memory_pipe(limit: int = 2**16) -> tuple[Streams, Streams]:
+    """Return the reader and writer of both ends of an in-memory pipe."""
+    loop = asyncio.get_running_loop()
+    ends = []
+    transports = (_PipeTransport(loop, "client"), _PipeTransport(loop, "spa"))
+    for transport in transports:
+        reader = asyncio.StreamReader(limit=limit, loop=loop)
+        protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+        transport.set_protocol(protocol)
+        protocol.connection_made(transport)
+        ends.append((reader, asyncio.StreamWriter(transport, protocol, reader, loop)))
+    transports[0].peer, transports[1].peer = transports[1], transports[0]
+    return ends[0], ends[1]
+
+
+def use_uvloop() -> bool:
+    """Use uvloop for new event loops if it is installed; return `True` if so.
+
+    Call before the event loop hosting the clients is created.
+    """
+    try:
+        import uvloop  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        _LOGGER.debug("uvloop is not installed, using the default event loop")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
@@ -4,14 +4,33 @@ from __future__ import annotations
 
 import asyncio
 from collections.abc import Callable
+from dataclasses import fields
 from datetime import datetime, time, timedelta, timezone
-from typing import Any
+from typing import Any, TypeVar, cast
 
 from .exceptions import SpaMessageError
 
 MESSAGE_DELIMETER_BYTE = b"~"
 MESSAGE_DELIMETER = MESSAGE_DELIMETER_BYTE[0]
 
+_T = TypeVar("_T")
+
+
+def add_slots(cls: type[_T]) -> type[_T]:
+    """Recreate a dataclass with `__slots__` for its fields.
+
+    Equivalent to `dataclass(slots=True)`, which needs Python 3.10.
+    """
+    namespace = dict(cls.__dict__)
+    names = tuple(field.name for field in fields(cls))  # type: ignore[arg-type]
+    for name in (*names, "__dict__", "__weakref__"):
+        namespace.pop(name, None)
+    namespace["__slots__"] = names
+    metaclass: type = type(cls)
+    slotted = cast("type[_T]", metaclass(cls.__name__, cls.__bases__, namespace))
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
 
 def byte_parser(
     value: int,
@@ -26,21 +45,27 @@ def byte_parser(
     ]
 
 
+def _crc_table() -> tuple[int, ...]:
+    """Build the CRC-8 (polynomial 0x07) lookup table."""
+    table = []
+    for value in range(256):
+        for _ in range(8):
+            value = ((value << 1) ^ 0x07 if value & 0x80 else value << 1) & 0xFF
+        table.append(value)
+    return tuple(table)
+
+
+_CRC_TABLE = _crc_table()
+
+
 def calculate_checksum(data: bytes) -> int:
-    """Calculate the checksum byte for a message."""
-    crc = 0xB5
-    for _, cur in enumerate(data):
-        for i in range(8):
-            bit = crc & 0x80
-            crc = ((crc << 1) & 0xFF) | ((cur >> (7 - i)) & 0x01)
-            if bit:
-                crc = crc ^ 0x07
-        crc &= 0xFF
-    for i in range(8):
-        bit = crc & 0x80
-        crc = (crc << 1) & 0xFF
-        if bit:
-            crc ^= 0x07
+    """Calculate the checksum byte for a message.
+
+    CRC-8 with polynomial 0x07, initial value 0x02 and final XOR 0x02.
+    """
+    crc = 0x02
+    for cur in data:
+        crc = _CRC_TABLE[crc ^ cur]
     return crc ^ 0x02
 
 
@@ -74,7 +99,7 @@ def default(value: Any, default_value: Any | Callable[[], Any]) -> Any:
     return default_value() if callable(default_value) else default_value
 
 
-async def read_one_message(reader: asyncio.StreamReader, timeout: int = 15) -> bytes:
+async def read_one_message(reader: asyncio.StreamReader, timeout: float = 15) -> bytes:
     """Read one message."""
     data = await asyncio.wait_for(reader.readexactly(2), timeout)
     if data[0] != MESSAGE_DELIMETER or data[1] == 0:
@@ -83,12 +108,18 @@ async def read_one_message(reader: asyncio.StreamReader, timeout: int = 15) -> b
         data += await asyncio.wait_for(
             reader.readuntil(MESSAGE_DELIMETER_BYTE), timeout
         )
-        raise SpaMessageError(f"Invalid message: {data.hex()}")
+        raise SpaMessageError(
+            f"Invalid message: {data.hex()}", discarded=len(data), data=data
+        )
     data = data[1:] + (await reader.readexactly(data[1]))[:-1]
     if data[0] != len(data):
-        raise SpaMessageError(f"Incomplete message: {data.hex()}")
+        raise SpaMessageError(
+            f"Incomplete message: {data.hex()}", "incomplete", len(data) + 2, data
+        )
     if calculate_checksum(data[:-1]) != data[-1]:
-        raise SpaMessageError(f"Invalid checksum: {data.hex()}")
+        raise SpaMessageError(
+            f"Invalid checksum: {data.hex()}", "checksum", len(data) + 2, data
+        )
     return data
 
 
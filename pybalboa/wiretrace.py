@@ -0,0 +1,70 @@
+"""Balboa spa wire trace."""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from datetime import datetime
+from time import time
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WIRE_TRACE_SIZE = 64
+
+DIRECTION_IN = "in"
+DIRECTION_OUT = "out"
+DIRECTION_ERROR = "error"
+
+
+class WireTrace:
+    """Ring buffer of the most recent raw frames.
+
+    Frames are stored as bytes with a timestamp and direction; nothing is formatted
+    until the trace is dumped.
+    """
+
+    __slots__ = ("_frames", "dumps", "last_dump")
+
+    def __init__(self, size: int = DEFAULT_WIRE_TRACE_SIZE) -> None:
+        """Initialize a wire trace."""
+        self._frames: deque[tuple[float, str, bytes]] = deque(maxlen=size)
+        self.last_dump: list[str] = []
+        self.dumps = 0
+
+    def __len__(self) -> int:
+        """Return the number of frames in the buffer."""
+        return len(self._frames)
+
+    @property
+    def frames(self) -> list[tuple[float, str, bytes]]:
+        """Return the buffered (timestamp, direction, data) frames, oldest first."""
+        return list(self._frames)
+
+    def received(self, data: bytes) -> None:
+        """Record a received frame."""
+        self._frames.append((time(), DIRECTION_IN, data))
+
+    def sent(self, data: bytes) -> None:
+        """Record a sent frame."""
+        self._frames.append((time(), DIRECTION_OUT, data))
+
+    def error(self, data: bytes) -> None:
+        """Record bytes that could not be parsed as a frame."""
+        self._frames.append((time(), DIRECTION_ERROR, data))
+
+    def format(self) -> list[str]:
+        """Format the buffered frames, oldest first."""
+        return [
+            f"{datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds')} "
+            f"{direction:>5} {data.hex()}"
+            for timestamp, direction, data in self._frames
+        ]
+
+    def dump(self, host: str, reason: str) -> list[str]:
+        """Format the buffered frames, log them and keep them as the last dump."""
+        if not self._frames:
+            return []
+        self.last_dump = [f"{reason}:", *self.format()]
+        self.dumps += 1
+        _LOGGER.warning("%s ## wire trace, %s", host, "\n".join(self.last_dump))
+        return self.last_dump
@@ -0,0 +1,103 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.batch import StatusColumns, decode_status_batch
+from pybalboa.enums import TemperatureUnit
+
+from .conftest import load_spa_from_json
+
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _records() -> list[bytes]:
+    """Return status update payloads covering the decoded fields."""
+    records = []
+    for index in range(6):
+        data = bytearray(STATUS[4:-1])
+        data[2] = 255 if index == 1 else 90 + index
+        data[3], data[4] = index, 10 * index
+        data[9] = index & 0x0F
+        data[10] = index << 2 & 0x04 | index % 3 << 4
+        data[11], data[12] = 0x06 * index, index
+        data[13] = index << 1 & 0x02
+        data[14] = 0x03 if index % 2 else 0
+        data[20] = 100 + index
+        records.append(bytes(data))
+    return records
+
+
+def _configured_spa() -> SpaClient:
+    """Return a client configured from a spa fixture."""
+    spa = SpaClient("localhost")
+    for message in load_spa_from_json("bfbp20s").values():
+        spa._process_message(bytes.fromhex(message))  # pylint: disable=protected-access
+    return spa
+
+
+def test_decode_status_batch() -> None:
+    """Test the pure Python decoder matches the client's status parser."""
+    records = _records()
+    columns = decode_status_batch(b"".join(records), use_numpy=False)
+    assert len(columns) == len(records)
+    spa = _configured_spa()
+    for row, record in enumerate(records):
+        spa._parse_status_update(record)  # pylint: disable=protected-access
+        if spa.temperature is None:
+            assert math.isnan(columns.temperature[row])
+        else:
+            assert columns.temperature[row] == spa.temperature
+        assert columns.target_temperature[row] == spa.target_temperature
+        assert columns.celsius[row] == (spa.temperature_unit == TemperatureUnit.CELSIUS)
+        assert columns.is_24_hour[row] == spa.is_24_hour
+        assert columns.heat_state[row] == spa.heat_state
+        assert columns.heat_mode[row] == spa.heat_mode.state
+        assert columns.temperature_range[row] == spa.temperature_range.state
+        assert columns.filter_cycle_1_running[row] == spa.filter_cycle_1_running
+        assert columns.filter_cycle_2_running[row] == spa.filter_cycle_2_running
+        assert (columns.hour[row], columns.minute[row]) == (
+            spa.time_hour,
+            spa.time_minute,
+        )
+        for index, pump in enumerate(spa.pumps):
+            assert columns.pump(index)[row] == pump.state
+        for index, light in enumerate(spa.lights):
+            assert columns.light(index)[row] == light.state
+        assert spa.circulation_pump
+        assert columns.circulation_pump[row] == spa.circulation_pump.state
+
+
+def test_decode_status_batch_frames() -> None:
+    """Test records holding whole frames are decoded from their payload."""
+    columns = decode_status_batch(STATUS * 3, record_size=len(STATUS), offset=4)
+    assert list(columns.temperature) == [100.0] * 3
+    assert list(columns.hour) == [10] * 3
+    assert list(columns.minute) == [55] * 3
+    with pytest.raises(ValueError, match="multiple of 29"):
+        decode_status_batch(STATUS[:-1], record_size=len(STATUS), offset=4)
+    with pytest.raises(ValueError, match="Record too small"):
+        decode_status_batch(STATUS, record_size=len(STATUS), offset=8)
+
+
+def test_decode_status_batch_numpy() -> None:
+    """Test the NumPy decoder matches the pure Python decoder."""
+    pytest.importorskip("numpy")
+    buffer = b"".join(_records())
+    python = decode_status_batch(buffer, use_numpy=False)
+    vectorized = decode_status_batch(buffer, use_numpy=True)
+    assert isinstance(vectorized, StatusColumns)
+    for name, column in python.as_dict().items():
+        assert [
+            None if isinstance(value, float) and math.isnan(value) else value
+            for value in column
+        ] == [
+            None if math.isnan(value) else value
+            for value in getattr(vectorized, name).tolist()
+        ], name
+    assert list(python.pump(1)) == vectorized.pump(1).tolist()
+    assert list(python.light(0)) == vectorized.light(0).tolist()
@@ -0,0 +1,97 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import signal
+import sys
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.broker import SpaBroker
+from pybalboa.enums import MessageType, OffOnState
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+
+
+@pytest.mark.asyncio
+async def test_broker(bfbp20s: SpaServer) -> None:
+    """Test several clients share one upstream connection through the broker."""
+    async with SpaBroker(SpaClient(HOST, bfbp20s.port), HOST, 0) as broker:
+        async with (
+            SpaClient(HOST, broker.port) as spa_1,
+            SpaClient(HOST, broker.port) as spa_2,
+        ):
+            assert await spa_1.async_configuration_loaded()
+            assert await spa_2.async_configuration_loaded()
+            assert broker.connections == 2
+            for spa in (spa_1, spa_2):
+                assert spa.model == "BFBP20S"
+                assert spa.mac_address == "00:15:27:71:f1:9a"
+                assert spa.lights[0].state == OffOnState.ON
+            assert broker.requests_cached
+
+            received = len(bfbp20s.received_messages)
+            assert await spa_2.lights[0].set_state(OffOnState.OFF)
+            for _ in range(100):
+                forwarded = [
+                    message[3] for message in bfbp20s.received_messages[received:]
+                ]
+                if MessageType.TOGGLE_STATE in forwarded:
+                    break
+                await asyncio.sleep(0.01)
+            assert MessageType.TOGGLE_STATE in forwarded
+            assert broker.frames_forwarded
+        assert broker.connections == 0
+
+
+@pytest.mark.asyncio
+async def test_broker_drops_slow_clients(bfbp20s: SpaServer) -> None:
+    """Test downstream connections over the write buffer limit are dropped."""
+    upstream = SpaClient(HOST, bfbp20s.port)
+    async with SpaBroker(upstream, HOST, 0, write_buffer_limit=-1) as broker:
+        assert await upstream.async_configuration_loaded()
+        async with SpaClient(HOST, broker.port) as spa:
+            for _ in range(100):
+                if not spa.connected:
+                    break
+                await asyncio.sleep(0.01)
+            assert broker.connections == 0
+            assert not spa.configuration_loaded
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGTERM is not handled")
+@pytest.mark.asyncio
+async def test_broker_main(bfbp20s: SpaServer) -> None:
+    """Test the broker runs from the command line until it is terminated."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-u",
+        "-m",
+        "pybalboa.broker",
+        HOST,
+        "--port",
+        "0",
+        "--bind",
+        HOST,
+        "--spa-port",
+        str(bfbp20s.port),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        assert process.stdout
+        line = await asyncio.wait_for(process.stdout.readline(), 10)
+        port = int(line.decode().rsplit(":", 1)[1])
+        async with SpaClient(HOST, port) as spa:
+            assert await spa.async_configuration_loaded()
+            assert spa.model == "BFBP20S"
+        process.send_signal(signal.SIGTERM)
+        assert await asyncio.wait_for(process.wait(), 10) == 0
+        assert await process.stdout.read() == b"Broker stopped\n"
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
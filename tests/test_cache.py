@@ -0,0 +1,91 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from time import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.cache import DiscoveryCache, async_discover_cached
+from pybalboa.discovery import DiscoveredSpa
+
+SPA = DiscoveredSpa("10.0.0.2", 30303, "00-15-27-AA-BB-CC", "BWGSPA")
+MOVED_SPA = DiscoveredSpa("10.0.0.9", 30303, "00-15-27-AA-BB-CC", "BWGSPA")
+
+
+def test_cache_round_trip(tmp_path: Path) -> None:
+    """Test spas are persisted and expire after the ttl."""
+    path = tmp_path / "spas.json"
+    cache = DiscoveryCache(path, ttl=60)
+    assert cache.load() == []
+    cache.update([SPA])
+    cache.update([DiscoveredSpa("10.0.0.3", 30303, "OLD", "BWGSPA")], time() - 120)
+    cache.save()
+
+    assert DiscoveryCache(path, ttl=60).load() == [SPA]
+    assert len(DiscoveryCache(path, ttl=600).load()) == 1
+
+
+def test_cache_invalid_file(tmp_path: Path) -> None:
+    """Test a corrupt cache file is ignored."""
+    path = tmp_path / "spas.json"
+    path.write_text("not json", encoding="utf-8")
+    assert DiscoveryCache(path).load() == []
+    path.write_text('{"version": 1, "spas": [{"address": "x"}]}', encoding="utf-8")
+    assert DiscoveryCache(path).load() == []
+
+
+@pytest.mark.asyncio
+async def test_discover_cached_cold_start(tmp_path: Path) -> None:
+    """Test an empty cache falls back to discovery and is populated."""
+    cache = DiscoveryCache(tmp_path / "spas.json")
+    with patch("pybalboa.cache.async_discover", AsyncMock(return_value=[SPA])):
+        assert await async_discover_cached(cache) == [SPA]
+    assert DiscoveryCache(cache.path).load() == [SPA]
+
+
+@pytest.mark.asyncio
+async def test_client_discover_with_cache(tmp_path: Path) -> None:
+    """Test cached spas are returned immediately and validated in the background."""
+    cache = DiscoveryCache(tmp_path / "spas.json")
+    cache.update([SPA])
+    cache.save()
+
+    discovered = asyncio.Event()
+
+    async def _discover(*_: object, **__: object) -> list[DiscoveredSpa]:
+        await discovered.wait()
+        return [MOVED_SPA]
+
+    with patch("pybalboa.cache.async_discover", _discover):
+        spas = await SpaClient.discover(cache=cache)
+        assert [spa.host for spa in spas] == ["10.0.0.2"]
+        discovered.set()
+        await asyncio.sleep(0.01)
+    assert spas[0].host == "10.0.0.9"
+    assert DiscoveryCache(cache.path).load() == [MOVED_SPA]
+
+
+@pytest.mark.asyncio
+async def test_discover_cached_refresh_error(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test a failed background refresh is logged and keeps the cache."""
+    cache = DiscoveryCache(tmp_path / "spas.json")
+    cache.update([SPA])
+    cache.save()
+    validated: list[list[DiscoveredSpa]] = []
+
+    with patch(
+        "pybalboa.cache.async_discover", AsyncMock(side_effect=OSError("no route"))
+    ):
+        spas = await async_discover_cached(cache, on_validated=validated.append)
+        assert spas == [SPA]
+        await asyncio.sleep(0.01)
+    assert "Unable to refresh discovery cache" in caplog.text
+    assert not validated
+    assert DiscoveryCache(cache.path).load() == [SPA]
@@ -0,0 +1,210 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.capture import (
+    LINKTYPE_ETHERNET,
+    LINKTYPE_LINUX_SLL,
+    TCP_SYN,
+    CapturedFrame,
+    ReplayTransport,
+    TcpStream,
+    extract_frames,
+    read_frames,
+    write_replay,
+)
+from pybalboa.wiretrace import DIRECTION_ERROR, DIRECTION_IN, DIRECTION_OUT
+
+from .conftest import load_spa_from_json
+
+CLIENT, SPA = bytes((192, 168, 1, 20)), bytes((192, 168, 1, 50))
+CLIENT_PORT, SPA_PORT = 50000, 4257
+DEVICE_PRESENT = bytes.fromhex("050abf0477")
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _ipv4_tcp(
+    outgoing: bool, sequence: int, payload: bytes = b"", flags: int = 0x18
+) -> bytes:
+    """Return an IPv4 packet with a TCP segment between the client and the spa."""
+    source, destination = (CLIENT, SPA) if outgoing else (SPA, CLIENT)
+    ports = (CLIENT_PORT, SPA_PORT) if outgoing else (SPA_PORT, CLIENT_PORT)
+    tcp = struct.pack("!HHIIBBHHH", *ports, sequence % 2**32, 0, 5 << 4, flags, 0, 0, 0)
+    ip = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        20 + len(tcp) + len(payload),
+        0,
+        0,
+        64,
+        6,
+        0,
+        source,
+        destination,
+    )
+    return ip + tcp + payload
+
+
+def _ethernet(packet: bytes) -> bytes:
+    """Wrap an IPv4 packet in an Ethernet frame."""
+    return bytes(12) + b"\x08\x00" + packet
+
+
+def _segments() -> list[tuple[float, bytes]]:
+    """Return a connection with split, reordered and retransmitted segments."""
+    client, spa = 100, 2**32 - 10
+    frame = b"~" + STATUS + b"~"
+    return [
+        (1.0, _ipv4_tcp(True, client, flags=TCP_SYN)),
+        (1.1, _ipv4_tcp(False, spa, flags=TCP_SYN | 0x10)),
+        (1.2, _ipv4_tcp(True, client + 1, b"~" + DEVICE_PRESENT[:3])),
+        (1.3, _ipv4_tcp(True, client + 5, DEVICE_PRESENT[3:] + b"~")),
+        # the second half arrives first and the first half is sent twice
+        (2.0, _ipv4_tcp(False, spa + 1 + 10, frame[10:])),
+        (2.1, _ipv4_tcp(False, spa + 1, frame[:10])),
+        (2.2, _ipv4_tcp(False, spa + 1, frame[:10])),
+        (3.0, _ipv4_tcp(False, spa + 1 + len(frame), b"\x01\x02" + frame)),
+    ]
+
+
+def _pcap(path: Path, packets: list[tuple[float, bytes]]) -> None:
+    """Write packets with Ethernet headers to a pcap file."""
+    with open(path, "wb") as file:
+        file.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for timestamp, packet in packets:
+            data = _ethernet(packet)
+            seconds, micros = int(timestamp), round(timestamp % 1 * 1e6)
+            file.write(struct.pack("<IIII", seconds, micros, len(data), len(data)))
+            file.write(data)
+
+
+def _pcapng_block(block_type: int, body: bytes) -> bytes:
+    """Return a big endian pcapng block."""
+    body += bytes(-len(body) % 4)
+    return (
+        struct.pack(">II", block_type, len(body) + 12)
+        + body
+        + (struct.pack(">I", len(body) + 12))
+    )
+
+
+def _pcapng(path: Path, packets: list[tuple[float, bytes]]) -> None:
+    """Write packets with Linux cooked headers to a nanosecond pcapng file."""
+    with open(path, "wb") as file:
+        file.write(_pcapng_block(0x0A0D0D0A, b"\x1a\x2b\x3c\x4d" + bytes(12)))
+        options = struct.pack(">HHB3x", 9, 1, 9) + bytes(4)
+        file.write(
+            _pcapng_block(1, struct.pack(">HHI", LINKTYPE_LINUX_SLL, 0, 0) + options)
+        )
+        for timestamp, packet in packets:
+            data = bytes(14) + b"\x08\x00" + packet
+            nanos = round(timestamp * 1e9)
+            header = struct.pack(
+                ">IIIII", 0, nanos >> 32, nanos & 0xFFFFFFFF, len(data), len(data)
+            )
+            file.write(_pcapng_block(6, header + data))
+
+
+@pytest.mark.parametrize("writer", [_pcap, _pcapng])
+def test_read_frames(
+    tmp_path: Path, writer: Callable[[Path, list[tuple[float, bytes]]], None]
+) -> None:
+    """Test frames are extracted from reassembled TCP streams."""
+    path = tmp_path / "capture"
+    writer(path, _segments())
+    frames = list(read_frames(str(path)))
+    assert [(frame.direction, frame.data) for frame in frames] == [
+        (DIRECTION_OUT, DEVICE_PRESENT),
+        (DIRECTION_IN, STATUS),
+        (DIRECTION_ERROR, b"\x01\x02"),
+        (DIRECTION_IN, STATUS),
+    ]
+    assert frames[0].timestamp == pytest.approx(1.3)
+    assert frames[1].timestamp == pytest.approx(2.1)
+    assert frames[0].connection == "192.168.1.20:50000"
+
+
+def test_truncated_packets(caplog: pytest.LogCaptureFixture) -> None:
+    """Test malformed and truncated packets are skipped and counted."""
+    valid = _ipv4_tcp(True, 1, b"~" + DEVICE_PRESENT + b"~")
+    header_length = bytes((0x4F,)) + valid[1:]
+    data_offset = bytearray(valid)
+    data_offset[32] = 15 << 4
+    truncated = [
+        b"",
+        b"\x45\x00",
+        valid[:19],
+        header_length[:40],
+        valid[:-3],
+        bytes(data_offset),
+        b"\x60" + bytes(20),
+        b"\x08\x00",
+    ]
+    packets = [
+        (float(index), LINKTYPE_ETHERNET, _ethernet(packet))
+        for index, packet in enumerate(truncated)
+    ]
+    packets.append((9.0, LINKTYPE_ETHERNET, _ethernet(valid)))
+    frames = list(extract_frames(packets))
+    assert [frame.data for frame in frames] == [DEVICE_PRESENT]
+    assert "skipped 7 malformed or truncated packets" in caplog.text
+
+
+def test_malformed_pcapng_blocks(tmp_path: Path) -> None:
+    """Test packet blocks without an interface or fields are skipped."""
+    path = tmp_path / "capture"
+    with open(path, "wb") as file:
+        file.write(_pcapng_block(0x0A0D0D0A, b"\x1a\x2b\x3c\x4d" + bytes(12)))
+        file.write(_pcapng_block(6, bytes(20) + _ethernet(_ipv4_tcp(True, 1))))
+        file.write(_pcapng_block(6, bytes(8)))
+        file.write(_pcapng_block(3, b""))
+    assert not list(read_frames(str(path)))
+
+
+def test_tcp_stream_gap() -> None:
+    """Test missing bytes are given up on once too many segments are held."""
+    stream = TcpStream()
+    assert stream.segment(0, b"ab", 0) == [b"ab"]
+    for index in range(64):
+        assert stream.segment(10 + index, b"x", 0) == []
+    assert stream.segment(80, b"y", 0) == [b"x"] * 64 + [b"y"]
+    assert stream.gaps == 2
+
+
+def test_write_replay(tmp_path: Path) -> None:
+    """Test frames are written to and read back from a replay file."""
+    path = tmp_path / "replay.txt"
+    with open(path, "wb") as file:
+        assert write_replay(_replay_frames(), file) == 6
+    assert [frame.data for frame in read_frames(str(path))] == [
+        frame.data for frame in _replay_frames()
+    ]
+
+
+def _replay_frames() -> list[CapturedFrame]:
+    """Return the messages of a spa fixture as received frames."""
+    return [
+        CapturedFrame(float(index), DIRECTION_IN, bytes.fromhex(message))
+        for index, message in enumerate(load_spa_from_json("bfbp20s").values())
+    ]
+
+
+@pytest.mark.asyncio
+async def test_replay_transport(tmp_path: Path) -> None:
+    """Test a replay file is parsed by a client."""
+    path = tmp_path / "replay.txt"
+    path.write_text("".join(frame.format() + "\n" for frame in _replay_frames()))
+    transport = ReplayTransport(str(path))
+    async with SpaClient(str(path), transport=transport) as spa:
+        assert await spa.async_configuration_loaded(5)
+        assert spa.model == "BFBP20S"
+        assert spa.mac_address == "00:15:27:71:f1:9a"
+    assert transport.frames_played == 6
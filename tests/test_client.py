@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from datetime import time, timedelta
 from unittest.mock import patch
 
@@ -318,3 +319,35 @@ async def test_client_errors(
     async with SpaClient(HOST, bfbp20s.port) as spa:
         with pytest.raises(error, match=error_message):
             await getattr(spa, method)(**(params or {}))
+
+
+@pytest.mark.asyncio
+async def test_frame_hook_errors(bfbp20s: SpaServer) -> None:
+    """Test a failing frame hook does not stop the listener or other hooks."""
+    frames: list[bytes] = []
+
+    def _fail(_: bytes) -> None:
+        raise RuntimeError("boom")
+
+    async with SpaClient(HOST, bfbp20s.port) as spa:
+        spa.add_frame_hook(_fail)
+        spa.add_frame_hook(frames.append)
+        assert await spa.async_configuration_loaded()
+        assert spa.model == "BFBP20S"
+    assert frames
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_is_reestablished(unused_tcp_port: int) -> None:
+    """Test a silent connection is probed and then dropped after the idle timeout."""
+    connections: list[bytes] = []
+
+    async def _handle(reader: asyncio.StreamReader, _: asyncio.StreamWriter) -> None:
+        connections.append(await reader.read(1024))
+
+    server = await asyncio.start_server(_handle, HOST, unused_tcp_port)
+    async with server:
+        spa = SpaClient(HOST, unused_tcp_port, keepalive_interval=0.1, idle_timeout=0.5)
+        async with spa:
+            await asyncio.sleep(2)
+    assert len(connections) >= 2
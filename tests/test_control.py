@@ -0,0 +1,176 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.control import EVENT_UPDATE, EventMixin, SpaControl
+from pybalboa.enums import ControlType
+
+
+def test_listener_errors_are_isolated() -> None:
+    """Test a failing listener does not stop the others or the emitter."""
+    emitter = EventMixin()
+    calls: list[int] = []
+
+    def _fail() -> None:
+        raise RuntimeError("boom")
+
+    emitter.on(EVENT_UPDATE, _fail)
+    unsubscribe = emitter.on(EVENT_UPDATE, lambda: calls.append(1))
+    emitter.emit(EVENT_UPDATE)
+    emitter.emit(EVENT_UPDATE)
+    unsubscribe()
+    emitter.emit(EVENT_UPDATE)
+
+    assert calls == [1, 1]
+    failing = emitter.listeners(EVENT_UPDATE)[0]
+    assert failing.as_dict()["errors"] == 3
+    assert failing.calls == 3
+    assert failing.time_max >= 0
+
+
+@pytest.mark.asyncio
+async def test_coroutine_listeners_are_capped() -> None:
+    """Test coroutine listeners run as tasks and excess events are coalesced."""
+    emitter = EventMixin()
+    emitter.set_listener_options(max_concurrency=2)
+    running = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def _slow() -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    emitter.on(EVENT_UPDATE, _slow)
+    for _ in range(5):
+        emitter.emit(EVENT_UPDATE)  # returns without waiting for the listener
+    await asyncio.sleep(0.01)
+    assert running == 2
+    release.set()
+    await asyncio.sleep(0.01)
+    assert peak == 2
+    # the last three events were coalesced into a single call
+    listener = emitter.listeners(EVENT_UPDATE)[0]
+    assert listener.calls == 3
+    assert listener.coalesced == 2
+    assert listener.active == 0
+
+
+@pytest.mark.asyncio
+async def test_threaded_listeners() -> None:
+    """Test threaded listeners run in the executor."""
+    emitter = EventMixin()
+    threads: list[str] = []
+    done = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def _record() -> None:
+        threads.append(threading.current_thread().name)
+        loop.call_soon_threadsafe(done.set)
+
+    with ThreadPoolExecutor(1, "listener") as executor:
+        emitter.set_listener_options(executor=executor)
+        emitter.on(EVENT_UPDATE, _record, threaded=True)
+        emitter.emit(EVENT_UPDATE)
+        await asyncio.wait_for(done.wait(), 1)
+    assert threads[0].startswith("listener")
+    # the statistics are recorded on the loop thread
+    await asyncio.sleep(0)
+    assert emitter.listeners(EVENT_UPDATE)[0].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_throttled_listener() -> None:
+    """Test a burst is collapsed into a leading and a trailing call."""
+    emitter = EventMixin()
+    calls: list[int] = []
+    emitter.on(EVENT_UPDATE, calls.append, throttle=0.05)
+    for value in range(10):
+        emitter.emit(EVENT_UPDATE, value)
+    assert calls == [0]
+    await asyncio.sleep(0.07)
+    assert calls == [0, 9]
+    emitter.emit(EVENT_UPDATE, 10)  # still inside the window after the trailing call
+    await asyncio.sleep(0.07)
+    assert calls == [0, 9, 10]
+
+
+@pytest.mark.asyncio
+async def test_debounced_listener() -> None:
+    """Test only the last event of a burst is delivered once it is quiet."""
+    emitter = EventMixin()
+    calls: list[int] = []
+    leading: list[int] = []
+    emitter.on(EVENT_UPDATE, calls.append, debounce=0.05)
+    unsubscribe = emitter.on(
+        EVENT_UPDATE, leading.append, debounce=0.05, leading=True, trailing=False
+    )
+    for value in range(5):
+        emitter.emit(EVENT_UPDATE, value)
+        await asyncio.sleep(0.01)
+    assert not calls
+    await asyncio.sleep(0.07)
+    assert calls == [4]
+    assert leading == [0]
+
+    emitter.emit(EVENT_UPDATE, 5)
+    unsubscribe()
+    await asyncio.sleep(0.07)
+    assert calls == [4, 5]
+    assert leading == [0, 5]
+
+
+def test_listeners_without_running_loop() -> None:
+    """Test listeners needing a loop do not raise when emitted outside of one."""
+    emitter = EventMixin()
+    calls: list[int] = []
+
+    async def _coroutine(value: int) -> None:
+        calls.append(value)
+
+    emitter.on(EVENT_UPDATE, _coroutine)
+    emitter.on(EVENT_UPDATE, calls.append, debounce=1)
+    emitter.on(EVENT_UPDATE, calls.append, throttle=1)
+    emitter.on(EVENT_UPDATE, calls.append, threaded=True)
+    emitter.emit(EVENT_UPDATE, 1)
+    assert calls == [1, 1, 1]
+    assert emitter.listeners(EVENT_UPDATE)[0].errors == 1
+
+
+def test_rate_limit_options() -> None:
+    """Test invalid debounce and throttle options are rejected."""
+    emitter = EventMixin()
+    with pytest.raises(ValueError):
+        emitter.on(EVENT_UPDATE, print, debounce=1, throttle=1)
+    with pytest.raises(ValueError):
+        emitter.on(EVENT_UPDATE, print, throttle=1, leading=False, trailing=False)
+
+
+def test_weak_references() -> None:
+    """Test clients and controls can be weakly referenced."""
+    client = SpaClient("localhost")
+    control = SpaControl(client, ControlType.PUMP, 2, 0)
+    clients: weakref.WeakSet[SpaClient] = weakref.WeakSet([client])
+    controls: weakref.WeakKeyDictionary[SpaControl, str] = weakref.WeakKeyDictionary(
+        {control: "pump"}
+    )
+    reference = weakref.ref(client)
+    assert reference() is client
+    assert controls[control] == "pump"
+    del client, control
+    gc.collect()
+    assert reference() is None
+    assert not clients
+    assert not controls
@@ -0,0 +1,223 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import AsyncGenerator
+from ipaddress import IPv4Network
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.discovery import (
+    EVENT_ADDED,
+    EVENT_LOST,
+    EVENT_MOVED,
+    DiscoveredSpa,
+    SpaDiscoveryProtocol,
+    SpaDiscoveryService,
+    _DiscoverySession,
+    _sweep,
+    async_discover,
+    discover_stream,
+    get_broadcast_addresses,
+)
+
+HOST = "127.0.0.1"
+RESPONSE = b"BWGSPA\r\n00-15-27-AA-BB-CC\r\n"
+RESPONSE_FIELDS = ("00-15-27-AA-BB-CC", "BWGSPA")
+
+
+class SpaResponder(asyncio.DatagramProtocol):
+    """Test responder that answers discovery broadcasts like a spa."""
+
+    def __init__(self, responses: list[bytes]) -> None:
+        """Initialize the responder."""
+        self.responses = responses
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:  # type: ignore[override]
+        """Store the transport."""
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Answer a discovery request."""
+        assert self.transport
+        for response in self.responses:
+            self.transport.sendto(response, addr)
+
+
+@pytest.fixture(name="responder")
+async def responder_fixture(
+    unused_udp_port: int,
+) -> AsyncGenerator[tuple[str, int], None]:
+    """Start a discovery responder and route broadcasts to it."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: SpaResponder([RESPONSE, RESPONSE]),
+        local_addr=(HOST, unused_udp_port),
+    )
+    with patch("pybalboa.discovery.BROADCAST_ADDRESS", (HOST, unused_udp_port)):
+        yield HOST, unused_udp_port
+    transport.close()
+
+
+def test_protocol_deduplicates_by_mac() -> None:
+    """Test responses are deduplicated by MAC address."""
+    found: list[DiscoveredSpa] = []
+    protocol = SpaDiscoveryProtocol(on_found=found.append)
+    protocol.datagram_received(RESPONSE, ("10.0.0.2", 30303))
+    protocol.datagram_received(RESPONSE, ("10.0.0.2", 30303))
+    protocol.datagram_received(b"unexpected", ("10.0.0.3", 30303))
+    protocol.datagram_received(b"BWGSPA\r\n00-15-27-DD-EE-FF\r\n", ("10.0.0.4", 30303))
+    assert [spa.mac_address for spa in protocol.spas] == [
+        "00-15-27-AA-BB-CC",
+        "00-15-27-DD-EE-FF",
+    ]
+    assert found == protocol.spas
+
+
+@pytest.mark.asyncio
+async def test_discover_stream(responder: tuple[str, int]) -> None:
+    """Test spas are yielded as soon as they respond."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    async for spa in discover_stream(timeout=5):
+        assert spa == DiscoveredSpa(HOST, responder[1], "00-15-27-AA-BB-CC", "BWGSPA")
+        break
+    assert loop.time() - start < 1
+
+    spas = [spa async for spa in discover_stream(timeout=0.3)]
+    assert len(spas) == 1
+
+
+@pytest.mark.asyncio
+async def test_discovery_service(unused_udp_port: int) -> None:
+    """Test the discovery service tracks spas and updates clients."""
+    loop = asyncio.get_running_loop()
+    responder = SpaResponder([RESPONSE])
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: responder, local_addr=(HOST, unused_udp_port)
+    )
+    client = SpaClient("192.0.2.1", mac_address="00:15:27:aa:bb:cc")
+    events: list[tuple[str, DiscoveredSpa]] = []
+
+    with patch("pybalboa.discovery.BROADCAST_ADDRESS", (HOST, unused_udp_port)):
+        service = SpaDiscoveryService(interval=0.05, lost_after=0.2)
+        service.on(EVENT_ADDED, lambda spa: events.append((EVENT_ADDED, spa)))
+        service.on(EVENT_LOST, lambda spa: events.append((EVENT_LOST, spa)))
+        untrack = service.track(client)
+        async with service:
+            assert service.running
+            await asyncio.sleep(0.2)
+            assert client.host == HOST
+            assert list(service.spas) == ["00:15:27:aa:bb:cc"]
+            assert service.last_seen("00:15:27:aa:bb:cc")
+
+            responder.responses = []
+            await asyncio.sleep(0.5)
+            assert not service.spas
+        untrack()
+
+    transport.close()
+    assert [event for event, _ in events] == [EVENT_ADDED, EVENT_LOST]
+
+
+def test_discovery_service_moved() -> None:
+    """Test a spa changing address is reported as moved."""
+    service = SpaDiscoveryService()
+    client = SpaClient("10.0.0.2", mac_address="00-15-27-AA-BB-CC")
+    moves: list[tuple[DiscoveredSpa, str]] = []
+    service.on(EVENT_MOVED, lambda spa, old: moves.append((spa, old)))
+    service.track(client)
+
+    service._handle_response(DiscoveredSpa("10.0.0.2", 30303, *RESPONSE_FIELDS))
+    service._handle_response(DiscoveredSpa("10.0.0.2", 30303, *RESPONSE_FIELDS))
+    assert not moves
+    service._handle_response(DiscoveredSpa("10.0.0.9", 30303, *RESPONSE_FIELDS))
+    assert moves == [(service.spas["00:15:27:aa:bb:cc"], "10.0.0.2")]
+    assert client.host == "10.0.0.9"
+
+
+@pytest.mark.asyncio
+async def test_discover_all_interfaces(responder: tuple[str, int]) -> None:
+    """Test discovery broadcasts from each interface and merges by MAC."""
+    interfaces = [(HOST, IPv4Network(f"{HOST}/32"))] * 2
+    with patch("pybalboa.discovery._get_interfaces", return_value=interfaces):
+        spas = await async_discover(timeout=0.3, all_interfaces=True)
+    assert [spa.mac_address for spa in spas] == ["00-15-27-AA-BB-CC"]
+
+
+@pytest.mark.asyncio
+async def test_sweep_uses_interface_routes() -> None:
+    """Test each network is swept from the interface that can reach it."""
+    interfaces = [
+        ("10.0.0.5", IPv4Network("10.0.0.0/24")),
+        ("192.168.1.5", IPv4Network("192.168.1.0/24")),
+    ]
+    transports = [Mock(name=address) for address in ("10.0.0.5", "192.168.1.5", "")]
+    create = AsyncMock(side_effect=[(transport, None) for transport in transports])
+    sweep = AsyncMock()
+    networks = ["192.168.1.0/28", "172.16.0.0/30", "10.0.0.0/16"]
+    with patch.multiple(
+        "pybalboa.discovery",
+        _get_interfaces=Mock(return_value=interfaces),
+        _create_discovery_endpoint=create,
+        _sweep=sweep,
+    ):
+        session = _DiscoverySession()
+        await session.start(True, [IPv4Network(n) for n in networks], 8)
+        await session.close()
+
+    assert [call.args[1] for call in create.call_args_list[:2]] == [
+        ("10.0.0.5", 0),
+        ("192.168.1.5", 0),
+    ]
+    assert len(create.call_args_list[2].args) == 1
+    assert [call.args for call in sweep.call_args_list] == [
+        (transports[1], [IPv4Network("192.168.1.0/28")], 8),
+        (transports[2], [IPv4Network("172.16.0.0/30")], 8),
+        (transports[0], [IPv4Network("10.0.0.0/16")], 8),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_discover_invalid_network() -> None:
+    """Test an invalid network is rejected before any endpoint is opened."""
+    with patch("pybalboa.discovery._create_discovery_endpoint") as create:
+        with pytest.raises(ValueError):
+            await async_discover(timeout=0.1, networks=["10.0.0.0/8", "10.0.0/33"])
+        with pytest.raises(ValueError):
+            async for _ in discover_stream(timeout=0.1, networks=["spa"]):
+                pass
+    create.assert_not_called()
+
+
+def test_get_broadcast_addresses() -> None:
+    """Test local interfaces are enumerated without loopback."""
+    for address, broadcast in get_broadcast_addresses():
+        assert not address.startswith("127.")
+        assert broadcast.endswith("255") or broadcast != address
+
+
+@pytest.mark.asyncio
+async def test_unicast_sweep() -> None:
+    """Test the sweep sends a request to every host in batches."""
+    sent: list[tuple[str, int]] = []
+    transport = Mock(is_closing=Mock(return_value=False))
+    transport.sendto.side_effect = lambda _, addr: sent.append(addr)
+
+    task = asyncio.ensure_future(
+        _sweep(transport, [IPv4Network("10.0.0.0/29"), IPv4Network("10.0.1.0/30")], 4)
+    )
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    assert [host for host, _ in sent] == [
+        *(f"10.0.0.{i}" for i in range(1, 7)),
+        "10.0.1.1",
+        "10.0.1.2",
+    ]
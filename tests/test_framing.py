@@ -0,0 +1,138 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+
+import pytest
+
+from pybalboa.exceptions import SpaMessageError
+from pybalboa.framing import FrameDecoder
+from pybalboa.utils import read_one_message
+
+from .conftest import load_spa_from_json
+
+FIXTURES = ("bfbp20s", "bp501g1", "bp6013g1", "lpi501st", "mxbp20")
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+FRAME = bytes.fromhex("050abf0477")
+
+
+def _wire(*frames: bytes) -> bytes:
+    """Return frames with their delimiters."""
+    return b"".join(b"~" + frame + b"~" for frame in frames)
+
+
+def _split(
+    results: list[bytes | SpaMessageError],
+) -> tuple[list[bytes], list[SpaMessageError]]:
+    """Split decoder results into frames and errors."""
+    frames = [result for result in results if isinstance(result, bytes)]
+    errors = [result for result in results if isinstance(result, SpaMessageError)]
+    return frames, errors
+
+
+def test_decoder_partial_frames() -> None:
+    """Test frames split across reads are reassembled."""
+    decoder = FrameDecoder()
+    data = _wire(STATUS, FRAME)
+    results: list[bytes | SpaMessageError] = []
+    for i in range(0, len(data), 3):
+        results += decoder.feed(data[i : i + 3])
+    assert results == [STATUS, FRAME]
+    assert decoder.buffered == 0
+
+
+@pytest.mark.parametrize(
+    ("garbage", "reason"),
+    [
+        (b"\x01\x02\x03", "invalid"),
+        (b"~\x1d\xff\xaf\x13\x00", "incomplete"),
+        (_wire(STATUS[:-1] + b"\x00"), "checksum"),
+    ],
+)
+def test_decoder_keeps_next_frame(garbage: bytes, reason: str) -> None:
+    """Test the frame following a glitch is not lost."""
+    frames, errors = _split(FrameDecoder().feed(garbage + _wire(FRAME, STATUS)))
+    assert frames == [FRAME, STATUS]
+    assert len(errors) == 1
+    assert errors[0].reason == reason
+    assert errors[0].discarded == len(garbage)
+    assert errors[0].data == garbage
+
+
+def test_decoder_reports_garbage_without_frames() -> None:
+    """Test discarded bytes are reported even if no frame follows."""
+    decoder = FrameDecoder()
+    _, errors = _split(decoder.feed(b"\x01\x02\x03~"))
+    assert [error.discarded for error in errors] == [3]
+    assert decoder.buffered == 1
+    decoder.reset()
+    assert decoder.buffered == 0
+
+
+def _legacy_recovered(stream: bytes) -> list[bytes]:
+    """Decode a stream with `read_one_message`."""
+
+    async def _read() -> list[bytes]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(stream)
+        reader.feed_eof()
+        frames = []
+        while True:
+            try:
+                frames.append(await read_one_message(reader))
+            except SpaMessageError:
+                continue
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return frames
+
+    return asyncio.run(_read())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_decoder_recovery_rate(seed: int) -> None:
+    """Test intact frames survive random corruption of their neighbours."""
+    rng = random.Random(seed)
+    messages = [
+        bytes.fromhex(message)
+        for fixture in FIXTURES
+        for message in load_spa_from_json(fixture).values()
+    ]
+    stream = bytearray()
+    intact = []
+    for _ in range(2000):
+        frame = _wire(rng.choice(messages))
+        if rng.random() >= 0.1:
+            intact.append(frame[1:-1])
+            stream += frame
+            continue
+        corrupt = bytearray(frame)
+        position = rng.randrange(len(corrupt))
+        mutation = rng.randrange(3)
+        if mutation == 0:
+            corrupt[position] ^= 1 << rng.randrange(8)
+        elif mutation == 1:
+            del corrupt[position]
+        else:
+            corrupt[position:position] = rng.choice((b"~", b"~~", rng.randbytes(3)))
+        stream += corrupt
+
+    decoder = FrameDecoder()
+    results: list[bytes | SpaMessageError] = []
+    position = 0
+    while position < len(stream):
+        size = rng.randint(1, 64)
+        results += decoder.feed(bytes(stream[position : position + size]))
+        position += size
+    frames, _ = _split(results)
+
+    # every intact frame is recovered in order
+    recovered = iter(frames)
+    assert all(frame in recovered for frame in intact)
+    # corrupted frames only get through when the damage was limited to a
+    # delimiter, or in the rare case that the 8 bit checksum still matches
+    spurious = [frame for frame in frames if frame not in messages]
+    assert len(spurious) < 0.01 * (2000 - len(intact))
+    # whereas reading to the next delimiter also loses intact frames
+    assert len(_legacy_recovered(bytes(stream))) / len(intact) < 0.98
@@ -0,0 +1,213 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import Any
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import MessageType
+from pybalboa.gateway import MAX_REQUEST_SIZE, SpaGateway
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+MAC_ADDRESS = "00:15:27:71:f1:9a"
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _status(hour: int) -> bytes:
+    """Return a status update payload."""
+    data = bytearray(STATUS[4:-1])
+    data[3] = hour
+    return bytes(data)
+
+
+async def _websocket(
+    port: int,
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open a WebSocket connection to the gateway."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(
+        b"GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+        b"Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+        b"Sec-WebSocket-Version: 13\r\n\r\n"
+    )
+    response = await reader.readuntil(b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 101")
+    assert b"s3pPLMBiTxaQ9kYGzzhZRbK+xOo=" in response
+    return reader, writer
+
+
+def _send(writer: asyncio.StreamWriter, message: Any, fragments: int = 1) -> None:
+    """Send a masked text message, optionally split into fragments."""
+    payload = json.dumps(message).encode()
+    size = len(payload) // fragments + 1
+    for index in range(fragments):
+        chunk = payload[index * size : (index + 1) * size]
+        last = index == fragments - 1
+        opcode = 0x1 if index == 0 else 0x0
+        mask = os.urandom(4)
+        writer.write(
+            bytes(((0x80 if last else 0) | opcode, 0x80 | len(chunk)))
+            + mask
+            + bytes(byte ^ mask[i % 4] for i, byte in enumerate(chunk))
+        )
+
+
+async def _receive(reader: asyncio.StreamReader) -> Any:
+    """Receive an unmasked text message."""
+    header = await asyncio.wait_for(reader.readexactly(2), 5)
+    assert header[0] == 0x81
+    length = header[1]
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    return json.loads(await reader.readexactly(length))
+
+
+@pytest.mark.asyncio
+async def test_gateway_websocket(bfbp20s: SpaServer) -> None:
+    """Test state is pushed over WebSocket and commands are executed."""
+    async with SpaClient(HOST, bfbp20s.port) as spa, SpaGateway(HOST, 0) as gateway:
+        assert await spa.async_configuration_loaded()
+        gateway.add(spa)
+        reader, writer = await _websocket(gateway.port)
+        keyframe = await _receive(reader)
+        assert keyframe["type"] == "keyframe"
+        assert keyframe["mac"] == "00:15:27:71:f1:9a"
+        assert keyframe["state"]["controls"]["Light 1"] == "ON"
+
+        received = len(bfbp20s.received_messages)
+        _send(
+            writer,
+            {"id": 1, "command": "set_state", "control": "light 1", "state": "off"},
+            3,
+        )
+        while (result := await _receive(reader))["type"] != "result":
+            pass
+        assert result == {"type": "result", "id": 1, "ok": True}
+        await asyncio.sleep(0.1)
+        assert MessageType.TOGGLE_STATE in [
+            message[3] for message in bfbp20s.received_messages[received:]
+        ]
+
+        _send(
+            writer,
+            {"id": 2, "command": "set_state", "control": "Light 1", "state": "HIGH"},
+        )
+        while (result := await _receive(reader))["type"] != "result":
+            pass
+        assert not result["ok"]
+        assert "Invalid state" in result["error"]
+
+        writer.write(bytes((0x88, 0x80)) + os.urandom(4))
+        assert (await reader.read(2))[0] == 0x88
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_gateway_events() -> None:
+    """Test keyframes and deltas are streamed as server-sent events."""
+    spa = SpaClient(HOST, mac_address=MAC_ADDRESS)
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    async with SpaGateway(HOST, 0) as gateway:
+        gateway.add(spa)
+        reader, writer = await asyncio.open_connection(HOST, gateway.port)
+        writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        assert b"text/event-stream" in await reader.readuntil(b"\r\n\r\n")
+        event = await reader.readuntil(b"\n\n")
+        assert json.loads(event[6:])["state"]["time_hour"] == 1
+        for _ in range(100):
+            if gateway.subscribers:
+                break
+            await asyncio.sleep(0.01)
+
+        spa._parse_status_update(_status(2))  # pylint: disable=protected-access
+        event = await asyncio.wait_for(reader.readuntil(b"\n\n"), 5)
+        assert json.loads(event[6:]) == {
+            "type": "delta",
+            "changes": {"time_hour": 2},
+            "mac": MAC_ADDRESS,
+            "seq": 2,
+        }
+
+        state_reader, state_writer = await asyncio.open_connection(HOST, gateway.port)
+        state_writer.write(b"GET /state HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await state_reader.read()
+        assert response.startswith(b"HTTP/1.1 200")
+        assert (
+            json.loads(response.split(b"\r\n\r\n", 1)[1])[MAC_ADDRESS]["time_hour"] == 2
+        )
+
+        body = json.dumps({"command": "reboot"}).encode()
+        command_reader, command_writer = await asyncio.open_connection(
+            HOST, gateway.port
+        )
+        command_writer.write(
+            b"POST /command HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s"
+            % (len(body), body)
+        )
+        response = await command_reader.read()
+        assert response.startswith(b"HTTP/1.1 400")
+        assert b"Unknown command: reboot" in response
+        writer.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fragmented", [False, True])
+async def test_gateway_message_too_big(fragmented: bool) -> None:
+    """Test a WebSocket message over the size limit is closed with 1009."""
+    async with SpaGateway(HOST, 0) as gateway:
+        reader, writer = await _websocket(gateway.port)
+        if fragmented:
+            size = MAX_REQUEST_SIZE // 2 + 1
+            for opcode in (0x1, 0x0):
+                writer.write(
+                    bytes((opcode, 0x80 | 126)) + size.to_bytes(2, "big") + bytes(4)
+                )
+                writer.write(bytes(size))
+        else:
+            writer.write(
+                bytes((0x81, 0x80 | 127)) + (MAX_REQUEST_SIZE + 1).to_bytes(8, "big")
+            )
+        close = await asyncio.wait_for(reader.readexactly(4), 5)
+        assert close == bytes((0x88, 2)) + (1009).to_bytes(2, "big")
+        assert await reader.read() == b""
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_gateway_drops_slow_subscribers() -> None:
+    """Test subscribers that stop reading are disconnected."""
+    async with SpaGateway(HOST, 0, write_buffer_limit=1024) as gateway:
+        writers = []
+        for path in (b"/events", b"/ws"):
+            if path == b"/ws":
+                _, writer = await _websocket(gateway.port)
+            else:
+                reader, writer = await asyncio.open_connection(HOST, gateway.port)
+                writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                await reader.readuntil(b"\r\n\r\n")
+            writers.append(writer)
+        for _ in range(100):
+            if gateway.subscribers == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert gateway.subscribers == 2
+
+        # neither subscriber reads, so their buffers fill up
+        state = {"padding": "x" * 65536}
+        for seq in range(1, 1000):
+            gateway._broadcast(  # pylint: disable=protected-access
+                {"type": "keyframe", "mac": MAC_ADDRESS, "seq": seq, "state": state}
+            )
+            await asyncio.sleep(0)
+            if not gateway.subscribers:
+                break
+        assert not gateway.subscribers
+        for writer in writers:
+            writer.close()
@@ -0,0 +1,96 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.governor import ReconnectGovernor
+from pybalboa.transport import MemoryTransport
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+
+
+@pytest.mark.asyncio
+async def test_governor_limits_concurrency() -> None:
+    """Test the governor caps concurrent bootstraps."""
+    governor = ReconnectGovernor(max_bootstraps=2)
+    active = peak = 0
+
+    async def _bootstrap() -> None:
+        nonlocal active, peak
+        async with governor.bootstrap_slot():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(_bootstrap() for _ in range(6)))
+    assert peak == 2
+    metrics = governor.metrics["bootstrap"]
+    assert metrics["acquired"] == 6
+    assert metrics["active"] == metrics["waiting"] == 0
+    assert metrics["wait_max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_governor_rate_limits_connects() -> None:
+    """Test the token bucket spaces out connection attempts."""
+    governor = ReconnectGovernor(connect_rate=50, connect_burst=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def _connect() -> None:
+        async with governor.connect_slot():
+            pass
+
+    await asyncio.gather(*(_connect() for _ in range(7)))
+    # 2 burst tokens, then 5 more at 50 per second
+    assert loop.time() - start >= 0.09
+    assert governor.metrics["connect"]["acquired"] == 7
+
+
+def test_governor_invalid_limits() -> None:
+    """Test invalid governor limits."""
+    with pytest.raises(ValueError):
+        ReconnectGovernor(max_connects=0)
+    with pytest.raises(ValueError):
+        ReconnectGovernor(bootstrap_timeout=0)
+
+
+@pytest.mark.asyncio
+async def test_client_with_governor(bfbp20s: SpaServer) -> None:
+    """Test a client connecting through a governor."""
+    governor = ReconnectGovernor()
+    async with SpaClient(HOST, bfbp20s.port, governor=governor) as spa:
+        assert await spa.async_configuration_loaded()
+    assert governor.metrics["connect"]["acquired"] == 1
+    assert governor.metrics["bootstrap"]["acquired"] == 1
+
+
+async def _silent_spa(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """Read requests and never answer them."""
+    while await reader.read(1024):
+        pass
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_timeout(bfbp20s: SpaServer) -> None:
+    """Test a spa that never answers does not hold the only bootstrap slot."""
+    governor = ReconnectGovernor(max_bootstraps=1, bootstrap_timeout=0.5)
+    silent = SpaClient(HOST, transport=MemoryTransport(_silent_spa), governor=governor)
+    async with silent:
+        await asyncio.sleep(0)
+        async with SpaClient(HOST, bfbp20s.port, governor=governor) as spa:
+            assert await spa.async_configuration_loaded(5)
+        assert not silent.configuration_loaded
+    metrics = governor.metrics["bootstrap"]
+    assert metrics["timeouts"] >= 1
+    assert metrics["active"] == 0
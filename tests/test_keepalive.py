@@ -0,0 +1,57 @@
+"""Tests module."""
+
+import pytest
+
+from pybalboa.keepalive import KeepalivePolicy
+
+
+def test_keepalive_policy_bounds() -> None:
+    """Test keepalive policy bounds."""
+    policy = KeepalivePolicy(10, 60)
+    assert policy.minimum == 2.5
+    assert policy.maximum == 30
+    assert KeepalivePolicy(10, 8).maximum == 10
+
+    with pytest.raises(ValueError):
+        KeepalivePolicy(0, 60)
+
+
+def test_keepalive_policy_stretches_with_traffic() -> None:
+    """Test the interval stretches while frames are flowing."""
+    policy = KeepalivePolicy(10, 60)
+    now = policy.last_received
+    for _ in range(5):
+        policy.frame_received()
+        assert not policy.tick(now + 1)
+    assert policy.interval == policy.maximum
+
+
+def test_keepalive_policy_tightens_when_probes_unanswered() -> None:
+    """Test the interval tightens when keepalives go unanswered."""
+    policy = KeepalivePolicy(10, 60)
+    start = policy.last_received
+
+    assert not policy.tick(start + 5)
+    assert policy.tick(start + 10)
+    assert policy.pending_probes == 1
+    policy.frame_sent()
+
+    assert policy.tick(policy.last_sent + 10)
+    assert policy.interval == 5
+    assert policy.pending_probes == 2
+
+    policy.frame_received()
+    assert policy.pending_probes == 0
+    assert not policy.expired()
+    assert policy.expired(policy.last_received + 61)
+
+
+def test_keepalive_policy_frame_error() -> None:
+    """Test corrupt frames tighten the interval."""
+    policy = KeepalivePolicy(8, 60)
+    policy.frame_error()
+    policy.frame_error()
+    policy.frame_error()
+    assert policy.interval == policy.minimum == 2
+    policy.reset()
+    assert policy.interval == 8
@@ -0,0 +1,56 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import MessageType
+from pybalboa.metrics import SpaMetrics, render_prometheus
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+
+
+def test_metrics_snapshot() -> None:
+    """Test the metrics snapshot."""
+    metrics = SpaMetrics()
+    metrics.frames_received[MessageType.STATUS_UPDATE] += 3
+    metrics.frames_received[0x99] += 1
+    metrics.message_error("checksum", 12)
+    metrics.connects = 3
+
+    snapshot = metrics.snapshot()
+    assert snapshot["frames_received"] == {"STATUS_UPDATE": 3, "0x99": 1}
+    assert snapshot["message_errors"] == {"invalid": 0, "incomplete": 0, "checksum": 1}
+    assert snapshot["resync_bytes_discarded"] == 12
+    assert snapshot["reconnects"] == 2
+
+
+def test_render_prometheus() -> None:
+    """Test rendering metrics in the Prometheus text format."""
+    metrics = SpaMetrics()
+    metrics.frames_received[MessageType.STATUS_UPDATE] = 5
+    metrics.keepalives_sent = 2
+    text = render_prometheus({'spa "1"': metrics})
+    assert (
+        'pybalboa_frames_received_total{spa="spa \\"1\\"",type="STATUS_UPDATE"} 5'
+        in text
+    )
+    assert 'pybalboa_keepalives_sent_total{spa="spa \\"1\\""} 2' in text
+    assert "# TYPE pybalboa_reconnects_total counter" in text
+    assert text.endswith("\n")
+
+
+@pytest.mark.asyncio
+async def test_client_metrics(bfbp20s: SpaServer) -> None:
+    """Test the client counts frames."""
+    async with SpaClient(HOST, bfbp20s.port) as spa:
+        assert await spa.async_configuration_loaded()
+        snapshot = spa.metrics.snapshot()
+    assert snapshot["frames_received"]["STATUS_UPDATE"] >= 1
+    assert snapshot["frames_received"]["MODULE_IDENTIFICATION"] >= 1
+    assert snapshot["frames_sent"] >= 5
+    assert snapshot["bytes_sent"] > snapshot["frames_sent"]
+    assert snapshot["connects"] == 1
@@ -0,0 +1,278 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import MessageType
+from pybalboa.mqtt import (  # pylint: disable=protected-access
+    MqttClient,
+    MqttConnection,
+    SpaMqttBridge,
+    _packet,
+    _read_packet,
+)
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+MODULE_IDENTIFICATION = "1e0abf9402148000152771f19a0000000000000000001527ffff71f19a0a"
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _status(hour: int) -> bytes:
+    """Return a status update payload."""
+    data = bytearray(STATUS[4:-1])
+    data[3] = hour
+    return bytes(data)
+
+
+class MemoryMqtt(MqttConnection):
+    """MQTT connection that keeps published batches in a list."""
+
+    def __init__(self) -> None:
+        """Initialize the connection."""
+        super().__init__()
+        self.batches: list[list[tuple[str, bytes, bool]]] = []
+        self.topic_filters: list[str] = []
+
+    def publish(self, messages: Iterable[tuple[str, bytes, bool]]) -> None:
+        """Keep a batch."""
+        self.batches.append(list(messages))
+
+    async def subscribe(self, topic_filters: list[str]) -> None:
+        """Keep the topic filters."""
+        self.topic_filters.extend(topic_filters)
+
+
+class MqttBroker:
+    """Minimal MQTT broker routing QoS 0 messages and keeping retained ones."""
+
+    def __init__(self) -> None:
+        """Initialize the broker."""
+        self.retained: dict[str, bytes] = {}
+        self.subscriptions: list[tuple[str, asyncio.StreamWriter]] = []
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve a client."""
+        try:
+            while True:
+                packet_type, body = await _read_packet(reader)
+                if packet_type == 0x10:
+                    writer.write(bytes((0x20, 2, 0, 0)))
+                elif packet_type == 0x82:
+                    index = 2
+                    while index < len(body):
+                        length = int.from_bytes(body[index : index + 2], "big")
+                        topic = body[index + 2 : index + 2 + length].decode()
+                        self.subscriptions.append((topic, writer))
+                        index += length + 3
+                    writer.write(_packet(0x90, body[:2] + b"\x00"))
+                elif packet_type & 0xF0 == 0x30:
+                    length = int.from_bytes(body[:2], "big")
+                    topic = body[2 : 2 + length].decode()
+                    if packet_type & 0x01:
+                        self.retained[topic] = body[2 + length :]
+                    for topic_filter, subscriber in self.subscriptions:
+                        if _matches(topic_filter, topic):
+                            subscriber.write(_packet(0x30, body))
+                elif packet_type == 0xC0:
+                    writer.write(bytes((0xD0, 0)))
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+
+def _matches(topic_filter: str, topic: str) -> bool:
+    """Return `True` if a topic matches a filter with + wildcards."""
+    levels = topic.split("/")
+    parts = topic_filter.split("/")
+    return len(levels) == len(parts) and all(
+        part in ("+", level) for part, level in zip(parts, levels)
+    )
+
+
+def test_connection_requires_publish_and_subscribe() -> None:
+    """Test a connection missing `publish` or `subscribe` can not be instantiated."""
+
+    class PublishOnly(MqttConnection):  # pylint: disable=abstract-method
+        """Connection that does not implement `subscribe`."""
+
+        def publish(self, messages: Iterable[tuple[str, bytes, bool]]) -> None:
+            """Drop a batch."""
+
+    with pytest.raises(TypeError, match="subscribe"):
+        PublishOnly()  # type: ignore[abstract]
+
+
+def test_bridge_publishes_changed_topics() -> None:
+    """Test every topic is published once and then only the changed ones."""
+    spa = SpaClient(HOST)
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    mqtt = MemoryMqtt()
+    bridge = SpaMqttBridge(mqtt)
+    bridge.add(spa)
+    # nothing is published until the MAC address is known
+    assert not mqtt.batches
+
+    # pylint: disable=protected-access
+    spa._process_message(bytes.fromhex(MODULE_IDENTIFICATION))
+    spa._parse_status_update(_status(2))
+    topics = {topic: payload for topic, payload, _ in mqtt.batches[0]}
+    assert all(retain for _, _, retain in mqtt.batches[0])
+    assert topics["spa/00152771f19a/available"] == b"offline"
+    assert topics["spa/00152771f19a/temperature"] == b"100.0"
+    assert topics["spa/00152771f19a/heat_state"] == b"HEATING"
+    assert topics["spa/00152771f19a/time"] == b"02:55"
+    assert topics["spa/00152771f19a/filter_cycle_1_running"] == b"false"
+
+    spa._parse_status_update(_status(2))
+    spa._parse_status_update(_status(3))
+    assert mqtt.batches[1:] == [[("spa/00152771f19a/time", b"03:55", True)]]
+
+    # everything is published again once a lost connection is restored
+    mqtt.connection_changed(False)
+    spa._parse_status_update(_status(4))
+    assert len(mqtt.batches) == 2
+    mqtt.connection_changed(True)
+    assert {topic for topic, _, _ in mqtt.batches[2]} == set(topics)
+
+
+@pytest.mark.asyncio
+async def test_bridge_over_mqtt(bfbp20s: SpaServer) -> None:
+    """Test topics are retained by a broker and commands are executed."""
+    broker = MqttBroker()
+    server = await asyncio.start_server(broker.handle, HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+    mqtt = MqttClient(HOST, port)
+    commander = MqttClient(HOST, port)
+    async with server, SpaClient(HOST, bfbp20s.port) as spa:
+        assert await spa.async_configuration_loaded()
+        await mqtt.connect()
+        await commander.connect()
+        bridge = SpaMqttBridge(mqtt)
+        await bridge.start()
+        bridge.add(spa)
+
+        base = "spa/00152771f19a"
+        for _ in range(100):
+            if f"{base}/light/1" in broker.retained:
+                break
+            await asyncio.sleep(0.01)
+        assert broker.retained[f"{base}/light/1"] == b"ON"
+        assert broker.retained[f"{base}/circulation_pump"] == b"ON"
+        assert broker.retained[f"{base}/available"] == b"online"
+
+        received = len(bfbp20s.received_messages)
+        commander.publish([(f"{base}/light/1/set", b"OFF", False)])
+        for _ in range(100):
+            forwarded = [message[3] for message in bfbp20s.received_messages[received:]]
+            if MessageType.TOGGLE_STATE in forwarded:
+                break
+            await asyncio.sleep(0.01)
+        assert MessageType.TOGGLE_STATE in forwarded
+
+        await commander.disconnect()
+        await mqtt.disconnect()
+        assert not mqtt.connected
+
+
+@pytest.mark.asyncio
+async def test_client_reconnects(bfbp20s: SpaServer) -> None:
+    """Test a lost broker connection is restored and the topics republished."""
+    broker = MqttBroker()
+    server = await asyncio.start_server(broker.handle, HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+    mqtt = MqttClient(HOST, port, reconnect_delay=0.01)
+    async with server, SpaClient(HOST, bfbp20s.port) as spa:
+        assert await spa.async_configuration_loaded()
+        await mqtt.connect()
+        bridge = SpaMqttBridge(mqtt)
+        await bridge.start()
+        bridge.add(spa)
+        topic = "spa/00152771f19a/light/1"
+        for _ in range(100):
+            if topic in broker.retained:
+                break
+            await asyncio.sleep(0.01)
+        assert topic in broker.retained
+
+        # the broker restarts and loses its retained topics and subscriptions
+        for _, writer in broker.subscriptions:
+            writer.close()
+        broker.retained.clear()
+        broker.subscriptions.clear()
+        for _ in range(200):
+            if topic in broker.retained and broker.subscriptions:
+                break
+            await asyncio.sleep(0.01)
+        assert broker.retained[topic] == b"ON"
+        assert mqtt.connected
+        assert {topic_filter for topic_filter, _ in broker.subscriptions} == {
+            "spa/+/+/set",
+            "spa/+/+/+/set",
+        }
+
+        await mqtt.disconnect()
+        assert not mqtt.connected
+
+
+@pytest.mark.asyncio
+async def test_bridge_survives_malformed_commands(bfbp20s: SpaServer) -> None:
+    """Test malformed commands are logged and later commands still run."""
+    mqtt = MemoryMqtt()
+    async with SpaClient(HOST, bfbp20s.port) as spa:
+        assert await spa.async_configuration_loaded()
+        SpaMqttBridge(mqtt).add(spa)
+        received = len(bfbp20s.received_messages)
+        topic = "spa/00152771f19a/light/1/set"
+        mqtt.message_received(topic, b"\xff\xfe")
+        mqtt.message_received(topic, "\u00b2".encode())
+        mqtt.message_received(topic, b"OFF")
+        for _ in range(100):
+            forwarded = [message[3] for message in bfbp20s.received_messages[received:]]
+            if MessageType.TOGGLE_STATE in forwarded:
+                break
+            await asyncio.sleep(0.01)
+        assert forwarded.count(MessageType.TOGGLE_STATE) == 1
+
+
+@pytest.mark.asyncio
+async def test_client_survives_malformed_topics() -> None:
+    """Test a topic that is not UTF-8 does not stop the client listening."""
+
+    async def _broker(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        await _read_packet(reader)
+        writer.write(bytes((0x20, 2, 0, 0)))
+        for topic in (b"spa/\xff", b"spa/ok"):
+            writer.write(_packet(0x30, len(topic).to_bytes(2, "big") + topic + b"1"))
+        while await reader.read(1024):
+            pass
+
+    received: list[tuple[str, bytes]] = []
+
+    def _handle(topic: str, payload: bytes) -> None:
+        received.append((topic, payload))
+        if topic != "spa/ok":
+            raise ValueError("unexpected topic")
+
+    server = await asyncio.start_server(_broker, HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+    mqtt = MqttClient(HOST, port)
+    mqtt.message_handler = _handle
+    async with server:
+        await mqtt.connect()
+        for _ in range(100):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert received == [("spa/\ufffd", b"1"), ("spa/ok", b"1")]
+        assert mqtt.connected
+        await mqtt.disconnect()
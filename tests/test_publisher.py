@@ -0,0 +1,144 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import io
+import json
+from typing import Any
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.publisher import (
+    MESSAGE_DELTA,
+    MESSAGE_KEYFRAME,
+    JsonLinesSink,
+    StatePublisher,
+    StateReceiver,
+    StateSink,
+    _diff,
+)
+
+HOST = "localhost"
+MAC_ADDRESS = "00:15:27:71:f1:9a"
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+class ListSink(StateSink):
+    """Sink that keeps messages in a list."""
+
+    def __init__(self) -> None:
+        """Initialize the sink."""
+        self.messages: list[dict[str, Any]] = []
+
+    def publish(self, message: dict[str, Any]) -> None:
+        """Keep a message."""
+        self.messages.append(message)
+
+
+def _status(hour: int, temperature: int = 100) -> bytes:
+    """Return a status update payload."""
+    data = bytearray(STATUS[4:-1])
+    data[2] = temperature
+    data[3] = hour
+    return bytes(data)
+
+
+def test_keyframes_and_deltas() -> None:
+    """Test a keyframe is followed by deltas holding only changed fields."""
+    spa = SpaClient(HOST, mac_address=MAC_ADDRESS)
+    sink = ListSink()
+    publisher = StatePublisher(sink)
+    publisher.add(spa)
+
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    spa._parse_status_update(_status(2))  # pylint: disable=protected-access
+    spa._parse_status_update(_status(2, 101))  # pylint: disable=protected-access
+
+    assert [message["type"] for message in sink.messages] == [
+        MESSAGE_KEYFRAME,
+        MESSAGE_DELTA,
+        MESSAGE_DELTA,
+    ]
+    assert [message["seq"] for message in sink.messages] == [1, 2, 3]
+    assert sink.messages[0]["mac"] == MAC_ADDRESS
+    assert sink.messages[1]["changes"] == {"time_hour": 2}
+    assert sink.messages[2]["changes"]["temperature"] == 101
+
+    receiver = StateReceiver()
+    for message in sink.messages:
+        state = receiver.apply(message)
+    assert state == spa.snapshot().to_dict()
+
+    publisher.request_keyframe(MAC_ADDRESS)
+    spa._parse_status_update(_status(3))  # pylint: disable=protected-access
+    assert sink.messages[-1]["type"] == MESSAGE_KEYFRAME
+    assert sink.messages[-1]["seq"] == 4
+
+
+def test_receiver_detects_gaps() -> None:
+    """Test a missed delta is detected until the next keyframe."""
+    spa = SpaClient(HOST, mac_address=MAC_ADDRESS)
+    stream = io.StringIO()
+    publisher = StatePublisher(JsonLinesSink(stream))
+    publisher.add(spa)
+    for hour in range(4):
+        spa._parse_status_update(_status(hour))  # pylint: disable=protected-access
+    publisher.request_keyframe()
+    spa._parse_status_update(_status(5))  # pylint: disable=protected-access
+    publisher.close()
+
+    messages = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(messages) == 5
+    del messages[2]
+    receiver = StateReceiver()
+    results = [receiver.apply(message) for message in messages]
+    assert results[0] is not None
+    assert results[1] is not None
+    assert results[2] is None
+    assert results[3] == spa.snapshot().to_dict()
+
+
+def test_unknown_mac_address_is_not_published() -> None:
+    """Test nothing is published until the stream can be keyed by MAC address."""
+    spa = SpaClient(HOST)
+    sink = ListSink()
+    StatePublisher(sink).add(spa)
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    assert not sink.messages
+
+
+def test_removed_fields() -> None:
+    """Test fields missing from the new state are removed by the receiver."""
+    old = {"temperature": 100, "controls": {"pump_1": 0, "pump_2": 1}, "x": None}
+    new = {"temperature": 100, "controls": {"pump_1": 1}}
+    removed: list[list[str]] = []
+    changes = _diff(old, new, removed)
+    assert changes == {"controls": {"pump_1": 1}}
+    assert removed == [["controls", "pump_2"], ["x"]]
+
+    receiver = StateReceiver()
+    receiver.apply(
+        {"type": MESSAGE_KEYFRAME, "mac": MAC_ADDRESS, "seq": 1, "state": old}
+    )
+    state = receiver.apply(
+        {
+            "type": MESSAGE_DELTA,
+            "mac": MAC_ADDRESS,
+            "seq": 2,
+            "changes": changes,
+            "removed": removed,
+        }
+    )
+    assert state == new
+
+
+def test_sink_requires_publish() -> None:
+    """Test a sink without `publish` can not be instantiated."""
+
+    class IncompleteSink(StateSink):  # pylint: disable=abstract-method
+        """Sink that does not implement `publish`."""
+
+    with pytest.raises(TypeError, match="publish"):
+        IncompleteSink()  # type: ignore[abstract]
@@ -0,0 +1,128 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import MessageType
+from pybalboa.framing import FrameDecoder, encode_frame
+from pybalboa.rs485 import (
+    CHANNEL_ASSIGNMENT_ACK,
+    CHANNEL_ASSIGNMENT_REQUEST,
+    CHANNEL_ASSIGNMENT_RESPONSE,
+    CLEAR_TO_SEND,
+    CLIENT_HASH,
+    NEW_CLIENT_CLEAR_TO_SEND,
+    NOTHING_TO_SEND,
+    SerialTransport,
+)
+
+from .conftest import load_spa_from_json
+
+CHANNEL = 0x10
+
+
+class SpaBoard:
+    """The spa end of a pseudo-terminal pair, playing the main board."""
+
+    def __init__(self, fd: int) -> None:
+        """Initialize the board."""
+        self.fd = fd
+        self.decoder = FrameDecoder()
+        self.frames: list[bytes] = []
+        os.set_blocking(fd, False)
+
+    def send(self, channel: int, message_type: int, payload: bytes = b"") -> None:
+        """Send a bus message."""
+        os.write(self.fd, encode_frame(bytes((channel, 0xBF, message_type)) + payload))
+
+    def send_frame(self, frame: str) -> None:
+        """Send a captured frame given in hex without delimiters."""
+        os.write(self.fd, b"~" + bytes.fromhex(frame) + b"~")
+
+    async def receive(self) -> bytes:
+        """Return the next frame written by the client."""
+        for _ in range(200):
+            if self.frames:
+                return self.frames.pop(0)
+            try:
+                data = os.read(self.fd, 1024)
+            except BlockingIOError:
+                await asyncio.sleep(0.01)
+                continue
+            self.frames.extend(
+                frame for frame in self.decoder.feed(data) if isinstance(frame, bytes)
+            )
+        raise AssertionError("no frame received")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partial_writes", [False, True])
+async def test_serial_transport(partial_writes: bool) -> None:
+    """Test channel assignment and sending only when cleared to send."""
+    messages = load_spa_from_json("bfbp20s")
+    board_fd, device_fd = os.openpty()
+    board = SpaBoard(board_fd)
+    transport = SerialTransport("00:15:27:00:00:42")
+    spa = SpaClient(os.ttyname(device_fd), transport=transport)
+    write = os.write
+    busy = False
+
+    def _partial_write(fd: int, data: bytes) -> int:
+        """Accept two bytes at a time from the link, or none every other call."""
+        nonlocal busy
+        if fd == board_fd:
+            return write(fd, data)
+        busy = not busy
+        if busy:
+            raise BlockingIOError
+        return write(fd, bytes(data[:2]))
+
+    stack = ExitStack()
+    if partial_writes:
+        stack.enter_context(patch("os.write", _partial_write))
+    try:
+        assert await spa.connect()
+
+        board.send(0xFE, NEW_CLIENT_CLEAR_TO_SEND)
+        request = await board.receive()
+        assert request[1:5] == bytes((0xFE, 0xBF, CHANNEL_ASSIGNMENT_REQUEST, 0x02))
+        assert request[5:7] == CLIENT_HASH
+        board.send(0xFE, CHANNEL_ASSIGNMENT_RESPONSE, bytes((CHANNEL,)) + CLIENT_HASH)
+        ack = await board.receive()
+        assert ack[1:4] == bytes((CHANNEL, 0xBF, CHANNEL_ASSIGNMENT_ACK))
+
+        # configuration requests wait for a clear to send slot on the channel
+        board.send_frame(messages["status_update"])
+        requested = set()
+        for _ in range(4):
+            board.send(CHANNEL, CLEAR_TO_SEND)
+            request = await board.receive()
+            assert request[1:4] == bytes((CHANNEL, 0xBF, MessageType.REQUEST))
+            requested.add(request[4])
+        assert len(requested) == 4
+        board.send(CHANNEL, CLEAR_TO_SEND)
+        assert (await board.receive())[1:4] == bytes((CHANNEL, 0xBF, NOTHING_TO_SEND))
+
+        for name in (
+            "system_information",
+            "setup_parameters",
+            "device_configuration",
+            "filter_cycle",
+            "status_update",
+        ):
+            board.send_frame(messages[name])
+        assert await spa.async_configuration_loaded(5)
+        assert spa.mac_address == "00:15:27:00:00:42"
+        assert spa.model == "BFBP20S"
+    finally:
+        await spa.disconnect()
+        stack.close()
+        os.close(board_fd)
+        os.close(device_fd)
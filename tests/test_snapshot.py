@@ -0,0 +1,107 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import pickle
+
+import pytest
+
+from pybalboa import EVENT_UPDATE, SpaClient
+from pybalboa.enums import SpaState
+from pybalboa.snapshot import SpaSnapshot
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+
+
+def _status(hour: int) -> bytes:
+    """Return a status update payload for an hour."""
+    data = bytearray(STATUS[4:-1])
+    data[3] = hour
+    return bytes(data)
+
+
+@pytest.mark.asyncio
+async def test_updates(bfbp20s: SpaServer) -> None:
+    """Test snapshots are delivered as the spa is updated."""
+    async with SpaClient(HOST, bfbp20s.port) as spa:
+        updates = spa.updates()
+        snapshot = await asyncio.wait_for(updates.__anext__(), 5)
+        assert isinstance(snapshot, SpaSnapshot)
+        assert await spa.async_configuration_loaded()
+        async for snapshot in updates:
+            if snapshot.target_temperature is not None:
+                break
+        assert snapshot.state == SpaState.RUNNING
+        assert snapshot.target_temperature == spa.target_temperature
+        assert dict(snapshot.controls)["Light 1"] == spa.lights[0].state
+        with pytest.raises(AttributeError):
+            snapshot.temperature = 0
+    await updates.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("maxsize", "policy", "expected"), [(2, "drop_oldest", 2), (5, "latest_only", 1)]
+)
+async def test_updates_bounded(maxsize: int, policy: str, expected: int) -> None:
+    """Test a slow consumer never holds more than the queue size."""
+    spa = SpaClient(HOST)
+    received: list[SpaSnapshot] = []
+
+    async def _consume() -> None:
+        async for snapshot in spa.updates(maxsize, policy):
+            received.append(snapshot)
+
+    task = asyncio.ensure_future(_consume())
+    await asyncio.sleep(0)
+    for hour in range(10):
+        spa._parse_status_update(_status(hour))  # pylint: disable=protected-access
+    await asyncio.sleep(0.01)
+    assert [snapshot.time_hour for snapshot in received] == list(range(10))[-expected:]
+
+    await spa.disconnect()
+    await asyncio.wait_for(task, 1)
+    assert len(spa._listeners[EVENT_UPDATE]) == 0  # pylint: disable=protected-access
+
+
+@pytest.mark.asyncio
+async def test_updates_invalid_policy() -> None:
+    """Test an unknown policy is rejected."""
+    with pytest.raises(ValueError):
+        await SpaClient(HOST).updates(policy="unknown").__anext__()
+
+
+def test_snapshot_is_reused_until_the_state_changes() -> None:
+    """Test one snapshot is shared until a changed status frame arrives."""
+    spa = SpaClient(HOST)
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    snapshot = spa.snapshot()
+    assert spa.snapshot() is snapshot
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    assert spa.snapshot() is snapshot
+    spa._parse_status_update(_status(2))  # pylint: disable=protected-access
+    assert spa.snapshot() is not snapshot
+    assert spa.snapshot().time_hour == 2
+
+
+def test_snapshot_serialization() -> None:
+    """Test snapshots serialize to JSON compatible values and pickle."""
+    spa = SpaClient(HOST)
+    spa._parse_status_update(_status(1))  # pylint: disable=protected-access
+    snapshot = spa.snapshot()
+    data = snapshot.to_dict()
+    assert data["state"] == "RUNNING"
+    assert data["time_hour"] == 1
+    assert data["temperature_unit"] == "FAHRENHEIT"
+    assert json.loads(snapshot.to_json()) == data
+    assert snapshot.to_json() is snapshot.to_json()
+    copy = pickle.loads(pickle.dumps(snapshot))
+    assert copy == snapshot
+    assert hash(copy) == hash(snapshot)
+    with pytest.raises(AttributeError):
+        del copy.state
@@ -0,0 +1,84 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+
+from pybalboa.framing import encode_frame
+from pybalboa.rs485 import CLEAR_TO_SEND, SerialMonitorTransport
+from pybalboa.sniffer import SniffedFrame, SpaSniffer
+from pybalboa.transport import MemoryTransport
+
+STATUS = bytes.fromhex("1dffaf130003640a3700040100021c00000203000000012068000452f8")
+CLEAR_TO_SEND_FRAME = encode_frame(bytes((0x10, 0xBF, CLEAR_TO_SEND)))
+UNKNOWN_FRAME = encode_frame(bytes((0x11, 0xBF, 0x99, 0x01, 0x02)))
+
+
+@pytest.mark.asyncio
+async def test_sniffer() -> None:
+    """Test every frame is decoded and counted without sending anything."""
+    received = bytearray()
+
+    async def _spa(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(b"~" + STATUS + b"~" + CLEAR_TO_SEND_FRAME)
+        writer.write(b"\x01\x02" + UNKNOWN_FRAME)
+        while data := await reader.read(1024):
+            received.extend(data)
+
+    async with SpaSniffer("spa", transport=MemoryTransport(_spa)) as sniffer:
+        frames: list[SniffedFrame] = []
+        async for frame in sniffer.frames():
+            frames.append(frame)
+            if len(frames) == 3:
+                break
+
+    assert [frame.name for frame in frames] == [
+        "STATUS_UPDATE",
+        "CLEAR_TO_SEND",
+        "0x99",
+    ]
+    assert frames[2].channel == 0x11
+    assert frames[2].payload == b"\x01\x02"
+    assert frames[2].as_dict()["payload"] == "0102"
+    assert not received
+
+    snapshot = sniffer.statistics.snapshot()
+    assert snapshot["channels"] == {
+        "0x10": {"CLEAR_TO_SEND": {"frames": 1, "bytes": 7}},
+        "0x11": {"0x99": {"frames": 1, "bytes": 9}},
+        "0xFF": {"STATUS_UPDATE": {"frames": 1, "bytes": 31}},
+    }
+    assert snapshot["frames"] == 3
+    assert snapshot["bytes_discarded"] == 2
+    assert snapshot["message_errors"]["invalid"] == 1
+
+
+def test_sniffer_statistics() -> None:
+    """Test bus utilization is derived from the frame timestamps."""
+    sniffer = SpaSniffer("spa")
+    sniffer.feed(b"~" + STATUS + b"~", timestamp=10.0)
+    sniffer.feed(CLEAR_TO_SEND_FRAME, timestamp=10.5)
+    assert sniffer.statistics.duration == 0.5
+    assert sniffer.statistics.utilization(1000) == pytest.approx(38 * 10 / 500)
+    assert SpaSniffer("spa").statistics.utilization() is None
+
+
+@pytest.mark.asyncio
+async def test_serial_monitor() -> None:
+    """Test the bus is read through a serial device opened read only."""
+    board_fd, device_fd = os.openpty()
+    sniffer = SpaSniffer(os.ttyname(device_fd), transport=SerialMonitorTransport())
+    try:
+        await sniffer.connect()
+        os.write(board_fd, CLEAR_TO_SEND_FRAME)
+        async for frame in sniffer.frames():
+            assert frame.name == "CLEAR_TO_SEND"
+            break
+        assert sniffer.connected
+    finally:
+        await sniffer.disconnect()
+        os.close(board_fd)
+        os.close(device_fd)
@@ -0,0 +1,95 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import OffOnState
+from pybalboa.sync import SpaLoopThread
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+
+
+def _use_spa(port: int) -> None:
+    """Connect, read and control a spa from a plain thread."""
+    with SpaLoopThread(timeout=10) as loop_thread:
+        spa = loop_thread.add_client(HOST, port)
+        assert spa.snapshot.model is None
+        assert spa.connect()
+        snapshot = spa.snapshot
+        assert snapshot.model == "BFBP20S"
+        assert ("Light 1", OffOnState.ON) in snapshot.controls
+
+        spa.call(lambda client: client.request_fault_log())
+        assert spa.set_control_state("Light 1", OffOnState.OFF)
+        with pytest.raises(ValueError):
+            spa.set_control_state("Light 9", OffOnState.OFF)
+        with pytest.raises(FutureTimeoutError):
+            spa.call(lambda client: asyncio.sleep(1), timeout=0.01)
+        assert spa.wait_for_update(timeout=0) is None
+
+        async def _nested() -> None:
+            # blocking calls from the loop thread itself would deadlock
+            spa.call(lambda client: asyncio.sleep(0))
+
+        with pytest.raises(RuntimeError):
+            spa.call(lambda client: _nested())
+        spa.disconnect()
+        assert not spa.client.connected
+    assert not loop_thread.running
+    with pytest.raises(RuntimeError):
+        spa.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_sync_client(bfbp20s: SpaServer) -> None:
+    """Test the synchronous client from another thread."""
+    await asyncio.to_thread(_use_spa, bfbp20s.port)
+    assert bfbp20s.received_messages
+
+
+def test_sync_client_created_on_loop_thread() -> None:
+    """Test the update listener is registered from the loop thread."""
+    threads: list[str] = []
+    on = SpaClient.on
+
+    def _on(client: SpaClient, *args: Any, **kwargs: Any) -> Any:
+        threads.append(threading.current_thread().name)
+        return on(client, *args, **kwargs)
+
+    with patch.object(SpaClient, "on", _on), SpaLoopThread(name="spa-loop") as loop:
+        loop.add_client(HOST)
+    assert threads == ["spa-loop"]
+
+
+def _wait_for_updates(port: int) -> list[bool]:
+    """Wait for snapshot changes in several threads at once."""
+    with SpaLoopThread(timeout=10) as loop_thread:
+        spa = loop_thread.add_client(HOST, port)
+        results: list[bool] = []
+
+        def _wait() -> None:
+            results.append(spa.wait_for_update(timeout=10) is not None)
+
+        threads = [threading.Thread(target=_wait) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        assert spa.connect()
+        for thread in threads:
+            thread.join()
+    return results
+
+
+@pytest.mark.asyncio
+async def test_sync_wait_for_update(bfbp20s: SpaServer) -> None:
+    """Test threads are woken up when the snapshot changes."""
+    assert await asyncio.to_thread(_wait_for_updates, bfbp20s.port) == [True] * 3
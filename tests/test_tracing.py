@@ -0,0 +1,126 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import OffOnState, TemperatureUnit
+from pybalboa.framing import encode_frame
+from pybalboa.metrics import SpaMetrics, render_prometheus
+from pybalboa.tracing import CommandTrace, CommandTracker, LatencyHistogram
+from pybalboa.transport import MemoryTransport
+
+from .conftest import SpaServer, load_spa_from_json
+
+HOST = "localhost"
+
+
+def test_latency_histogram() -> None:
+    """Test the latency histogram buckets."""
+    histogram = LatencyHistogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == pytest.approx(3.65)
+
+    text = render_prometheus({"spa": SpaMetrics()}, {"spa": {"cmd": histogram}})
+    assert (
+        'pybalboa_command_latency_seconds_bucket{spa="spa",command="cmd",le="+Inf"} 4'
+        in text
+    )
+
+
+@pytest.mark.asyncio
+async def test_command_tracker() -> None:
+    """Test commands are confirmed or time out."""
+    tracker = CommandTracker(timeout=0.05)
+    stages: list[tuple[str, str]] = []
+    remove = tracker.add_hook(
+        lambda trace, stage: stages.append((trace.command, stage))
+    )
+    state = {"value": 0}
+
+    confirmed = tracker.start("confirmed", lambda: state["value"] == 1)
+    tracker.start("lost", lambda: False)
+    tracker.written(confirmed)
+    tracker.drained(confirmed)
+    tracker.check()
+    assert len(tracker.pending) == 2
+
+    state["value"] = 1
+    tracker.check()
+    assert confirmed.latency is not None
+    assert tracker.histograms["confirmed"].count == 1
+
+    await asyncio.sleep(0.1)
+    assert not tracker.pending
+    assert tracker.timeouts == {"lost": 1}
+    assert stages == [
+        ("confirmed", "queued"),
+        ("lost", "queued"),
+        ("confirmed", "written"),
+        ("confirmed", "drained"),
+        ("confirmed", "confirmed"),
+        ("lost", "timeout"),
+    ]
+    remove()
+    tracker.start("unhooked", lambda: True)
+    tracker.check()
+    assert len(stages) == 6
+    assert not tracker.pending
+
+
+@pytest.mark.asyncio
+async def test_client_command_trace(bfbp20s: SpaServer) -> None:
+    """Test the client traces control commands."""
+    traces: list[tuple[CommandTrace, str]] = []
+    async with SpaClient(HOST, bfbp20s.port, command_timeout=0.1) as spa:
+        assert await spa.async_configuration_loaded()
+        spa.add_trace_hook(lambda trace, stage: traces.append((trace, stage)))
+        await spa.lights[0].set_state(OffOnState.OFF)
+        await asyncio.sleep(0.2)
+
+    assert [stage for _, stage in traces] == ["queued", "written", "drained", "timeout"]
+    assert traces[0][0].command == "set_state:light"
+    assert traces[0][0].drained is not None
+
+
+async def _celsius_spa(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """Play a spa that reports in Celsius with a target of 38.0."""
+    messages = load_spa_from_json("bfbp20s")
+    status = bytearray(bytes.fromhex(messages.pop("status_update"))[4:-1])
+    status[9] |= 0x01
+    status[20] = 76
+    for message in messages.values():
+        writer.write(b"~" + bytes.fromhex(message) + b"~")
+    writer.write(encode_frame(b"\xff\xaf\x13" + bytes(status)))
+    while await reader.read(1024):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_unchanged_temperature_is_confirmed() -> None:
+    """Test commands that change nothing are confirmed and unsent ones not traced."""
+    traces: list[tuple[str, str]] = []
+    spa = SpaClient(HOST, transport=MemoryTransport(_celsius_spa), command_timeout=0.1)
+    spa.add_trace_hook(lambda trace, stage: traces.append((trace.command, stage)))
+    async with spa:
+        assert await spa.async_configuration_loaded(5)
+        assert spa.temperature_unit == TemperatureUnit.CELSIUS
+        assert spa.target_temperature == 38.0
+        await spa.set_temperature(38.0)
+        # encoded as 76 half degrees, the same as the current target
+        await spa.set_temperature(38.2)
+    await spa.set_temperature(39.0)
+    await asyncio.sleep(0.2)
+    assert (
+        traces == [("set_temperature", "queued"), ("set_temperature", "confirmed")] * 2
+    )
+    assert spa.wire_trace.dumps == 0
@@ -0,0 +1,69 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.enums import OffOnState
+from pybalboa.transport import (
+    MemoryTransport,
+    SpaTransport,
+    memory_pipe,
+    use_uvloop,
+)
+
+from .conftest import SpaServer, load_spa_from_json
+
+HOST = "localhost"
+
+
+@pytest.mark.asyncio
+async def test_memory_transport() -> None:
+    """Test a client over an in-memory pipe."""
+    server = SpaServer(0, load_spa_from_json("bfbp20s"))
+    transport = MemoryTransport(server.handle_message)
+    async with SpaClient(HOST, transport=transport) as spa:
+        assert await spa.async_configuration_loaded()
+        assert spa.model == "BFBP20S"
+        assert await spa.lights[0].set_state(OffOnState.OFF)
+        await asyncio.sleep(0.01)
+        assert server.received_messages
+
+
+@pytest.mark.asyncio
+async def test_memory_pipe() -> None:
+    """Test data and closing are passed to the other end of a pipe."""
+    (client_reader, client_writer), (spa_reader, spa_writer) = memory_pipe()
+    client_writer.write(b"ping")
+    await client_writer.drain()
+    assert await spa_reader.readexactly(4) == b"ping"
+    spa_writer.write(b"pong")
+    assert await client_reader.readexactly(4) == b"pong"
+
+    client_writer.close()
+    await client_writer.wait_closed()
+    assert await spa_reader.read() == b""
+    assert spa_writer.is_closing()
+
+
+def test_transport_requires_open() -> None:
+    """Test a transport without `open` can not be instantiated."""
+
+    class IncompleteTransport(SpaTransport):  # pylint: disable=abstract-method
+        """Transport that does not implement `open`."""
+
+    with pytest.raises(TypeError, match="open"):
+        IncompleteTransport()  # type: ignore[abstract]
+
+
+def test_use_uvloop_missing() -> None:
+    """Test the default event loop is kept when uvloop is not installed."""
+    policy = asyncio.get_event_loop_policy()
+    with patch.dict(sys.modules, {"uvloop": None}):
+        assert not use_uvloop()
+    assert asyncio.get_event_loop_policy() is policy
@@ -1,12 +1,22 @@
 """Tests module."""
 
+from __future__ import annotations
+
 import asyncio
+from dataclasses import dataclass, field
+
+import pytest
 
+from pybalboa.control import FaultLog
+from pybalboa.discovery import DiscoveredSpa
+from pybalboa.exceptions import SpaMessageError
 from pybalboa.utils import (
+    add_slots,
     byte_parser,
     calculate_checksum,
     cancel_task,
     default,
+    read_one_message,
     to_celsius,
 )
 
@@ -21,6 +31,31 @@ def test_byte_parser() -> None:
     assert byte_parser(byte, count=3, bits=3) == [5, 2, 1]
 
 
+def test_add_slots() -> None:
+    """Test add_slots."""
+
+    @add_slots
+    @dataclass
+    class Point:
+        """Point."""
+
+        x: int
+        y: int = 0
+        label: str = field(default="", compare=False)
+
+    point = Point(1)
+    assert point == Point(1, label="other")
+    assert Point.__slots__ == ("x", "y", "label")  # type: ignore[attr-defined]
+    assert not hasattr(point, "__dict__")
+    for instance in (
+        DiscoveredSpa("10.0.0.2", 4257, "00-15-27-AA-BB-CC", "BWGSPA"),
+        FaultLog(24, 1, 16, 2, 10, 30, 0, 100, 98, 99),
+    ):
+        assert not hasattr(instance, "__dict__")
+    with pytest.raises(AttributeError):
+        point.z = 1  # type: ignore[attr-defined]
+
+
 def test_calculate_checksum() -> None:
     """Test calculate_checksum."""
     value = bytes.fromhex("1DFFAF13000064082D0000010000040000000000000000006400000006")
@@ -52,3 +87,24 @@ def test_to_celsius() -> None:
     assert to_celsius(32) == 0
     assert to_celsius(104) == 40
     assert to_celsius(80) == 26.5
+
+
+@pytest.mark.parametrize(
+    ("data", "reason"),
+    [
+        ("7e1dffaf130003640a3700040100021c00000203000000012068000452007e", "checksum"),
+        ("0102037e", "invalid"),
+        ("7e050abf04777e", None),
+    ],
+)
+async def test_read_one_message_errors(data: str, reason: str | None) -> None:
+    """Test read_one_message error reasons."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(bytes.fromhex(data))
+    if reason is None:
+        assert await read_one_message(reader) == bytes.fromhex("050abf0477")
+        return
+    with pytest.raises(SpaMessageError) as err:
+        await read_one_message(reader)
+    assert err.value.reason == reason
+    assert err.value.discarded > 0
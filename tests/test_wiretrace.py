@@ -0,0 +1,64 @@
+"""Tests module."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+
+from pybalboa import SpaClient
+from pybalboa.wiretrace import DIRECTION_IN, DIRECTION_OUT, WireTrace
+
+from .conftest import SpaServer
+
+HOST = "localhost"
+
+
+def test_wire_trace_ring_buffer(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the wire trace keeps only the most recent frames."""
+    trace = WireTrace(3)
+    assert trace.dump("spa", "nothing") == []
+    for i in range(5):
+        trace.received(bytes([i]))
+    trace.sent(b"\xff")
+    assert len(trace) == 3
+    assert [data for _, _, data in trace.frames] == [b"\x03", b"\x04", b"\xff"]
+    assert trace.frames[-1][1] == DIRECTION_OUT
+
+    with caplog.at_level(logging.WARNING):
+        dump = trace.dump("spa", "test")
+    assert dump[0] == "test:"
+    assert dump[-1].endswith("  out ff")
+    assert trace.last_dump == dump
+    assert trace.dumps == 1
+    assert "wire trace, test:" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_client_wire_trace(bfbp20s: SpaServer) -> None:
+    """Test the client records frames in both directions."""
+    async with SpaClient(HOST, bfbp20s.port) as spa:
+        assert await spa.async_configuration_loaded()
+        directions = {direction for _, direction, _ in spa.wire_trace.frames}
+    assert directions == {DIRECTION_IN, DIRECTION_OUT}
+    assert not spa.wire_trace.dumps
+
+
+@pytest.mark.asyncio
+async def test_client_wire_trace_dumped_on_errors(unused_tcp_port: int) -> None:
+    """Test the wire trace is dumped after repeated message errors."""
+
+    async def _handle(_: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        for _i in range(3):
+            writer.write(bytes.fromhex("0102037e"))
+            await writer.drain()
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(1)
+
+    server = await asyncio.start_server(_handle, HOST, unused_tcp_port)
+    async with server, SpaClient(HOST, unused_tcp_port) as spa:
+        await asyncio.sleep(0.1)
+        assert spa.wire_trace.dumps == 1
+        assert spa.wire_trace.last_dump[0] == "repeated message errors:"
+        assert spa.metrics.snapshot()["message_errors"]["invalid"] == 3